@@ -0,0 +1,140 @@
+"""
+bench_startup.py - Import-time audit of the MIROS stage scripts
+
+Every stage runs in a fresh interpreter, so whatever a script imports at
+module level is paid on every run. For each stage script this benchmark
+collects its module-level imports (with ast, without running the script),
+executes just those imports under `python -X importtime` and reports the
+total import time and the most expensive top-level modules.
+
+Usage:
+    python benchmarks/bench_startup.py                  # current tree
+    python benchmarks/bench_startup.py --rev HEAD~1     # compare with a git revision
+    python benchmarks/bench_startup.py --python /usr/local/sv/simvascular/.../python
+
+Imports that are not available in the chosen interpreter (e.g. `sv` outside
+SimVascular) are listed as missing and excluded from the totals, so run it
+with SimVascular's Python for the SimVascular stages.
+"""
+
+import os
+import re
+import sys
+import ast
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+STAGE_SCRIPTS = ['__main__.py', 'sv_preprocess.py', 'gen_inflow.py', 'gen_params_cl_run_1D.py',
+                 'gen_params0D.py', 'run_0D.py', 'extract_1d_res.py', 'extract_0d_res.py',
+                 'post_process_seqseg.py']
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def module_level_imports(path):
+    """
+    Import statements executed when `path` is run, i.e. those at module level
+    (also inside top-level if/try blocks), but not those inside functions.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+
+    statements = []
+
+    def visit(nodes):
+        for node in nodes:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                statements.append(ast.get_source_segment(source, node))
+            elif isinstance(node, (ast.If, ast.Try, ast.With)):
+                visit(node.body)
+                for handler in getattr(node, 'handlers', []):
+                    visit(handler.body)
+                visit(getattr(node, 'orelse', []))
+                visit(getattr(node, 'finalbody', []))
+    visit(tree.body)
+    return statements
+
+
+def measure(python, root, script):
+    """
+    Run the module-level imports of `script` (in root/package) under -X importtime.
+
+    Returns:
+    - total_ms: summed cumulative time of the top-level imports
+    - modules:  list of (cumulative_ms, module) of top-level imports
+    - missing:  import statements that failed in this interpreter
+    """
+    pkg_dir = os.path.join(root, 'package')
+    statements = module_level_imports(os.path.join(pkg_dir, script))
+    lines = ['import sys', 'sys.path[:0] = [{!r}, {!r}]'.format(pkg_dir, root), 'missing = []']
+    for stmt in statements:
+        lines.append('try:\n    {}\nexcept Exception:\n    missing.append({!r})'.format(stmt, stmt))
+    lines.append('print("\\n".join(missing))')
+
+    proc = subprocess.run([python, '-X', 'importtime', '-c', '\n'.join(lines)],
+                          cwd=pkg_dir, capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m and m.group(3) == ' ':  # nested imports are indented further
+            modules.append((int(m.group(2)) / 1000.0, m.group(4)))
+    missing = [s for s in proc.stdout.splitlines() if s.strip()]
+    return sum(ms for ms, _ in modules), sorted(modules, reverse=True), missing
+
+
+def checkout(rev):
+    """Extract package/ at git revision `rev` into a temporary directory."""
+    tmp = tempfile.mkdtemp(prefix='miros_bench_')
+    archive = subprocess.run(['git', 'archive', rev, 'package'], cwd=project_root,
+                             capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', tmp], input=archive, check=True)
+    return tmp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-stage import cost of the MIROS scripts.')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to measure with')
+    parser.add_argument('--rev', default=None, help='git revision to compare against (e.g. HEAD~1)')
+    parser.add_argument('--top', type=int, default=3, help='most expensive modules shown per stage')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; the fastest is reported')
+    args = parser.parse_args(argv)
+
+    trees = [('current', project_root)]
+    if args.rev:
+        trees.insert(0, (args.rev, checkout(args.rev)))
+
+    results = {}
+    try:
+        for label, root in trees:
+            for script in STAGE_SCRIPTS:
+                if not os.path.exists(os.path.join(root, 'package', script)):
+                    continue
+                runs = [measure(args.python, root, script) for _ in range(max(1, args.repeat))]
+                results[(label, script)] = min(runs, key=lambda r: r[0])
+    finally:
+        for label, root in trees:
+            if root != project_root:
+                shutil.rmtree(root, ignore_errors=True)
+
+    labels = [label for label, _ in trees]
+    print("\n  {:<26}".format('stage') + ''.join('{:>14}'.format(l[:12] + ' [ms]') for l in labels))
+    for script in STAGE_SCRIPTS:
+        row = [results.get((label, script)) for label in labels]
+        print("  {:<26}".format(script) +
+              ''.join('{:>14.1f}'.format(r[0]) if r else '{:>14}'.format('-') for r in row))
+        total, modules, missing = row[-1] or (0, [], [])
+        for ms, name in modules[:args.top]:
+            print("  {:<26}    {:<30} {:>8.1f}".format('', name, ms))
+        if missing:
+            print("  {:<26}    missing: {}".format('', '; '.join(missing)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
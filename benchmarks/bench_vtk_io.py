@@ -0,0 +1,110 @@
+"""
+bench_vtk_io.py - Write time, read time and file size of the VTK encodings
+
+Compares the encodings write_vtk() offers (package/vtk_utils.py) with VTK's
+own default writer settings on one mesh:
+
+    python benchmarks/bench_vtk_io.py <master_folder>/mesh-complete/mesh-complete.mesh.vtu
+    python benchmarks/bench_vtk_io.py <master_folder>/1D_results/extracted_results.vtu --levels 1 5 9
+    python benchmarks/bench_vtk_io.py                     # synthetic volume mesh (320k tetrahedra)
+
+Without a mesh, a tetrahedralized box with a few point and cell arrays stands
+in for a projected 1D result. Set the chosen encoding with vtk_encoding /
+vtk_compression_level in package/__init__.py.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import vtk
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, project_root)
+from package.vtk_utils import (VTK_ENCODINGS, attach_point_array, attach_cell_array, configure_writer,
+                               read_vtk, xml_writer)
+
+
+def synthetic_mesh(n=40):
+    """Tetrahedralized n^3 box with pressure/flow-like point arrays and a cell array."""
+    grid = vtk.vtkImageData()
+    grid.SetDimensions(n + 1, n + 1, n + 1)
+    tets = vtk.vtkDataSetTriangleFilter()
+    tets.SetInputData(grid)
+    tets.Update()
+    mesh = tets.GetOutput()
+    n_points, n_cells = mesh.GetNumberOfPoints(), mesh.GetNumberOfCells()
+    rng = np.random.default_rng(0)
+    x = np.linspace(0.0, 1.0, n_points)
+    attach_point_array(mesh, 'GlobalNodeID', np.arange(n_points), np.int32)
+    attach_point_array(mesh, 'pressure_00000', 1.0e5 + 1.0e3 * np.sin(6 * x) + rng.normal(0, 1, n_points))
+    attach_point_array(mesh, 'velocity_00000', rng.normal(0, 10, (n_points, 3)))
+    attach_cell_array(mesh, 'ModelRegionID', np.ones(n_cells), np.int32)
+    return mesh
+
+
+def timed_write(path, dataset, encoding, level, repeat):
+    """Fastest of `repeat` writes; encoding None keeps VTK's default writer settings."""
+    best = float('inf')
+    for _ in range(repeat):
+        writer = xml_writer(dataset)
+        if encoding is not None:
+            configure_writer(writer, encoding, level)
+        writer.SetFileName(path)
+        writer.SetInputData(dataset)
+        start = time.perf_counter()
+        writer.Write()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def timed_read(path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read_vtk(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare VTK XML encodings on a mesh.')
+    parser.add_argument('mesh', nargs='?', help='.vtp/.vtu file (default: synthetic volume mesh)')
+    parser.add_argument('--encodings', nargs='+', default=[e for e in VTK_ENCODINGS if e != 'ascii'],
+                        choices=VTK_ENCODINGS)
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 5, 9],
+                        help='compression levels tried for the compressed encodings')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the fastest is reported')
+    args = parser.parse_args(argv)
+
+    dataset = read_vtk(args.mesh) if args.mesh else synthetic_mesh()
+    ext = os.path.splitext(args.mesh)[1] if args.mesh else '.vtu'
+    print("\n  {}: {} points, {} cells".format(args.mesh or 'synthetic mesh', dataset.GetNumberOfPoints(),
+                                               dataset.GetNumberOfCells()))
+
+    cases = [('vtk default', None, None)]
+    for encoding in args.encodings:
+        levels = [None] if encoding in ('raw', 'ascii') else args.levels
+        cases += [(encoding if level is None else '{}:{}'.format(encoding, level), encoding, level)
+                  for level in levels]
+
+    tmp = tempfile.mkdtemp(prefix='miros_vtk_io_')
+    try:
+        print("\n  {:<14}{:>12}{:>12}{:>12}".format('encoding', 'write [s]', 'read [s]', 'size [MB]'))
+        for label, encoding, level in cases:
+            path = os.path.join(tmp, label.replace(' ', '_').replace(':', '_') + ext)
+            write_s = timed_write(path, dataset, encoding, level, args.repeat)
+            read_s = timed_read(path, args.repeat)
+            size = os.path.getsize(path) / 1.0e6
+            print("  {:<14}{:>12.3f}{:>12.3f}{:>12.1f}".format(label, write_s, read_s, size))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
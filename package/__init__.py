@@ -69,13 +69,58 @@ edge_size = 'auto'
 edge_min = edge_size
 edge_max = edge_size
 
+# Skip pipeline stages whose input files and parameters are unchanged since their
+# last successful run (hashes are kept in <master_folder>/.miros_stages.json).
+# Set to False to force every stage to re-run.
+use_stage_cache = True
+
+# Remeshed surfaces are also kept in a store shared by all cases, keyed by the surface
+# content and edge size, so a parameter sweep or a new master folder reusing the same
+# clipped surface skips remeshing. Set to None to disable.
+remesh_cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'miros', 'remesh')
+
+# Keep one SimVascular Python process alive for the whole session and send it each
+# SimVascular stage (preprocess, 1D setup, 0D setup), instead of paying the SimVascular
+# startup for every stage. Set to False to launch `simvascular --python` per stage.
+persistent_sv_worker = True
+
+# In headless runs (--manifest), set up and solve the 0D model as soon as the centerlines
+# exist, in parallel with the 1D solve, instead of after 1D extraction.
+concurrent_0d = True
+
+# The TetGen volume mesh is only used to project 1D results onto 3D. By default it is
+# built the first time extract_1d_res.py is asked for a 3D projection (and cached after
+# that). Set to True to start building it in the background during pre-processing.
+prebuild_volume_mesh = False
+
+# Encoding of every .vtp/.vtu MIROS writes (meshes, caps, volume mesh, 1D results):
+# 'raw' (uncompressed binary, fastest), 'zlib', 'lz4' (fast compression) or 'lzma'
+# (smallest), at vtk_compression_level 1-9. MIROS_VTK_ENCODING (e.g. 'lz4:3') overrides it.
+# `python benchmarks/bench_vtk_io.py <mesh>` compares them on your own meshes.
+vtk_encoding = 'zlib'
+vtk_compression_level = 5
+
 
 # DO NOT r change the following, unless you are changing the workflow or developing new features
 bc_filename = 'rcrt.dat' 
-res_folder_1D = os.path.join(master_folder, '1D_results')
-res_folder_0D = os.path.join(master_folder, '0D_results')
-caps_folder = os.path.join(master_folder, 'caps_and_wall')
-inflow_file_path = os.path.join(master_folder, 'inflow_1d.flow')
+
+# The values above are the defaults of a case. A case file (MIROS_CASE_CONFIG, or
+# `python -m package --case case.yaml`) and the MIROS_* variables set by the cohort
+# runner override them; case_config is the resolved case, and the per-case names
+# below (master_folder, res_folder_1D, caps_folder, ...) are taken from it.
+try:
+    from package.config import CaseConfig
+except ImportError:  # imported as a plain module (from __init__ import *)
+    from config import CaseConfig
+
+default_case_config = CaseConfig(master_folder=master_folder,
+                                 clipped_surface=clipped_seqseg_results,
+                                 centerline=seqseg_cl,
+                                 surf_name=surf_name,
+                                 edge_size=edge_size,
+                                 bc_filename=bc_filename)
+case_config = CaseConfig.from_env(default_case_config)
+globals().update(case_config.as_globals())
 
 
 
@@ -83,6 +128,9 @@ inflow_file_path = os.path.join(master_folder, 'inflow_1d.flow')
 __all__ = ['OneDSolv', 'segseqed_model', 'master_folder', 'local_py_bin', 'sv_py_bin',
            'bc_filename', 'res_folder_1D', 'res_folder_0D',
            'edge_size', 'edge_min', 'edge_max', 'caps_folder', 'inflow_file_path', 'seqseg_cl', 'Windows', 'sv_dir', 'sv_bat',
-           'clipped_seqseg_results','surf_name', 'automatic_define_outlets'
+           'clipped_seqseg_results','surf_name', 'automatic_define_outlets', 'use_stage_cache',
+           'persistent_sv_worker', 'concurrent_0d', 'prebuild_volume_mesh', 'remesh_cache_dir',
+           'vtk_encoding', 'vtk_compression_level',
+           'case_config'
            ]
 
@@ -1,18 +1,10 @@
-import numpy as np
-import pdb
-import vtk
-from vtk.util import numpy_support
-from vtk.util.numpy_support import vtk_to_numpy as v2n
-from vtk.util.numpy_support import numpy_to_vtk as n2v
+# __main__ only dispatches stage processes: keep numpy/vtk/matplotlib out of here
 import os
-import shutil
 import time
 import sys
-import csv
 from package import *
-import warnings
 import subprocess
-import matplotlib
+import argparse
 
 # ========================================================================
 # ============================ intialize  ================================
@@ -20,6 +12,46 @@ import matplotlib
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
+
+parser = argparse.ArgumentParser(prog='python -m package',
+                                 description='MIROS - Medical Image to Reduced-Order Simulation')
+parser.add_argument('--manifest', default=None,
+                    help='run manifest (.json/.yaml/.ini) answering every prompt, for unattended runs')
+parser.add_argument('--resume', action='store_true',
+                    help='continue the full workflow from the first stage that did not complete')
+parser.add_argument('--case', default=None,
+                    help='case file (.json/.yaml/.ini) with master_folder, clipped_surface, surf_name, edge_size')
+args = parser.parse_args()
+
+# the case is resolved here once and handed to every stage process through the environment
+if args.case:
+    from package.config import CASE_ENV, CaseConfig
+    os.environ[CASE_ENV] = os.path.abspath(args.case)
+    case_config = CaseConfig.from_env(case_config)
+    globals().update(case_config.as_globals())
+
+# the stage scripts are separate processes: hand them the manifest through the environment
+from package.manifest import MANIFEST_ENV, ask, is_headless
+if args.manifest:
+    os.environ[MANIFEST_ENV] = os.path.abspath(args.manifest)
+
+# one trace session per invocation; stage scripts tag their records with it
+from package.profiling import StageTimer, SESSION_ENV, export_chrome_trace, print_summary
+import atexit
+os.environ[SESSION_ENV] = '{}-{}'.format(int(time.time()), os.getpid())
+
+
+def finish_trace():
+    """Export this session's timing records as a Chrome/Perfetto trace."""
+    if not os.path.exists(master_folder):
+        return
+    print_summary(master_folder, os.environ[SESSION_ENV])
+    trace_path = export_chrome_trace(master_folder, os.environ[SESSION_ENV])
+    print("\n  → Stage timings: " + trace_path + " (open in https://ui.perfetto.dev)")
+
+
+atexit.register(finish_trace)
+
 env = os.environ.copy()
 prev = env.get('PYTHONPATH', '')
 env['PYTHONPATH'] = project_root + (os.pathsep + prev if prev else '')
@@ -37,12 +69,27 @@ print("    [2] Extract 1D results only - Skip to 1D result extraction")
 print("    [3] Extract 0D results only - Skip to 0D result extraction")
 print("")
 
+from package.checkpoints import Checkpoints
+from contextlib import contextmanager
+
+checkpoints = Checkpoints(master_folder, resume=args.resume)
+
 run_mode = None
+if args.resume:
+    run_mode = '1'
+    first = checkpoints.first_incomplete()
+    if first is None:
+        print("  All stages completed in a previous run; nothing to resume.")
+        sys.exit(0)
+    print("  Resuming full workflow at stage: " + first)
 while run_mode not in ['1', '2', '3']:
-    run_mode = input("  Enter choice (1, 2, or 3): ").strip()
+    run_mode = ask('run_mode', "  Enter choice (1, 2, or 3): ", choices=('1', '2', '3')).strip()
     if run_mode not in ['1', '2', '3']:
         print("  Invalid choice. Please enter 1, 2, or 3.")
 
+if run_mode == '1' and not args.resume:
+    checkpoints.reset()
+
 if run_mode in ['2', '3']:
     print("\n  " + "-" * 60)
     print("  Skipping to result extraction...")
@@ -60,6 +107,109 @@ run_0D         = os.path.join(pkg_dir, 'run_0D.py')
 extract_1d_res = os.path.join(pkg_dir, 'extract_1d_res.py')
 extract_0d_res = os.path.join(pkg_dir, 'extract_0d_res.py')
 
+@contextmanager
+def stage(name, outputs=()):
+    """Time a top-level stage and checkpoint its outcome for --resume."""
+    with checkpoints.stage(name, outputs), \
+            StageTimer(name, master_folder, outputs=outputs, category='stage', children=True):
+        yield
+
+
+# ========================================================================
+# ===================== SimVascular stage launcher =======================
+
+from package.sv_worker import SVWorker
+
+sv_worker = None
+
+
+def run_sv_script(script, separate=False, stdout=None):
+    """
+    Run a stage script under SimVascular's Python. With persistent_sv_worker,
+    one long-lived SimVascular process serves every stage of the session;
+    otherwise (or if the worker cannot start) each stage gets a fresh launch.
+
+    Parameters:
+    - separate: Always use a fresh SimVascular process (e.g. while the worker
+                is busy with another stage).
+    - stdout:   Optional file the stage output is written to (separate launches only).
+    """
+    global sv_worker, persistent_sv_worker
+    if persistent_sv_worker and sv_worker is None and not separate:
+        if Windows:
+            launch, cwd = '"{}" --python --'.format(sv_bat), sv_dir
+        else:
+            launch, cwd = [sv_py_bin, "--python", "--"], os.path.dirname(__file__)
+        try:
+            print("  → Starting persistent SimVascular worker...")
+            sv_worker = SVWorker(launch, cwd, env).start()
+            atexit.register(sv_worker.close)
+        except Exception as e:
+            print("  [WARNING] SimVascular worker unavailable ({}), launching stages separately".format(e))
+            persistent_sv_worker = False
+
+    if sv_worker is not None and not separate:
+        sv_worker.run(script, case_config)
+    elif Windows:
+        subprocess.run(
+            f'"{sv_bat}" --python -- "{script}"',
+            cwd=sv_dir,
+            shell=True,
+            check=True,
+            text=True,
+            env=env,
+            stdout=stdout,
+            stderr=subprocess.STDOUT if stdout else None,
+        )
+    else:
+        subprocess.run(
+            [sv_py_bin, "--python", "--", script],
+            cwd=os.path.dirname(__file__),
+            text=True,
+            check=True,
+            env=env,
+            stdout=stdout,
+            stderr=subprocess.STDOUT if stdout else None,
+        )
+
+
+def run_0d_pipeline(stdout=None, separate=False):
+    """
+    Set up and solve the 0D model. Only needs the centerlines, rcrt.dat and the
+    inflow, so it can run while the 1D solver is still busy.
+    """
+    # =======================================================================
+    # ============================ set up 0D ================================
+    if checkpoints.pending('setup_0d'):
+        with stage('setup_0d', outputs=[os.path.join(master_folder, '0D_solver_input.json')]):
+            run_sv_script(gen_params0D, separate=separate, stdout=stdout)
+
+    # =======================================================================
+    # =========================== Run 0D ====================================
+    if checkpoints.pending('run_0d'):
+        with stage('run_0d', outputs=[os.path.join(res_folder_0D, '0D_results.csv')]):
+            if Windows:
+                subprocess.run(
+                    f'"{sv_bat}" --python -- "{run_0D}"',
+                    cwd=sv_dir,
+                    shell=True,
+                    check=True,
+                    text=True,
+                    env=env,
+                    stdout=stdout,
+                    stderr=subprocess.STDOUT if stdout else None,
+                )
+            else:
+                subprocess.run(
+                    [local_py_bin, run_0D],
+                    cwd=os.path.dirname(__file__),
+                    text=True,
+                    check=True,
+                    env=env,
+                    stdout=stdout,
+                    stderr=subprocess.STDOUT if stdout else None,
+                )
+
 # # ========================================================================
 # # ======================= post-process seqseg results  ===================
 
@@ -104,51 +254,58 @@ extract_0d_res = os.path.join(pkg_dir, 'extract_0d_res.py')
 if run_mode == '1':
     # =======================================================================
     # ============================ pre-process ==============================
-    if Windows:
-        subprocess.run(
-            f'"{sv_bat}" --python -- "{sv_preprocess}"',
-            cwd=sv_dir,
-            shell=True,
-            check=True,
-            text=True,
-            env=env,
-        )
-    else:
-        subprocess.run(
-            [sv_py_bin, "--python", "--", sv_preprocess],
-            cwd=os.path.dirname(__file__),
-            text=True,
-            check=True,
-            env=env
-        )
+    if checkpoints.pending('preprocess'):
+        with stage('preprocess', outputs=[os.path.join(master_folder, 'remeshed_model.vtp'),
+                                          os.path.join(master_folder, 'mesh-complete'), caps_folder]):
+            run_sv_script(sv_preprocess)
 
     # =======================================================================
     # =============================== get inflow ============================
-    subprocess.run(
-        [local_py_bin, gen_inflow],
-        cwd=os.path.dirname(__file__),
-        text=True,
-        check=True
-    )
+    if checkpoints.pending('inflow'):
+        with stage('inflow', outputs=[inflow_file_path]):
+            subprocess.run(
+                [local_py_bin, gen_inflow],
+                cwd=os.path.dirname(__file__),
+                text=True,
+                check=True
+            )
 
     # =======================================================================
     # ============================= set up 1D and run 1D ====================
-    if Windows:
-        subprocess.run(
-            f'"{sv_bat}" --python -- "{gen_params_cl_run_1D}"',
-            cwd=sv_dir,
-            shell=True,
-            check=True,
-            text=True,
-            env=env,
-        )
-    else:
-        subprocess.run(
-            [sv_py_bin, "--python", "--", gen_params_cl_run_1D],
-            cwd=os.path.dirname(__file__),
-            text=True,
-            check=True
-        )
+    def run_1d():
+        with stage('setup_and_run_1d', outputs=[os.path.join(master_folder, 'extracted_centerlines.vtp'),
+                                                os.path.join(master_folder, '1D_solver_input.in'),
+                                                os.path.join(res_folder_1D, '*_flow.dat')]):
+            run_sv_script(gen_params_cl_run_1D)
+
+    # Unattended runs start the 0D model as soon as the 1D stage has the centerlines,
+    # so setup + solve of 0D overlap with the (much longer) OneDSolver run.
+    # Interactive runs stay sequential to keep the prompts readable.
+    future_0d = None
+    run_1d_pending = checkpoints.pending('setup_and_run_1d')
+    if run_1d_pending and concurrent_0d and is_headless():
+        from concurrent.futures import ThreadPoolExecutor
+        from package.scheduler import wait_ready
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            future_1d = pool.submit(run_1d)
+            if wait_ready(master_folder, 'centerlines', abort=future_1d.done):
+                log_0d_path = os.path.join(master_folder, '0D_pipeline.log')
+                print("  → Centerlines ready, running 0D in parallel (output: " + log_0d_path + ")")
+                log_0d = open(log_0d_path, 'w')
+                future_0d = pool.submit(run_0d_pipeline, log_0d, True)
+                future_0d.add_done_callback(lambda f: log_0d.close())
+            future_1d.result()
+        except BaseException:
+            # never leave the 0D branch running unattended: join it before failing
+            if future_0d is not None and not future_0d.done():
+                print("  → 1D stage failed, waiting for the parallel 0D pipeline to finish...")
+            pool.shutdown(wait=True)
+            raise
+        # on success the 0D branch keeps running alongside the 1D extraction (joined below)
+        pool.shutdown(wait=False)
+    elif run_1d_pending:
+        run_1d()
 
 # =======================================================================
 # ============================ extract 1D results =======================
@@ -160,66 +317,37 @@ if run_mode in ['1', '2']:
     print("  [STEP] 1D Result Extraction")
     print("=" * 70)
 
-    if Windows:
-        subprocess.run(
-            f'"{sv_bat}" --python -- "{extract_1d_res}"',
-            cwd=sv_dir,
-            shell=True,
-            check=True,
-            text=True,
-            env=env,
-        )
-    else:
-        subprocess.run(
-            [local_py_bin, extract_1d_res],
-            cwd=os.path.dirname(__file__),
-            text=True,
-            check=True,
-            env=env
-        )
+    if checkpoints.pending('extract_1d'):
+        with stage('extract_1d', outputs=[os.path.join(res_folder_1D, 'extracted_results.vt[pu]')]):
+            if Windows:
+                subprocess.run(
+                    f'"{sv_bat}" --python -- "{extract_1d_res}"',
+                    cwd=sv_dir,
+                    shell=True,
+                    check=True,
+                    text=True,
+                    env=env,
+                )
+            else:
+                subprocess.run(
+                    [local_py_bin, extract_1d_res],
+                    cwd=os.path.dirname(__file__),
+                    text=True,
+                    check=True,
+                    env=env
+                )
 
 # =======================================================================
 # ============================ 0D WORKFLOW (Mode 1 only) ================
 # =======================================================================
 
 if run_mode == '1':
-    # =======================================================================
-    # ============================ set up 0D ================================
-    if Windows:
-        subprocess.run(
-            f'"{sv_bat}" --python -- "{gen_params0D}"',
-            cwd=sv_dir,
-            shell=True,
-            check=True,
-            text=True,
-            env=env,
-        )
+    if future_0d is not None:
+        print("\n  → Waiting for the parallel 0D pipeline...")
+        future_0d.result()  # re-raises a 0D failure here
+        print("  ✓ 0D pipeline finished")
     else:
-        subprocess.run(
-            [sv_py_bin, "--python", "--", gen_params0D],
-            cwd=os.path.dirname(__file__),
-            text=True,
-            check=True
-        )
-
-    # =======================================================================
-    # =========================== Run 0D ====================================
-    if Windows:
-        subprocess.run(
-            f'"{sv_bat}" --python -- "{run_0D}"',
-            cwd=sv_dir,
-            shell=True,
-            check=True,
-            text=True,
-            env=env,
-        )
-    else:
-        subprocess.run(
-            [local_py_bin, run_0D],
-            cwd=os.path.dirname(__file__),
-            text=True,
-            check=True
-        )
+        run_0d_pipeline()
 
 # =======================================================================
 # ============================ extract 0D results =======================
@@ -231,13 +359,15 @@ if run_mode in ['1', '3']:
     print("  [STEP] 0D Result Extraction")
     print("=" * 70)
 
-    subprocess.run(
-        [local_py_bin, extract_0d_res],
-        cwd=os.path.dirname(__file__),
-        text=True,
-        check=True,
-        env=env
-    )
+    if checkpoints.pending('extract_0d'):
+        with stage('extract_0d', outputs=[os.path.join(res_folder_0D, '0D_statistics.csv')]):
+            subprocess.run(
+                [local_py_bin, extract_0d_res],
+                cwd=os.path.dirname(__file__),
+                text=True,
+                check=True,
+                env=env
+            )
 
 # =======================================================================
 # ============================ Done =====================================
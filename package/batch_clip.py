@@ -0,0 +1,209 @@
+"""
+batch_clip.py - Automatic outlet clipping of many SeqSeg surfaces on a process pool
+
+Usage:
+    python -m package.batch_clip PAIRS.csv --out CLIPPED_FOLDER [--workers 4] [--box-scale 10]
+    python -m package.batch_clip --surfaces 'seg/*_surface_mesh*.vtp' --centerlines 'seg/*_centerline*.vtp' --out CLIPPED_FOLDER
+
+PAIRS.csv has a `surface` and a `centerline` column, and optionally `case`
+and `output` (folder) columns. With --surfaces / --centerlines the files
+matched by the two glob patterns are paired by case name: the file stem up
+to `_surface_mesh` / `_surface` or `_centerline(s)`, so <case>_surface_mesh.vtp
+goes with <case>_centerline.vtp. A file without a partner is an error.
+
+Each pair is clipped by auto_clip_case() from post_process_seqseg.py (branch
+ordering on the centerline MST, box placement, analytic box clipping, largest
+connected piece) in its own worker process, without any prompt. The results
+go to CLIPPED_FOLDER/<case>/postprocessed_seqseg.vtp together with the
+clipping boxes (box_for_clipping.vtp). A success / failure table is printed
+at the end and written to CLIPPED_FOLDER/batch_clip_summary.csv.
+
+The same caveat as for single models applies: automatic clipping is not
+robust for every geometry, so check the clipped surfaces before simulating.
+"""
+
+import os
+import sys
+import csv
+import glob
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from package.cohort import check_unique
+
+SURFACE_SUFFIXES = ('_surface_mesh', '_surface')
+CENTERLINE_SUFFIXES = ('_centerlines', '_centerline')
+
+
+def case_name(path, suffixes=SURFACE_SUFFIXES):
+    """Case name from a file name: the stem up to the first of `suffixes` (p07_surface_mesh.vtp -> p07)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for suffix in suffixes:
+        end = stem.find(suffix)
+        if end > 0:
+            return stem[:end]
+    return stem
+
+
+def files_by_case(pattern, suffixes, kind):
+    """Files matching a glob `pattern`, keyed by case name (see case_name)."""
+    files = {}
+    for path in sorted(glob.glob(pattern)):
+        name = case_name(path, suffixes)
+        if name in files:
+            raise ValueError("{} {} and {} have the same case: {}".format(kind, files[name], path, name))
+        files[name] = path
+    return files
+
+
+def find_pairs(source=None, surfaces=None, centerlines=None, out_folder='.'):
+    """
+    Build the list of surface/centerline pairs from a CSV file or two globs.
+
+    Returns:
+    - pairs: list of dicts with 'case', 'surface', 'centerline' and 'output'.
+
+    Raises ValueError if two pairs share a case name or an output folder, or
+    if a globbed surface or centerline has no partner.
+    """
+    pairs = []
+    if source:
+        with open(source, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+                if not row.get('surface') or not row.get('centerline'):
+                    continue
+                pairs.append(row)
+    else:
+        surface_files = files_by_case(surfaces, SURFACE_SUFFIXES, 'Surfaces')
+        centerline_files = files_by_case(centerlines, CENTERLINE_SUFFIXES, 'Centerlines')
+        unmatched = ["no centerline for " + surface_files[name]
+                     for name in sorted(set(surface_files) - set(centerline_files))]
+        unmatched += ["no surface for " + centerline_files[name]
+                      for name in sorted(set(centerline_files) - set(surface_files))]
+        if unmatched:
+            raise ValueError("Unpaired files: " + "; ".join(unmatched))
+        pairs = [{'case': name, 'surface': surface_files[name], 'centerline': centerline_files[name]}
+                 for name in sorted(surface_files)]
+
+    for pair in pairs:
+        pair['surface'] = os.path.abspath(pair['surface'])
+        pair['centerline'] = os.path.abspath(pair['centerline'])
+        if not pair.get('case'):
+            pair['case'] = case_name(pair['surface'])
+        if not pair.get('output'):
+            pair['output'] = os.path.join(out_folder, pair['case'])
+        pair['output'] = os.path.abspath(pair['output'])
+    # two pairs with one case name or output folder would overwrite each other's clipped surface
+    check_unique(pairs, ('case', 'output'), 'Surfaces')
+    return pairs
+
+
+def clip_pair(pair, box_scale=10.0):
+    """
+    Clip one surface in a worker process.
+
+    Returns:
+    - result: dict with case name, status, number of branches, wall time and output path.
+    """
+    start = time.time()
+    result = {'case': pair['case'], 'status': 'success', 'branches': None,
+              'seconds': None, 'output': None}
+    try:
+        # imported in the worker: pulls in pyvista, vtk and scipy
+        from package.post_process_seqseg import auto_clip_case
+        for key in ('surface', 'centerline'):
+            if not os.path.exists(pair[key]):
+                raise FileNotFoundError("{} not found: {}".format(key, pair[key]))
+        info = auto_clip_case(pair['surface'], pair['centerline'], pair['output'], box_scale)
+        result.update(branches=info['branches'], output=info['output'])
+    except Exception as e:
+        result['status'] = 'error: ' + str(e)
+        os.makedirs(pair['output'], exist_ok=True)
+        with open(os.path.join(pair['output'], 'batch_clip_error.log'), 'w') as f:
+            f.write(traceback.format_exc())
+    result['seconds'] = round(time.time() - start, 1)
+    return result
+
+
+def run_batch(pairs, workers=2, box_scale=10.0):
+    """Clip all pairs on a pool of at most `workers` processes."""
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(clip_pair, pair, box_scale): pair for pair in pairs}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print("  [{}/{}] {}: {} ({} s)".format(len(results), len(pairs), result['case'],
+                                                  result['status'], result['seconds']))
+    order = {pair['case']: i for i, pair in enumerate(pairs)}
+    results.sort(key=lambda r: order[r['case']])
+    return results
+
+
+def write_summary(results, out_folder):
+    """Print the success/failure table and save it as batch_clip_summary.csv."""
+    summary_path = os.path.join(out_folder, 'batch_clip_summary.csv')
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['case', 'status', 'branches', 'seconds', 'output'])
+        writer.writeheader()
+        writer.writerows(results)
+
+    width = max([len(r['case']) for r in results] + [4])
+    print("\n" + "=" * 70)
+    print("  BATCH CLIPPING SUMMARY")
+    print("=" * 70)
+    print("  {:<{w}}  {:<10}  {:>8}  {:>8}  {}".format('case', 'status', 'branches', 'time [s]', 'output',
+                                                     w=width))
+    for r in results:
+        print("  {:<{w}}  {:<10}  {:>8}  {:>8}  {}".format(r['case'], r['status'], str(r['branches'] or '-'),
+                                                         r['seconds'], r['output'] or '-', w=width))
+    n_ok = sum(r['status'] == 'success' for r in results)
+    print("-" * 70)
+    print("  {} / {} surfaces clipped. Summary: {}".format(n_ok, len(results), summary_path))
+    print("=" * 70 + "\n")
+    return summary_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m package.batch_clip',
+                                     description='Automatically clip the outlets of many SeqSeg surfaces.')
+    parser.add_argument('pairs', nargs='?', help='CSV with surface and centerline columns')
+    parser.add_argument('--surfaces', help='glob of SeqSeg surfaces (instead of a CSV)')
+    parser.add_argument('--centerlines', help='glob of the matching SeqSeg centerlines')
+    parser.add_argument('--out', required=True, help='folder holding one output folder per case')
+    parser.add_argument('--workers', type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help='number of surfaces clipped at once')
+    parser.add_argument('--box-scale', type=float, default=10.0,
+                        help='clipping box size in vessel radii (default: 10)')
+    args = parser.parse_args(argv)
+
+    if not args.pairs and not (args.surfaces and args.centerlines):
+        parser.error('give a CSV of pairs, or both --surfaces and --centerlines')
+
+    os.makedirs(args.out, exist_ok=True)
+    try:
+        pairs = find_pairs(args.pairs, args.surfaces, args.centerlines, os.path.abspath(args.out))
+    except ValueError as e:
+        print("  [ERROR] " + str(e))
+        return 1
+    if not pairs:
+        print("  [ERROR] No surface/centerline pairs found")
+        return 1
+
+    print("\n" + "=" * 70)
+    print("  [STEP] BATCH CLIPPING: {} surfaces on {} workers".format(len(pairs), args.workers))
+    print("=" * 70)
+    for pair in pairs:
+        print("  {}: {} + {}".format(pair['case'], os.path.basename(pair['surface']),
+                                     os.path.basename(pair['centerline'])))
+
+    results = run_batch(pairs, max(1, args.workers), args.box_scale)
+    write_summary(results, args.out)
+    return 0 if all(r['status'] == 'success' for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
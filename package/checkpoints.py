@@ -0,0 +1,157 @@
+"""
+checkpoints.py - Stage completion checkpoints for resumable MIROS runs
+
+__main__.py records the outcome of each top-level stage in
+<master_folder>/miros_checkpoints.json:
+
+    {"stages": {"preprocess": {"status": "ok", "outputs": [...], "time": ...}, ...}}
+
+status is 'running' while a stage executes and then 'ok', 'failed' or
+'interrupted' (Ctrl-C, including during a prompt). `python -m package --resume`
+skips every leading stage whose checkpoint is 'ok' and whose outputs still
+exist, and runs everything from the first incomplete stage on, so a crash in
+the OneDSolver or the 0D solve does not cost the remesh and TetGen time again.
+
+Outputs are the concrete result files of a stage (e.g. 0D_results.csv), not
+their folders: a folder exists as soon as a stage starts writing into it.
+Glob patterns such as 1D_results/*_flow.dat must match at least one file and
+are stored as the files they matched. A stage that returns with an output
+missing is recorded as 'incomplete'.
+"""
+
+import os
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+CHECKPOINT_FILE = 'miros_checkpoints.json'
+
+# top-level stages of the full workflow, in execution order
+STAGES = ('preprocess', 'inflow', 'setup_and_run_1d', 'extract_1d',
+          'setup_0d', 'run_0d', 'extract_0d')
+
+
+def resolve_outputs(outputs):
+    """
+    Expand glob patterns among `outputs`.
+
+    Returns:
+    - files:   absolute paths of the existing outputs
+    - missing: outputs (or patterns) without a file
+    """
+    files, missing = [], []
+    for p in outputs:
+        matches = sorted(glob.glob(p)) if glob.has_magic(p) else ([p] if os.path.exists(p) else [])
+        if not matches:
+            missing.append(p)
+        files += [os.path.abspath(m) for m in matches]
+    return files, missing
+
+
+class Checkpoints:
+    """
+    Checkpoint file of one case.
+
+    Parameters:
+    - folder: Case master folder; checkpoints live at folder/miros_checkpoints.json.
+    - resume: Skip leading stages that already completed in an earlier run.
+    """
+
+    def __init__(self, folder, resume=False):
+        self.folder = folder
+        self.path = os.path.join(folder, CHECKPOINT_FILE)
+        self.resuming = resume
+        self._lock = threading.Lock()  # the parallel 0D branch records from a thread
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {'stages': {}}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {'stages': {}}
+        data.setdefault('stages', {})
+        return data
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def reset(self):
+        """Forget all checkpoints (start of a fresh full run)."""
+        with self._lock:
+            self._data = {'stages': {}}
+            self._save()
+
+    def is_complete(self, stage):
+        """True if `stage` finished successfully and its outputs still exist."""
+        entry = self._data['stages'].get(stage)
+        if entry is None or entry['status'] != 'ok':
+            return False
+        return all(os.path.exists(p) for p in entry['outputs'])
+
+    def first_incomplete(self):
+        """Name of the first stage of the full workflow that has to run, or None."""
+        for stage in STAGES:
+            if not self.is_complete(stage):
+                return stage
+        return None
+
+    def pending(self, stage):
+        """
+        Whether `stage` has to run. While resuming, completed stages are
+        skipped until the first incomplete one; every stage after it runs.
+        """
+        if self.resuming and self.is_complete(stage):
+            print("  → [RESUME] '{}' completed in a previous run, skipping".format(stage))
+            return False
+        self.resuming = False
+        return True
+
+    def mark(self, stage, status, outputs=()):
+        """
+        Record the status (and on success the outputs) of `stage`. An 'ok'
+        stage whose outputs do not all exist is recorded as 'incomplete'.
+        """
+        files, missing = resolve_outputs(outputs)
+        if status == 'ok' and missing:
+            print("  [WARNING] '{}' finished without {}; it will run again on --resume"
+                  .format(stage, ', '.join(missing)))
+            status = 'incomplete'
+        with self._lock:
+            self._data['stages'][stage] = {
+                'status': status,
+                'outputs': files,
+                'time': time.time(),
+            }
+            self._save()
+
+    @contextmanager
+    def stage(self, stage, outputs=()):
+        """
+        Checkpoint the enclosed block:
+
+            if checkpoints.pending('run_0d'):
+                with checkpoints.stage('run_0d', outputs=[os.path.join(res_folder_0D, '0D_results.csv')]):
+                    ...
+        """
+        self.mark(stage, 'running')
+        try:
+            yield
+        except KeyboardInterrupt:
+            self.mark(stage, 'interrupted')
+            raise
+        except SystemExit as e:
+            self.mark(stage, 'failed' if e.code else 'ok', () if e.code else outputs)
+            raise
+        except BaseException:
+            self.mark(stage, 'failed')
+            raise
+        self.mark(stage, 'ok', outputs)
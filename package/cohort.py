@@ -0,0 +1,230 @@
+"""
+cohort.py - Run the MIROS pipeline for many patients on a bounded worker pool
+
+Usage:
+    python -m package.cohort SURFACES --out COHORT_FOLDER --manifest run.yaml [--workers 2]
+
+SURFACES is either
+  - a directory of clipped surfaces (*.vtp); the case name is the file stem, or
+  - a CSV with a `case` and a `surface` column, and optionally `master_folder`,
+    `inlet_cap`, `inflow`, `surf_name`, `edge_size` and `centerline` columns.
+    Without a `centerline` the automatic edge size uses the surface only.
+
+Each case runs `python -m package` headless in its own process and master
+folder (COHORT_FOLDER/<case> unless the CSV says otherwise), with its output
+in <master_folder>/miros.log. The base manifest is copied into every master
+folder with the per-case values (e.g. `inlet_cap`) filled in. A success /
+failure table is printed at the end and written to COHORT_FOLDER/cohort_summary.csv.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from package import case_config
+from package.config import CaseConfig
+from package.manifest import MANIFEST_ENV, load_manifest
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def find_cases(source, out_folder):
+    """
+    Build the case list from a directory of surfaces or a CSV file.
+
+    Returns:
+    - cases: list of dicts with at least 'case', 'surface' and 'master_folder'.
+
+    Raises ValueError if two cases share a name or a master folder.
+    """
+    cases = []
+    if os.path.isdir(source):
+        for surface in sorted(glob.glob(os.path.join(source, '*.vtp'))):
+            cases.append({'case': os.path.splitext(os.path.basename(surface))[0],
+                          'surface': surface})
+    else:
+        with open(source, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+                if not row.get('surface'):
+                    continue
+                row.setdefault('case', os.path.splitext(os.path.basename(row['surface']))[0])
+                if not row['case']:
+                    row['case'] = os.path.splitext(os.path.basename(row['surface']))[0]
+                cases.append(row)
+
+    for case in cases:
+        case['surface'] = os.path.abspath(case['surface'])
+        if case.get('centerline'):
+            case['centerline'] = os.path.abspath(case['centerline'])
+        if not case.get('master_folder'):
+            case['master_folder'] = os.path.join(out_folder, case['case'])
+        case['master_folder'] = os.path.abspath(case['master_folder'])
+    check_unique(cases)
+    return cases
+
+
+def check_unique(cases, keys=('case', 'master_folder'), label='Cases'):
+    """
+    Two cases with one name or master folder would overwrite each other's results.
+
+    Parameters:
+    - cases: list of dicts with a 'surface' and every key in `keys`.
+    - keys:  Keys whose values must differ between all cases.
+    - label: What the cases are, for the error message (e.g. 'Surfaces').
+
+    Raises ValueError naming the two surfaces that clash.
+    """
+    for key in keys:
+        seen = {}
+        for case in cases:
+            if case[key] in seen:
+                raise ValueError("{} {} and {} have the same {}: {}".format(
+                    label, seen[case[key]]['surface'], case['surface'], key, case[key]))
+            seen[case[key]] = case
+
+
+def case_settings(case):
+    """CaseConfig of one cohort case, on top of the defaults in package/__init__.py."""
+    values = {'master_folder': case['master_folder'], 'clipped_surface': case['surface']}
+    for key in ('surf_name', 'edge_size', 'centerline'):
+        if case.get(key):
+            values[key] = case[key]
+    return CaseConfig.from_dict(values, case_config)
+
+
+def prepare_case(case, base_manifest, default_inflow=None):
+    """
+    Create the case master folder, its inflow file and its own run manifest.
+
+    Returns:
+    - manifest_path: path of the per-case manifest (JSON).
+    """
+    os.makedirs(case['master_folder'], exist_ok=True)
+
+    inflow_src = case.get('inflow') or default_inflow
+    inflow_dst = os.path.join(case['master_folder'], 'inflow_1d.flow')
+    if inflow_src and os.path.abspath(inflow_src) != inflow_dst:
+        shutil.copy2(inflow_src, inflow_dst)
+
+    manifest = json.loads(json.dumps(base_manifest))  # deep copy
+    if case.get('inlet_cap'):
+        manifest['inlet_cap'] = case['inlet_cap']
+    manifest_path = os.path.join(case['master_folder'], 'run_manifest.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+
+def run_case(case, base_manifest, default_inflow=None):
+    """
+    Run the full pipeline for one case in a separate process.
+
+    Returns:
+    - result: dict with case name, status, return code, wall time and log path.
+    """
+    start = time.time()
+    log_path = os.path.join(case['master_folder'], 'miros.log')
+    try:
+        manifest_path = prepare_case(case, base_manifest, default_inflow)
+
+        env = case_settings(case).to_env()
+        env[MANIFEST_ENV] = manifest_path
+        prev = env.get('PYTHONPATH', '')
+        env['PYTHONPATH'] = project_root + (os.pathsep + prev if prev else '')
+
+        with open(log_path, 'w') as log_file:
+            ret = subprocess.run(
+                [sys.executable, '-m', 'package', '--manifest', manifest_path],
+                cwd=project_root,
+                env=env,
+                stdin=subprocess.DEVNULL,  # a stray prompt fails instead of hanging the worker
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            ).returncode
+        status = 'success' if ret == 0 else 'failed'
+    except Exception as e:
+        ret = None
+        status = 'error: ' + str(e)
+
+    return {'case': case['case'], 'status': status, 'returncode': ret,
+            'seconds': round(time.time() - start, 1), 'log': log_path}
+
+
+def run_cohort(cases, base_manifest, workers=2, default_inflow=None):
+    """Run all cases on a pool of at most `workers` concurrent pipelines."""
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_case, case, base_manifest, default_inflow): case for case in cases}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print("  [{}/{}] {}: {} ({} s)".format(len(results), len(cases), result['case'],
+                                                  result['status'], result['seconds']))
+    order = {case['case']: i for i, case in enumerate(cases)}
+    results.sort(key=lambda r: order[r['case']])
+    return results
+
+
+def write_summary(results, out_folder):
+    """Print the success/failure table and save it as cohort_summary.csv."""
+    summary_path = os.path.join(out_folder, 'cohort_summary.csv')
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['case', 'status', 'returncode', 'seconds', 'log'])
+        writer.writeheader()
+        writer.writerows(results)
+
+    width = max([len(r['case']) for r in results] + [4])
+    print("\n" + "=" * 70)
+    print("  COHORT SUMMARY")
+    print("=" * 70)
+    print("  {:<{w}}  {:<10}  {:>8}  {}".format('case', 'status', 'time [s]', 'log', w=width))
+    for r in results:
+        print("  {:<{w}}  {:<10}  {:>8}  {}".format(r['case'], r['status'], r['seconds'], r['log'], w=width))
+    n_ok = sum(r['status'] == 'success' for r in results)
+    print("-" * 70)
+    print("  {} / {} cases succeeded. Summary: {}".format(n_ok, len(results), summary_path))
+    print("=" * 70 + "\n")
+    return summary_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m package.cohort',
+                                     description='Run MIROS for a cohort of patients in parallel.')
+    parser.add_argument('source', help='directory of clipped surfaces (*.vtp) or a CSV of cases')
+    parser.add_argument('--out', required=True, help='folder holding one master folder per case')
+    parser.add_argument('--manifest', required=True,
+                        help='base run manifest applied to every case (per-case inlet_cap from the CSV)')
+    parser.add_argument('--workers', type=int, default=2, help='number of cases run at once (default: 2)')
+    parser.add_argument('--inflow', default=None, help='inflow_1d.flow copied into cases without their own')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    try:
+        cases = find_cases(args.source, os.path.abspath(args.out))
+    except ValueError as e:
+        print("  [ERROR] " + str(e))
+        return 1
+    if not cases:
+        print("  [ERROR] No cases found in: " + args.source)
+        return 1
+
+    base_manifest = load_manifest(args.manifest)
+    print("\n" + "=" * 70)
+    print("  [STEP] COHORT: {} cases on {} workers".format(len(cases), args.workers))
+    print("=" * 70)
+
+    results = run_cohort(cases, base_manifest, max(1, args.workers), args.inflow)
+    write_summary(results, args.out)
+    return 0 if all(r['status'] == 'success' for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
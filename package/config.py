@@ -0,0 +1,176 @@
+"""
+config.py - Per-case configuration
+
+A CaseConfig holds everything that differs between patients: the master
+folder, the clipped surface, its SeqSeg centerline, the model name and the
+remeshing edge size, plus the result/caps/inflow paths derived from the
+master folder.
+
+The stage scripts run as separate processes and read their case with
+CaseConfig.from_env(): the defaults edited in package/__init__.py, then an
+optional case file named by MIROS_CASE_CONFIG, then single MIROS_* variables.
+Whoever launches the stages (__main__.py, the cohort runner) describes the
+case once and hands it down with to_env(), so several cases can run side by
+side from one Python process or pool without touching the source.
+
+Case file (.json, .yaml or .ini with a [miros] or [case] section):
+
+    master_folder: /data/cohort/patient_07
+    clipped_surface: /data/surfaces/patient_07.vtp   # relative: to the case file
+    centerline: /data/centerlines/patient_07.vtp     # optional, radii for edge_size: auto
+    surf_name: patient_07
+    edge_size: auto                                   # or a number
+"""
+
+import os
+from dataclasses import dataclass, fields, replace
+
+try:
+    from package.manifest import load_manifest
+except ImportError:  # imported next to the stage scripts (from __init__ import *)
+    from manifest import load_manifest
+
+CASE_ENV = 'MIROS_CASE_CONFIG'
+
+# CaseConfig field -> environment variable overriding it
+FIELD_ENV = {
+    'master_folder': 'MIROS_MASTER_FOLDER',
+    'clipped_surface': 'MIROS_CLIPPED_SURFACE',
+    'centerline': 'MIROS_CENTERLINE',
+    'surf_name': 'MIROS_SURF_NAME',
+    'edge_size': 'MIROS_EDGE_SIZE',
+}
+
+
+def parse_edge_size(value):
+    """'auto' stays 'auto', anything else is read as a number."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lower() == 'auto':
+            return 'auto'
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError("edge_size must be 'auto' or a number, got '{}'".format(value))
+    return value
+
+
+@dataclass(frozen=True)
+class CaseConfig:
+    """
+    Paths and settings of one case.
+
+    Parameters:
+    - master_folder:   Folder holding every input and output of the case.
+    - clipped_surface: Clipped (outlet-defined) surface mesh, .vtp.
+    - surf_name:       Model name written to the solver input files.
+    - edge_size:       Remeshing edge size, 'auto' or a number in model units.
+    - bc_filename:     Outlet boundary condition file in master_folder.
+    - centerline:      SeqSeg centerline of this surface (with radii), or None.
+                       A case with a different surface than its base does
+                       not inherit the base's centerline.
+    """
+    master_folder: str
+    clipped_surface: str
+    surf_name: str = 'my_surface'
+    edge_size: object = 'auto'
+    bc_filename: str = 'rcrt.dat'
+    centerline: str = None
+
+    # --- derived paths (fixed layout of a master folder) ---
+    @property
+    def res_folder_1D(self):
+        return os.path.join(self.master_folder, '1D_results')
+
+    @property
+    def res_folder_0D(self):
+        return os.path.join(self.master_folder, '0D_results')
+
+    @property
+    def caps_folder(self):
+        return os.path.join(self.master_folder, 'caps_and_wall')
+
+    @property
+    def inflow_file_path(self):
+        return os.path.join(self.master_folder, 'inflow_1d.flow')
+
+    def path(self, *parts):
+        """Path inside the master folder."""
+        return os.path.join(self.master_folder, *parts)
+
+    # --- construction ---
+    @classmethod
+    def from_dict(cls, values, base=None, relative_to=None):
+        """
+        Build a config from a dict of field values, on top of `base` if given.
+        Relative paths are resolved against `relative_to`.
+        """
+        known = {f.name for f in fields(cls)}
+        unknown = set(values) - known
+        if unknown:
+            raise ValueError("Unknown case setting(s): {} (expected {})"
+                             .format(', '.join(sorted(unknown)), ', '.join(sorted(known))))
+        values = dict(values)
+        if 'edge_size' in values:
+            values['edge_size'] = parse_edge_size(values['edge_size'])
+        for key in ('master_folder', 'clipped_surface', 'centerline'):
+            if values.get(key) and relative_to and not os.path.isabs(values[key]):
+                values[key] = os.path.join(relative_to, values[key])
+        if 'centerline' in values:
+            values['centerline'] = values['centerline'] or None
+        if base is not None:
+            # the base centerline belongs to the base surface only
+            if 'centerline' not in values and values.get('clipped_surface') and base.clipped_surface and \
+                    os.path.abspath(values['clipped_surface']) != os.path.abspath(base.clipped_surface):
+                values['centerline'] = None
+            return replace(base, **values)
+        return cls(**values)
+
+    @classmethod
+    def from_file(cls, path, base=None):
+        """Read a case file (.json/.yaml/.ini); a `case` block is used if present."""
+        data = load_manifest(path)
+        data = data.get('case', data)
+        return cls.from_dict(data, base, relative_to=os.path.dirname(os.path.abspath(path)))
+
+    @classmethod
+    def from_env(cls, base, environ=None):
+        """
+        Apply MIROS_CASE_CONFIG and the single MIROS_* overrides to `base`.
+        This is how every stage process finds out which case it works on.
+        """
+        environ = os.environ if environ is None else environ
+        config = base
+        if environ.get(CASE_ENV):
+            config = cls.from_file(environ[CASE_ENV], config)
+        overrides = {name: environ[var] for name, var in FIELD_ENV.items() if environ.get(var)}
+        return cls.from_dict(overrides, config) if overrides else config
+
+    def to_env(self, environ=None):
+        """
+        Copy of `environ` (default: os.environ) that makes stage processes
+        launched with it work on this case.
+        """
+        env = dict(os.environ if environ is None else environ)
+        env.pop(CASE_ENV, None)  # the explicit values below describe the case completely
+        for name, var in FIELD_ENV.items():
+            value = getattr(self, name)
+            env[var] = '' if value is None else str(value)
+        return env
+
+    def as_globals(self):
+        """The module-level names scripts get from `from package import *`."""
+        return {
+            'master_folder': self.master_folder,
+            'clipped_seqseg_results': self.clipped_surface,
+            'seqseg_cl': self.centerline,
+            'surf_name': self.surf_name,
+            'edge_size': self.edge_size,
+            'edge_min': self.edge_size,
+            'edge_max': self.edge_size,
+            'bc_filename': self.bc_filename,
+            'res_folder_1D': self.res_folder_1D,
+            'res_folder_0D': self.res_folder_0D,
+            'caps_folder': self.caps_folder,
+            'inflow_file_path': self.inflow_file_path,
+        }
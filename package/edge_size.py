@@ -0,0 +1,135 @@
+"""
+edge_size.py - Automatic remeshing edge size from the surface (and its centerline)
+
+The 'auto' edge size of sv_preprocess.py starts from the median edge length
+of the clipped surface and, when the case has a SeqSeg centerline with
+inscribed-sphere radii, is reduced so the smallest vessels get enough edges
+around their circumference. Only NumPy and VTK are used, so this module also
+works outside SimVascular (helper_func.py re-exports it for the stages).
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from package.vtk_utils import get_points, get_point_array, get_polys
+except ImportError:  # imported next to the stage scripts (from __init__ import *)
+    from vtk_utils import get_points, get_point_array, get_polys
+
+
+def surface_edge_lengths(polydata, unique=False):
+    """
+    Length of every edge of a surface mesh, computed in one NumPy pass.
+
+    Parameters:
+    - polydata: VTK PolyData object (surface mesh, any polygon type)
+    - unique:   Count edges shared by two cells once (needs a sort; by default
+                each cell contributes all of its edges, which leaves the
+                length statistics of a closed surface unchanged)
+
+    Returns:
+    - lengths: 1D numpy array of non-zero edge lengths
+    """
+    if polydata.GetNumberOfPoints() == 0 or polydata.GetNumberOfPolys() == 0:
+        return np.zeros(0)
+    points = get_points(polydata).astype(np.float64, copy=False)
+    offsets, conn = get_polys(polydata)
+
+    # each corner connects to the next corner of its cell, the last one back to the first
+    nxt = np.arange(1, conn.size + 1)
+    nxt[offsets[1:] - 1] = offsets[:-1]
+    a, b = conn, conn[nxt]
+    if unique:
+        n = np.int64(points.shape[0])
+        keys = np.unique(np.minimum(a, b) * n + np.maximum(a, b))
+        a, b = np.divmod(keys, n)
+    d = points[b] - points[a]
+    lengths = np.sqrt(np.einsum('ij,ij->i', d, d))
+    return lengths[lengths > 0]
+
+
+def _centerline_radii(centerline):
+    """Inscribed-sphere radii of a centerline, or None if it carries none."""
+    if centerline is None:
+        return None
+    for name in ('MaximumInscribedSphereRadius', 'Radius', 'radius'):
+        radii = get_point_array(centerline, name)
+        if radii is not None and radii.size > 0:
+            radii = radii.astype(np.float64).ravel()
+            radii = radii[radii > 0]
+            return radii if radii.size else None
+    return None
+
+
+def centerline_fits_surface(centerline, polydata, min_fraction=0.9, margin=0.05):
+    """
+    Whether a centerline plausibly belongs to a surface: at least
+    `min_fraction` of its points lie inside the surface's bounding box,
+    padded by `margin` of the box size. Guards against a centerline of a
+    different patient (or in different units) silently steering remeshing.
+    """
+    points = get_points(centerline)
+    if points.shape[0] == 0 or polydata.GetNumberOfPoints() == 0:
+        return False
+    bounds = np.asarray(polydata.GetBounds(), dtype=np.float64).reshape(3, 2)
+    pad = margin * (bounds[:, 1] - bounds[:, 0]).max()
+    inside = np.all((points >= bounds[:, 0] - pad) & (points <= bounds[:, 1] + pad), axis=1)
+    return bool(inside.mean() >= min_fraction)
+
+
+def edge_size_estimate(polydata, centerline=None, elements_around=16):
+    """
+    Edge-length statistics of a surface and the edge size recommended for remeshing.
+
+    Parameters:
+    - polydata:        VTK PolyData object (surface mesh)
+    - centerline:      Optional centerline PolyData with a radius point array
+                       (e.g. MaximumInscribedSphereRadius); ignored unless it
+                       lies within the surface (centerline_fits_surface)
+    - elements_around: Edges wanted around the circumference of the smallest vessels
+
+    Returns:
+    - estimate: dict with 'dims', 'n_edges', 'mean', 'p5', 'p25', 'median',
+                'p75', 'p95', 'radius_p10', 'radius_based', 'centerline_ignored'
+                and 'recommended'
+    """
+    bounds = polydata.GetBounds()
+    dims = (bounds[1] - bounds[0], bounds[3] - bounds[2], bounds[5] - bounds[4])
+    max_dim = max(dims)
+
+    lengths = surface_edge_lengths(polydata)
+    estimate = {'dims': dims, 'n_edges': int(lengths.size), 'radius_p10': None, 'radius_based': None}
+    if lengths.size:
+        p5, p25, median, p75, p95 = np.percentile(lengths, [5, 25, 50, 75, 95])
+        estimate.update(mean=float(lengths.mean()), p5=p5, p25=p25, median=median, p75=p75, p95=p95)
+    else:
+        # Fallback: use 1.5% of max dimension
+        fallback = max_dim * 0.015
+        estimate.update(mean=fallback, p5=fallback, p25=fallback, median=fallback, p75=fallback, p95=fallback)
+
+    # Baseline: median edge length, robust against the few slivers and
+    # stretched triangles that dominate a mean over a small sample
+    recommended = estimate['median']
+
+    # Radius-aware: resolve the smallest vessels (10th percentile radius)
+    # with `elements_around` edges around their circumference
+    estimate['centerline_ignored'] = centerline is not None and not centerline_fits_surface(centerline, polydata)
+    radii = None if estimate['centerline_ignored'] else _centerline_radii(centerline)
+    if radii is not None:
+        estimate['radius_p10'] = float(np.percentile(radii, 10))
+        estimate['radius_based'] = 2.0 * math.pi * estimate['radius_p10'] / elements_around
+        recommended = min(recommended, estimate['radius_based'])
+
+    # Clamp to reasonable range based on model size
+    min_allowed = max_dim * 0.005  # At least 0.5% of model size
+    max_allowed = max_dim * 0.03   # At most 3% of model size
+    recommended = max(min_allowed, min(max_allowed, recommended))
+
+    # Round to 2 significant figures for cleaner value
+    if recommended > 0:
+        magnitude = 10 ** math.floor(math.log10(abs(recommended)))
+        recommended = round(recommended / magnitude, 1) * magnitude
+
+    estimate['recommended'] = float(recommended)
+    return estimate
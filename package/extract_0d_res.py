@@ -20,6 +20,9 @@ import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from package import *
+from package.manifest import ask
+from package.stage_cache import StageCache
+from package.profiling import StageTimer
 
 # --- Helper functions for formatted output ---
 def print_section_header(title):
@@ -46,21 +49,43 @@ def print_error(message):
 
 try:
     import pandas as pd
-    import matplotlib.pyplot as plt
 except ImportError as e:
     print_error("Missing required package: " + str(e))
     print_info("Install with: pip install pandas matplotlib")
     sys.exit(1)
 
+# matplotlib is imported only when plots are requested (see GENERATING PLOTS below)
+plt = None
+
+
+def load_pyplot(interactive):
+    """
+    Import matplotlib.pyplot on first use. Without an interactive window the
+    Agg backend is selected, which skips loading any GUI toolkit.
+    """
+    global plt
+    if plt is None:
+        try:
+            import matplotlib
+            if not interactive:
+                matplotlib.use('Agg')
+            import matplotlib.pyplot
+        except ImportError as e:
+            print_error("Missing required package: " + str(e))
+            print_info("Install with: pip install pandas matplotlib")
+            sys.exit(1)
+        plt = matplotlib.pyplot
+    return plt
+
 # ========================================================================
 # ============================ Helper Functions ===========================
 
-def get_cardiac_cycle_duration():
+def get_cardiac_cycle_duration(case):
     """
     Get the cardiac cycle duration from the inflow file.
     """
     try:
-        inflow_data = np.loadtxt(inflow_file_path)
+        inflow_data = np.loadtxt(case.inflow_file_path)
         cycle_duration = inflow_data[-1, 0]
         return cycle_duration
     except Exception as e:
@@ -68,11 +93,11 @@ def get_cardiac_cycle_duration():
         return 1.0
 
 
-def load_0d_results():
+def load_0d_results(case):
     """
     Load 0D results from CSV file.
     """
-    results_file = os.path.join(res_folder_0D, '0D_results.csv')
+    results_file = os.path.join(case.res_folder_0D, '0D_results.csv')
 
     if not os.path.exists(results_file):
         print_error("0D results file not found: " + results_file)
@@ -276,12 +301,13 @@ def save_summary_statistics(df, outlets, cycle_duration, output_path):
 # ========================================================================
 # ============================ Main Execution =============================
 
-if __name__ == "__main__":
+def main(case):
+    """Extract the 0D results of one case (a CaseConfig): statistics and plots."""
     print_section_header("EXTRACT 0D RESULTS")
 
     # Load results
     print_info("Loading 0D results...")
-    df = load_0d_results()
+    df = load_0d_results(case)
 
     if df is None:
         sys.exit(1)
@@ -291,7 +317,7 @@ if __name__ == "__main__":
     # Get segment info
     segments = get_segment_names(df)
     outlets = get_outlet_segments(df)
-    cycle_duration = get_cardiac_cycle_duration()
+    cycle_duration = get_cardiac_cycle_duration(case)
 
     print_info("Total segments: " + str(len(segments)))
     print_info("Outlet segments: " + str(len(outlets)))
@@ -305,7 +331,8 @@ if __name__ == "__main__":
 
     # Show plots?
     while True:
-        answer = input("  Show plots? (yes/no): ").lower()
+        answer = ask('extract_0d.show_plots', "  Show plots? (yes/no): ",
+                     choices=('yes', 'y', 'no', 'n'), default='no').lower()
         if answer in ["yes", "y"]:
             show_plots = True
             break
@@ -317,7 +344,8 @@ if __name__ == "__main__":
 
     # Save plots?
     while True:
-        answer = input("  Save plots to files? (yes/no): ").lower()
+        answer = ask('extract_0d.save_plots', "  Save plots to files? (yes/no): ",
+                     choices=('yes', 'y', 'no', 'n'), default='yes').lower()
         if answer in ["yes", "y"]:
             save_plots = True
             break
@@ -329,7 +357,8 @@ if __name__ == "__main__":
 
     # Extract all or outlets only?
     while True:
-        answer = input("  Extract all segments or outlets only? (all/outlets): ").lower()
+        answer = ask('extract_0d.segments', "  Extract all segments or outlets only? (all/outlets): ",
+                     choices=('all', 'a', 'outlets', 'outlet', 'o'), default='outlets').lower()
         if answer in ["all", "a"]:
             target_segments = segments
             break
@@ -349,9 +378,10 @@ if __name__ == "__main__":
     df_last_cycle = extract_last_cycle(df, cycle_duration)
 
     # Save statistics
-    stats_path = os.path.join(res_folder_0D, '0D_statistics.csv')
+    stats_path = os.path.join(case.res_folder_0D, '0D_statistics.csv')
     print_info("Computing statistics...")
-    stats_df = save_summary_statistics(df, target_segments, cycle_duration, stats_path)
+    with StageTimer('0d_statistics', case.master_folder, outputs=[stats_path]):
+        stats_df = save_summary_statistics(df, target_segments, cycle_duration, stats_path)
 
     # Display summary
     print("\n" + "-" * 70)
@@ -360,13 +390,20 @@ if __name__ == "__main__":
     print(stats_df.to_string(index=False))
     print("-" * 70)
 
-    # Generate plots
-    if show_plots or save_plots:
+    # Saved plots are only redrawn when the results or the segment selection change
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+    plot_inputs = [os.path.join(case.res_folder_0D, '0D_results.csv'), case.inflow_file_path]
+    plot_params = {'segments': target_segments}
+    plot_outputs = [os.path.join(case.res_folder_0D, '0D_all_outlets.png')]
+    if save_plots and not show_plots and stage_cache.is_fresh('extract_0d', plot_inputs, plot_params, plot_outputs):
+        stage_cache.skip_message('extract_0d')
+    elif show_plots or save_plots:
         print_section_header("GENERATING PLOTS")
+        load_pyplot(interactive=show_plots)
 
         # Plot all outlets together
         if save_plots:
-            all_outlets_path = os.path.join(res_folder_0D, '0D_all_outlets.png')
+            all_outlets_path = os.path.join(case.res_folder_0D, '0D_all_outlets.png')
         else:
             all_outlets_path = None
 
@@ -385,18 +422,25 @@ if __name__ == "__main__":
                 seg_data = extract_segment_data(df, seg)
                 seg_data = extract_last_cycle(seg_data, cycle_duration)
 
-                plot_path = os.path.join(res_folder_0D, '0D_' + seg + '.png')
+                plot_path = os.path.join(case.res_folder_0D, '0D_' + seg + '.png')
                 fig = plot_segment_waveforms(seg_data, seg, plot_path)
                 plt.close(fig)
 
+        if save_plots:
+            stage_cache.record('extract_0d', plot_inputs, plot_params, plot_outputs)
+
     # Final summary
     print_section_header("EXTRACTION COMPLETE")
 
     print_info("Output files:")
     print("    - Statistics: " + stats_path)
     if save_plots:
-        print("    - Plots: " + res_folder_0D + "/0D_*.png")
+        print("    - Plots: " + case.res_folder_0D + "/0D_*.png")
 
     print("\n" + "-" * 70)
     print("  0D result extraction complete!")
     print("-" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    main(case_config)
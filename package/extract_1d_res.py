@@ -21,6 +21,10 @@ import shutil
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from package import *
+from package.manifest import ask
+from package.stage_cache import StageCache
+from package.profiling import StageTimer
+from package.volume_mesh import current_state as current_volume_mesh_state, request_volume_mesh
 
 # --- Helper functions for formatted output (added by Claude) ---
 def print_section_header(title):
@@ -52,30 +56,34 @@ SV_SITE_PACKAGES = Path("/usr/local/sv/simvascular/2025-06-21/Python3.11/site-pa
 if str(SV_SITE_PACKAGES) not in sys.path:
     sys.path.insert(0, str(SV_SITE_PACKAGES))
 
-# Import SimVascular extraction modules
-try:
-    from sv_rom_extract_results.extract_results import run as extract_run
-    from sv_rom_extract_results.manage import init_logging, get_logger_name, get_log_file_name
-    from sv_rom_extract_results import parameters as sv_params
-    from sv_rom_extract_results import solver as sv_solver
-    print_status("SimVascular extraction modules loaded successfully")
-except ImportError as e:
-    print_error("Failed to import SimVascular extraction modules: " + str(e))
-    print_info("Make sure SimVascular is installed and paths are correct")
-    sys.exit(1)
+def load_extraction_modules():
+    """
+    Import the SimVascular extraction modules. They pull in vtk and matplotlib,
+    so this only happens when results actually have to be extracted (not when
+    the stage cache is fresh).
+    """
+    try:
+        from sv_rom_extract_results.extract_results import run as extract_run
+        from sv_rom_extract_results.manage import init_logging
+        print_status("SimVascular extraction modules loaded successfully")
+    except ImportError as e:
+        print_error("Failed to import SimVascular extraction modules: " + str(e))
+        print_info("Make sure SimVascular is installed and paths are correct")
+        sys.exit(1)
+    return extract_run, init_logging
 
 # ========================================================================
 # ============================ Helper Functions ===========================
 
-def prepare_results_directory():
+def prepare_results_directory(case):
     """
     Ensure the results directory has all required files.
     The SimVascular extraction expects solver file and .dat files in same directory.
 
     Modified by Claude: Handle directory structure where solver file and results are separate
     """
-    solver_file_src = os.path.join(master_folder, '1D_solver_input.in')
-    solver_file_dst = os.path.join(res_folder_1D, '1D_solver_input.in')
+    solver_file_src = os.path.join(case.master_folder, '1D_solver_input.in')
+    solver_file_dst = os.path.join(case.res_folder_1D, '1D_solver_input.in')
 
     # Copy solver file to results directory if not already there
     if not os.path.exists(solver_file_dst):
@@ -89,8 +97,8 @@ def prepare_results_directory():
         print_info("Solver file already in results directory")
 
     # Copy 1d_model.vtp if it exists (needed for projection)
-    model_file_src = os.path.join(master_folder, '1d_model.vtp')
-    model_file_dst = os.path.join(res_folder_1D, '1d_model.vtp')
+    model_file_src = os.path.join(case.master_folder, '1d_model.vtp')
+    model_file_dst = os.path.join(case.res_folder_1D, '1d_model.vtp')
     if os.path.exists(model_file_src) and not os.path.exists(model_file_dst):
         shutil.copy2(model_file_src, model_file_dst)
         print_status("Copied 1d_model.vtp to results directory")
@@ -98,16 +106,16 @@ def prepare_results_directory():
     return True
 
 
-def check_results_exist():
+def check_results_exist(case):
     """
     Check if 1D simulation results exist.
 
     Modified by Claude: Added validation before extraction
     """
     # Check for .dat files
-    dat_files = list(Path(res_folder_1D).glob("*_flow.dat"))
+    dat_files = list(Path(case.res_folder_1D).glob("*_flow.dat"))
     if not dat_files:
-        print_error("No flow result files found in: " + res_folder_1D)
+        print_error("No flow result files found in: " + case.res_folder_1D)
         print_info("Please run the 1D simulation first")
         return False
 
@@ -115,7 +123,7 @@ def check_results_exist():
     return True
 
 
-def get_cardiac_cycle_duration():
+def get_cardiac_cycle_duration(case):
     """
     Get the cardiac cycle duration from the inflow file.
 
@@ -123,7 +131,7 @@ def get_cardiac_cycle_duration():
     """
     try:
         # Read the inflow file to get cycle duration
-        inflow_data = np.loadtxt(inflow_file_path)
+        inflow_data = np.loadtxt(case.inflow_file_path)
         cycle_duration = inflow_data[-1, 0]  # Last time value = cycle duration
         print_info("Cardiac cycle duration (from inflow): " + str(cycle_duration) + " s")
         return cycle_duration
@@ -132,15 +140,15 @@ def get_cardiac_cycle_duration():
         return 1.0  # Default fallback
 
 
-def get_simulation_time_range():
+def get_simulation_time_range(case):
     """
     Get the time range for extraction, using the last complete cardiac cycle.
 
     Modified by Claude: Automatically detect cardiac cycle from inflow file
     """
-    solver_file = os.path.join(res_folder_1D, '1D_solver_input.in')
+    solver_file = os.path.join(case.res_folder_1D, '1D_solver_input.in')
     if not os.path.exists(solver_file):
-        solver_file = os.path.join(master_folder, '1D_solver_input.in')
+        solver_file = os.path.join(case.master_folder, '1D_solver_input.in')
 
     time_step = None
     num_steps = None
@@ -158,7 +166,7 @@ def get_simulation_time_range():
 
         if time_step and num_steps:
             total_sim_time = time_step * num_steps
-            cycle_duration = get_cardiac_cycle_duration()
+            cycle_duration = get_cardiac_cycle_duration(case)
 
             # Calculate number of complete cycles
             num_cycles = int(total_sim_time / cycle_duration)
@@ -223,6 +231,7 @@ def extract_results(config: dict):
 
     Modified by Claude: Added error handling and status messages
     """
+    extract_run, init_logging = load_extraction_modules()
     cfg = _canon_cfg(config)
     outdir = Path(cfg["output_directory"])
     outdir.mkdir(parents=True, exist_ok=True)
@@ -244,7 +253,7 @@ def extract_results(config: dict):
         return False
 
 
-def list_output_files():
+def list_output_files(case):
     """
     List the generated output files.
 
@@ -262,7 +271,7 @@ def list_output_files():
     ]
 
     for pattern, description in output_patterns:
-        files = list(Path(res_folder_1D).glob(pattern))
+        files = list(Path(case.res_folder_1D).glob(pattern))
         if files:
             print("    " + description + ":")
             for f in files:
@@ -272,29 +281,30 @@ def list_output_files():
 # ========================================================================
 # ============================ Main Execution =============================
 
-if __name__ == "__main__":
+def main(case):
+    """Extract the 1D results of one case (a CaseConfig)."""
     print_section_header("EXTRACT 1D RESULTS")
 
     # Check if results exist
-    if not check_results_exist():
+    if not check_results_exist(case):
         sys.exit(1)
 
     # Prepare directory (copy solver file if needed)
-    if not prepare_results_directory():
+    if not prepare_results_directory(case):
         sys.exit(1)
 
     # --- Configuration for 1D extraction ---
     # Modified by Claude: Fixed paths and added all options
 
     # Get time range from solver file
-    time_range = get_simulation_time_range()
+    time_range = get_simulation_time_range(case)
 
     config_1d = {
         # Required parameters
         "model_order": 1,
-        "results_directory": res_folder_1D,  # Where .dat files and solver file are
+        "results_directory": case.res_folder_1D,  # Where .dat files and solver file are
         "solver_file_name": "1D_solver_input.in",
-        "output_directory": res_folder_1D,
+        "output_directory": case.res_folder_1D,
         "output_file_name": "extracted_results",  # Base name for output files
         "output_format": "csv",
 
@@ -314,9 +324,9 @@ if __name__ == "__main__":
         # "segments": "Group0_Seg0,Group0_Seg1",
 
         # Geometry files for projection (optional but recommended)
-        "centerlines_file": os.path.join(master_folder, 'extracted_centerlines.vtp'),
-        "walls_mesh_file": os.path.join(master_folder, 'mesh-complete', 'mesh-complete.exterior.vtp'),
-        "volume_mesh_file": os.path.join(master_folder, 'mesh-complete', 'mesh-complete.mesh.vtu'),
+        "centerlines_file": os.path.join(case.master_folder, 'extracted_centerlines.vtp'),
+        "walls_mesh_file": os.path.join(case.master_folder, 'mesh-complete', 'mesh-complete.exterior.vtp'),
+        "volume_mesh_file": os.path.join(case.master_folder, 'mesh-complete', 'mesh-complete.mesh.vtu'),
 
         # Visualization options
         "plot": False,  # Set to True to show matplotlib plots
@@ -324,14 +334,27 @@ if __name__ == "__main__":
     }
 
     # --- Check for volume mesh availability ---
-    volume_mesh_available = os.path.exists(config_1d["volume_mesh_file"])
-    walls_mesh_available = os.path.exists(config_1d["walls_mesh_file"])
-
-    if volume_mesh_available and walls_mesh_available:
-        print_status("Volume mesh found - 3D projection will be available")
+    # The volume mesh is a deferred artifact (see volume_mesh.py): it is only
+    # built, or waited for, when a 3D projection is requested.
+    mesh_state = current_volume_mesh_state(case, use_stage_cache)
+    if mesh_state == 'done':
+        print_status("Volume mesh found - 3D projection is available")
+        prompt, default = "  Project results onto the 3D volume mesh? (yes/no): ", 'yes'
+    elif mesh_state == 'building':
+        print_info("Volume mesh is still being generated in the background")
+        prompt, default = "  Wait for it and project results onto 3D? (yes/no): ", 'yes'
     else:
-        print_info("Volume mesh not found - only centerline projection available")
-        print_info("Run full workflow (option 1) to generate volume mesh for 3D visualization")
+        if mesh_state == 'failed':
+            print_info("Last volume mesh generation failed (see mesh-complete/volume_mesh.log)")
+        prompt, default = "  Build the volume mesh (TetGen, a few minutes) for 3D projection? (yes/no): ", 'no'
+    answer = ask('extract_1d.project_3d', prompt, choices=('yes', 'y', 'no', 'n'), default=default).lower()
+    project_3d = answer in ('yes', 'y')
+
+    if project_3d and request_volume_mesh(case, use_stage_cache):
+        volume_mesh_available = walls_mesh_available = True
+    else:
+        volume_mesh_available = walls_mesh_available = False
+        print_info("Only centerline projection will be extracted")
         config_1d.pop("volume_mesh_file", None)
         config_1d.pop("walls_mesh_file", None)
 
@@ -340,14 +363,15 @@ if __name__ == "__main__":
     print("\n" + "-" * 70)
     print("  >>> EXTRACTION OPTIONS <<<")
     print("-" * 70)
-    print("  Results directory: " + res_folder_1D)
+    print("  Results directory: " + case.res_folder_1D)
     print("  Centerlines file: " + config_1d["centerlines_file"])
     if volume_mesh_available and walls_mesh_available:
         print("  Volume mesh: " + config_1d["volume_mesh_file"])
     print("-" * 70)
 
     while True:
-        answer = input("  Show plots after extraction? (yes/no): ").lower()
+        answer = ask('extract_1d.plot', "  Show plots after extraction? (yes/no): ",
+                     choices=('yes', 'y', 'no', 'n'), default='no').lower()
         if answer in ["yes", "y"]:
             config_1d["plot"] = True
             break
@@ -358,7 +382,8 @@ if __name__ == "__main__":
             print("  [ERROR] Please enter 'yes' or 'no'")
 
     while True:
-        answer = input("  Show 3D geometry viewer? (yes/no): ").lower()
+        answer = ask('extract_1d.display_geometry', "  Show 3D geometry viewer? (yes/no): ",
+                     choices=('yes', 'y', 'no', 'n'), default='no').lower()
         if answer in ["yes", "y"]:
             config_1d["display_geometry"] = True
             break
@@ -369,7 +394,8 @@ if __name__ == "__main__":
             print("  [ERROR] Please enter 'yes' or 'no'")
 
     while True:
-        answer = input("  Extract all segments or only outlets? (all/outlets): ").lower()
+        answer = ask('extract_1d.segments', "  Extract all segments or only outlets? (all/outlets): ",
+                     choices=('all', 'a', 'outlets', 'outlet', 'o'), default='outlets').lower()
         if answer in ["all", "a"]:
             config_1d["outlet_segments"] = False
             config_1d["all_segments"] = True
@@ -386,23 +412,43 @@ if __name__ == "__main__":
     # --- Run extraction ---
     print_section_header("RUNNING EXTRACTION")
 
-    success = extract_results(config_1d)
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+    extract_inputs = sorted(str(f) for f in Path(case.res_folder_1D).glob("*.dat"))
+    extract_inputs += [os.path.join(case.res_folder_1D, '1D_solver_input.in'), case.inflow_file_path]
+    extract_inputs += [config_1d[k] for k in ("centerlines_file", "walls_mesh_file", "volume_mesh_file")
+                       if k in config_1d]
+    interactive = config_1d["plot"] or config_1d["display_geometry"]
+
+    if not interactive and stage_cache.is_fresh('extract_1d', extract_inputs, config_1d):
+        stage_cache.skip_message('extract_1d')
+        success = True
+    else:
+        with StageTimer('extract_1d_results', case.master_folder, outputs=[case.res_folder_1D]):
+            success = extract_results(config_1d)
+        if success:
+            # the SimVascular extraction writes VTK's default encoding; store its meshes
+            # (the projected .vtu is the largest file of a case) with vtk_encoding
+            from package.vtk_utils import reencode_vtk
+            for f in Path(case.res_folder_1D).glob(config_1d["output_file_name"] + ".vt[pu]"):
+                reencode_vtk(str(f))
+            extracted = [str(f) for f in Path(case.res_folder_1D).glob(config_1d["output_file_name"] + "*")]
+            stage_cache.record('extract_1d', extract_inputs, config_1d, extracted)
 
     if success:
         print_section_header("EXTRACTION COMPLETE")
-        list_output_files()
+        list_output_files(case)
 
         # Modified by Claude: Visualization instructions
         print("\n" + "-" * 70)
         print("  To visualize results in ParaView:")
         print("-" * 70)
         print("  Centerline visualization:")
-        print("    - Load: " + os.path.join(res_folder_1D, "extracted_results.vtp"))
+        print("    - Load: " + os.path.join(case.res_folder_1D, "extracted_results.vtp"))
         print("    - Apply color map to flow/pressure/area fields")
         print("    - Use 'Tube' filter to visualize as 3D vessels")
 
         # Check if 3D results were generated
-        vtu_file = os.path.join(res_folder_1D, "extracted_results.vtu")
+        vtu_file = os.path.join(case.res_folder_1D, "extracted_results.vtu")
         if os.path.exists(vtu_file):
             print("")
             print("  3D Volume visualization:")
@@ -412,9 +458,13 @@ if __name__ == "__main__":
         print("-" * 70)
 
         # Show log file location
-        log_file = os.path.join(res_folder_1D, "extract-results.log")
+        log_file = os.path.join(case.res_folder_1D, "extract-results.log")
         if os.path.exists(log_file):
             print_info("Log file: " + log_file)
     else:
         print_error("Extraction failed. Check the log file for details.")
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(case_config)
@@ -0,0 +1,236 @@
+"""
+fourier_inflow.py - Spectral (Fourier-series) inflow waveforms
+
+The solvers read inflow_1d.flow, a dense "time flow" table with one line per
+time step. Resampling that table to another step count re-interpolates it,
+and the quadratic interpolation of the editor is not periodic in its slope.
+A FourierInflow stores the waveform as a truncated Fourier series instead,
+
+    Q(t) = a_0 + sum_k [ a_k cos(2 pi k t / T) + b_k sin(2 pi k t / T) ],
+
+i.e. the period T plus 2N+1 coefficients, in a small JSON file next to the
+table (inflow_1d.fourier.json). Any number of steps per cycle is synthesized
+from it exactly periodically (first and last sample equal, smooth across the
+cycle boundary), by inverse FFT or direct vectorized evaluation.
+
+When inflow_1d.fourier.json exists, the 1D and 0D setup stages regenerate
+inflow_1d.flow from it (sync_flow_table) before reading the time step and step
+count, so both solvers get the same waveform and a time-step refinement study
+only needs a different `inflow.steps`.
+
+Usage:
+    python -m package.fourier_inflow fit inflow_1d.flow --modes 32
+    python -m package.fourier_inflow sample inflow_1d.fourier.json --steps 12000 --out inflow_1d.flow
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+try:
+    from package.manifest import get_value
+    from package.inflow_builder import write_inflow_file
+except ImportError:  # imported next to the stage scripts (from __init__ import *)
+    from manifest import get_value
+    from inflow_builder import write_inflow_file
+
+FOURIER_FORMAT = 'miros-fourier-inflow'
+FOURIER_VERSION = 1
+DEFAULT_MODES = 32
+DEFAULT_STEPS = 1200
+
+
+def fourier_path(flow_path):
+    """inflow_1d.flow -> inflow_1d.fourier.json"""
+    return os.path.splitext(flow_path)[0] + '.fourier.json'
+
+
+class FourierInflow:
+    """
+    Periodic inflow waveform as a truncated Fourier series.
+
+    Parameters:
+    - period: Cycle length T [s].
+    - cos:    Cosine coefficients a_0..a_N (a_0 is the mean flow).
+    - sin:    Sine coefficients b_0..b_N (b_0 is unused and kept at 0).
+    """
+
+    def __init__(self, period, cos, sin):
+        self.period = float(period)
+        self.cos = np.asarray(cos, dtype=float)
+        self.sin = np.asarray(sin, dtype=float)
+        if self.cos.shape != self.sin.shape:
+            raise ValueError("cos and sin coefficients differ in length")
+
+    @property
+    def n_modes(self):
+        return self.cos.size - 1
+
+    @property
+    def mean_flow(self):
+        return self.cos[0]
+
+    @classmethod
+    def from_samples(cls, time, flow, n_modes=DEFAULT_MODES):
+        """
+        Fit a series to one sampled cycle, e.g. the contents of inflow_1d.flow.
+
+        The samples span the cycle with the first and last at t = 0 and t = T
+        (the MIROS table layout); the last one is the repeated first and
+        dropped. Non-uniform samples are linearly interpolated to a uniform
+        grid first. n_modes is capped at the Nyquist limit of the samples.
+        """
+        time = np.asarray(time, dtype=float)
+        flow = np.asarray(flow, dtype=float)
+        period = time[-1] - time[0]
+        n = time.size - 1
+        grid = time[0] + period * np.arange(n) / n
+        if not np.allclose(time[:-1], grid, rtol=0, atol=1e-9 * period):
+            flow = np.interp(grid, time, flow)
+        spectrum = np.fft.rfft(flow[:n]) / n
+        n_modes = max(0, min(int(n_modes), (n - 1) // 2))
+        c = spectrum[:n_modes + 1]
+        cos, sin = 2.0 * c.real, -2.0 * c.imag
+        cos[0], sin[0] = c[0].real, 0.0
+        return cls(period, cos, sin)
+
+    def evaluate(self, t):
+        """Flow at times t (any shape, any cycle)."""
+        t = np.asarray(t, dtype=float)
+        k = np.arange(self.cos.size)
+        phase = (2.0 * np.pi / self.period) * t[..., None] * k
+        return np.cos(phase) @ self.cos + np.sin(phase) @ self.sin
+
+    def sample(self, steps=DEFAULT_STEPS):
+        """
+        Synthesize one cycle at `steps` samples, t = 0 .. T inclusive (the
+        inflow_1d.flow layout). The first and last flow are identical.
+
+        Returns:
+        - time, flow
+        """
+        steps = int(steps)
+        if steps < 2:
+            raise ValueError("need at least 2 steps per cycle, got {}".format(steps))
+        time = np.linspace(0.0, self.period, steps)
+        n = steps - 1
+        if n > 2 * self.n_modes:
+            # inverse FFT on the n distinct samples of the cycle
+            spectrum = np.zeros(n // 2 + 1, dtype=complex)
+            spectrum[:self.cos.size] = 0.5 * n * (self.cos - 1j * self.sin)
+            spectrum[0] = n * self.cos[0]
+            flow = np.fft.irfft(spectrum, n)
+        else:
+            flow = self.evaluate(time[:-1])
+        return time, np.append(flow, flow[0])
+
+    def fit_error(self, time, flow):
+        """Relative RMS difference between the series and the samples it was fitted to."""
+        flow = np.asarray(flow, dtype=float)
+        scale = np.sqrt(np.mean(flow ** 2)) or 1.0
+        return np.sqrt(np.mean((self.evaluate(time) - flow) ** 2)) / scale
+
+    def write_flow(self, path, steps=DEFAULT_STEPS):
+        """Write the dense inflow table the 1D and 0D solvers read."""
+        time, flow = self.sample(steps)
+        return write_inflow_file(path, time, flow)
+
+    def save(self, path):
+        """Write the coefficients as JSON (atomically)."""
+        data = {'format': FOURIER_FORMAT, 'version': FOURIER_VERSION, 'period': self.period,
+                'n_modes': self.n_modes, 'cos': self.cos.tolist(), 'sin': self.sin.tolist()}
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != FOURIER_FORMAT:
+            raise ValueError("{} is not a Fourier inflow file".format(path))
+        return cls(data['period'], data['cos'], data['sin'])
+
+
+def write_spectral_inflow(inflow_file_path, time, flow, n_modes=DEFAULT_MODES):
+    """
+    Fit a series to a sampled cycle, save it as inflow_1d.fourier.json and
+    write inflow_1d.flow synthesized from it at the same number of steps.
+
+    Returns:
+    - series: the FourierInflow
+    """
+    series = FourierInflow.from_samples(time, flow, n_modes)
+    series.save(fourier_path(inflow_file_path))
+    series.write_flow(inflow_file_path, len(time))
+    print("  [OK] Fourier inflow: {} harmonics, relative RMS error {:.2e}: {}".format(
+        series.n_modes, series.fit_error(time, flow), fourier_path(inflow_file_path)))
+    return series
+
+
+def count_lines(path):
+    with open(path, 'r') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def sync_flow_table(inflow_file_path, steps=None):
+    """
+    Regenerate inflow_1d.flow from inflow_1d.fourier.json, if that exists.
+
+    The table is rewritten when it is missing, older than the coefficients,
+    or has a different number of steps than requested.
+
+    Parameters:
+    - steps: Steps per cycle; default: `inflow.steps` of the run manifest,
+             else the length of the current table, else 1200.
+
+    Returns:
+    - True if the table was (re)written.
+    """
+    spectral = fourier_path(inflow_file_path)
+    if not os.path.exists(spectral):
+        return False
+    has_table = os.path.exists(inflow_file_path)
+    current = count_lines(inflow_file_path) if has_table else None
+    steps = int(steps or get_value('inflow.steps') or current or DEFAULT_STEPS)
+    if has_table and current == steps and os.path.getmtime(inflow_file_path) >= os.path.getmtime(spectral):
+        return False
+    FourierInflow.load(spectral).write_flow(inflow_file_path, steps)
+    print("  [OK] Inflow table synthesized from {} ({} steps per cycle)".format(os.path.basename(spectral), steps))
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m package.fourier_inflow',
+                                     description='Fit or sample Fourier-series inflow waveforms.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fit = sub.add_parser('fit', help='fit coefficients to an inflow table')
+    fit.add_argument('flow', help='inflow table (time flow per line)')
+    fit.add_argument('--modes', type=int, default=DEFAULT_MODES, help='number of harmonics (default: 32)')
+    fit.add_argument('--out', default=None, help='coefficient file (default: <flow>.fourier.json)')
+    sample = sub.add_parser('sample', help='write an inflow table from coefficients')
+    sample.add_argument('coefficients', help='.fourier.json file')
+    sample.add_argument('--steps', type=int, default=DEFAULT_STEPS, help='steps per cycle (default: 1200)')
+    sample.add_argument('--out', required=True, help='inflow table to write')
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        data = np.loadtxt(args.flow)
+        series = FourierInflow.from_samples(data[:, 0], data[:, 1], args.modes)
+        out = series.save(args.out or fourier_path(args.flow))
+        print("  ✓ {} harmonics, period {:.4f} s, mean flow {:.3f}, relative RMS error {:.2e}: {}".format(
+            series.n_modes, series.period, series.mean_flow, series.fit_error(data[:, 0], data[:, 1]), out))
+    else:
+        series = FourierInflow.load(args.coefficients)
+        series.write_flow(args.out, args.steps)
+        print("  ✓ {} steps per cycle written: {}".format(args.steps, args.out))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,42 +1,71 @@
 import numpy as np
-import pdb
-import matplotlib
-import importlib.util
-
-# if *either* Qt binding is available, go Qt5Agg, otherwise TkAgg
-if importlib.util.find_spec("PyQt5") or importlib.util.find_spec("PySide2"):
-    matplotlib.use('Qt5Agg')
-else:
-    matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
-from matplotlib.widgets import TextBox
-import matplotlib.ticker as mticker
 import os
+import sys
+import time
 from __init__ import *
+from manifest import ask, is_headless, get_value
+from inflow_builder import resample_inflow, save_inflow, build_from_manifest
+
+# control points of the editor; dragging stays smooth with 50+ (see DraggablePoints)
+N_CONTROL_POINTS = 20
+
 
 class DraggablePoints:
-    def __init__(self, ax, x, y, line, update_callback):
+    """
+    Red control points that can be dragged vertically to reshape the curve.
+
+    While a point is dragged, the figure without the curve and the points is
+    cached once (blitting) and only these two artists are redrawn, at most
+    `max_fps` times per second; mouse events in between just move the point.
+    Backends without blitting fall back to a throttled full redraw.
+    """
+
+    def __init__(self, ax, x, y, line, update_callback, max_fps=60):
         self.ax = ax
         self.canvas = ax.figure.canvas
         self.x = x
         self.y = y
         self.line = line
         self.update = update_callback
+        self.min_interval = 1.0 / max_fps
 
         # scatter with a pick radius of 10 points
         self.pts = ax.scatter(x, y, c='red', s=100, picker=10)
         self._ind = None
 
-        # hook into pick/motion/release
+        # blitting state
+        self.background = None
+        self._last_draw = 0.0
+        self._pending = False
+        self._timer = self.canvas.new_timer(interval=int(1000 * self.min_interval))
+        self._timer.single_shot = True
+        self._timer.add_callback(self.flush)
+
+        # hook into pick/motion/release/draw
         self.canvas.mpl_connect('pick_event',           self.on_pick)
         self.canvas.mpl_connect('motion_notify_event',  self.on_motion)
         self.canvas.mpl_connect('button_release_event', self.on_release)
+        self.canvas.mpl_connect('draw_event',           self.on_draw)
+
+    @property
+    def blit(self):
+        return getattr(self.canvas, 'supports_blit', False)
 
     def on_pick(self, event):
-        if event.artist is not self.pts:
+        if event.artist is not self.pts or self._ind is not None:
             return
         self._ind = event.ind[0]
+        if self.blit:
+            # one full draw without the moving artists gives the background (on_draw)
+            self.line.set_animated(True)
+            self.pts.set_animated(True)
+            self.canvas.draw()
+
+    def on_draw(self, event):
+        # also called after a resize while dragging: re-cache the background
+        if self._ind is not None and self.blit:
+            self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+            self.draw_artists()
 
     def on_motion(self, event):
         if self._ind is None or event.inaxes is not self.ax:
@@ -47,18 +76,62 @@ class DraggablePoints:
             self.y[0] = self.y[-1] = ydata
         else:
             self.y[self._ind] = ydata
+
+        # throttle interpolation and drawing to the refresh rate
+        if time.perf_counter() - self._last_draw < self.min_interval:
+            if not self._pending:
+                self._pending = True
+                self._timer.start()
+            return
+        self.flush()
+
+    def flush(self):
+        """Re-interpolate the curve and redraw the moving artists."""
+        self._pending = False
+        self._last_draw = time.perf_counter()
         self.pts.set_offsets(np.c_[self.x, self.y])
         self.update()
-        self.canvas.draw_idle()
+        if self.blit and self.background is not None and self._ind is not None:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+        else:
+            self.canvas.draw_idle()
+
+    def draw_artists(self):
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.pts)
+        self.canvas.blit(self.ax.bbox)
 
     def on_release(self, event):
+        if self._ind is None:
+            return
+        self._timer.stop()
+        self.flush()  # the last position is always drawn
         self._ind = None
+        self.background = None
+        self.line.set_animated(False)
+        self.pts.set_animated(False)
+        self.canvas.draw_idle()
 
 
 
-def launch():
+def launch(n_ctrl=N_CONTROL_POINTS):
+    # the GUI stack is only loaded when the editor is actually opened
+    import matplotlib
+    import importlib.util
+
+    # if *either* Qt binding is available, go Qt5Agg, otherwise TkAgg
+    if importlib.util.find_spec("PyQt5") or importlib.util.find_spec("PySide2"):
+        matplotlib.use('Qt5Agg')
+    else:
+        matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    from scipy.interpolate import interp1d
+    from matplotlib.widgets import TextBox
+    import matplotlib.ticker as mticker
+
     # control points over [0, 1]
-    x_ctrl = np.linspace(0, 1, 20)
+    x_ctrl = np.linspace(0, 1, n_ctrl)
     y_ctrl = np.zeros_like(x_ctrl)
 
     fig, ax = plt.subplots()
@@ -71,8 +144,7 @@ def launch():
 
     def refresh():
         f = interp1d(x_ctrl, y_ctrl, kind='quadratic', fill_value='extrapolate')
-        line.set_data(x_dense, f(x_dense))
-        fig.canvas.draw_idle()
+        line.set_data(x_dense, f(x_dense))  # drawn by DraggablePoints
 
     # draggable points keeper
     global draggable
@@ -145,26 +217,13 @@ def postprocess_inflow(hr, steps, curve_line):
     # extract your plotted data
     x_norm, y = curve_line.get_data()  # same as get_xdata()/get_ydata()
 
-    # compute cycle length and time axis
-    cyc  = 60.0 / hr
-    time = np.linspace(0, cyc, steps)
-
-    # build interpolator in real seconds
-    x_time = x_norm * cyc
-    f_time = interp1d(x_time, y, kind='quadratic', fill_value='extrapolate')
-
-    # sample to get your inflow array
-    flow = f_time(time)
-
-    return time, flow
+    # quadratic resampling to one cycle, shared with inflow_builder.py
+    return resample_inflow(x_norm, y, hr, steps)
 
 
 def save_inflow_file(time, flow, filename='inflow_1d.flow'):
-    # save the inflow data to a file
-    with open(os.path.join(master_folder, filename), 'w') as f:
-        #f.write("# Time [s]  Flow [mL/s]\n")
-        for t, q in zip(time, flow):
-            f.write('{:.6f} {:.6f}\n'.format(t, q))
+    # save the inflow data to a file (and its Fourier series if the manifest asks for one)
+    save_inflow(os.path.join(master_folder, filename), time, flow, get_value('inflow.fourier_modes'))
 
 
 def generate_inflow_file():
@@ -173,15 +232,22 @@ def generate_inflow_file():
     save_inflow_file(time, flow)
 
 if __name__ == '__main__':
+    inflow_file_path = os.path.join(master_folder, 'inflow_1d.flow')
+
+    # a template or measured CSV in the run manifest replaces the editor
+    if build_from_manifest(inflow_file_path):
+        sys.exit(0)
+
     print('\n')
     print("Now, you are going to create an inflow file from the GUI editor.")
     print('Do you have an existing inflow file you wish to use? (yes/no)")')
           
-    inflow_file_exists = input().strip().lower()
+    inflow_file_exists = ask('inflow.use_existing', '', choices=('yes',), default='yes').strip().lower()
 
     if inflow_file_exists == 'yes':
         print('Make sure the inflow file is in the master folder and named "inflow_1d.flow"')
-        inflow_file_path = os.path.join(master_folder, 'inflow_1d.flow')
         print("Using existing inflow file: {}".format(inflow_file_path))
+        if is_headless() and not os.path.exists(inflow_file_path):
+            raise IOError("Headless run needs an existing inflow file: {}".format(inflow_file_path))
     else:
-        generate_inflow_file()
\ No newline at end of file
+        generate_inflow_file()
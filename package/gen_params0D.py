@@ -8,6 +8,10 @@ from __init__ import *
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from package import *
 from package.helper_func import *
+from package.manifest import ask
+from package.stage_cache import StageCache
+from package.profiling import StageTimer
+from package.fourier_inflow import sync_flow_table
 
 # Modified by Claude: Added helper functions for formatted output
 def print_section_header(title):
@@ -25,85 +29,109 @@ def print_info(message):
     print("  → " + message)
 # --- End helper functions ---
 
-# set up 0D parameters
-print_section_header("0D SIMULATION: Parameter Setup")
-write_template_config(os.path.join(master_folder, 'params_0D.dat'), 0)
-
-# output directories
-Params0D = Parameters()
-Params0D.output_directory = master_folder
-Params0D.boundary_surfaces_dir = caps_folder
-Params0D.inlet_face_input_file = 'inlet.vtp'
-Params0D.centerlines_output_file = os.path.join(master_folder,'extracted_centerlines.vtp')
-Params0D.surface_model = os.path.join(master_folder, 'remeshed_model.vtp')
-Params0D.inflow_input_file = inflow_file_path
-Params0D.solver_output_file = os.path.join(master_folder,'0D_solver_input.json')
-Params0D.model_name = 'your_model_name'
-Params0D.outflow_bc_type = 'rcr'
-Params0D.uniform_bc = False
-Params0D.seg_size_adaptive = False
-Params0D.seg_min_num = 4
-Params0D.outlet_face_names_file = os.path.join(master_folder,'centerlines_outlets.dat')
-Params0D.outflow_bc_file = os.path.join(master_folder, 'rcrt.dat')
-Params0D.model_order = 0
-
-Cl = Centerlines()
-if not os.path.exists(Params0D.centerlines_output_file):
-    try:
-        print_info("Extracting centerlines...")
-        Cl.extract_center_lines(Params0D)
-        print_status("Centerlines extracted successfully")
-    except Exception as e:
-        # Modified by Claude: improved error messages
-        print("\n  [ERROR] Error extracting centerlines: " + str(e))
-        print("  Possible solutions:")
-        print("    1. Smooth the model: smooth remeshed_model.vtp and save with same name")
-        print("    2. Create finer mesh: use a smaller element size")
-else:
-    Cl.read(Params0D, Params0D.centerlines_output_file)
-    print_status("Centerlines loaded from: " + Params0D.centerlines_output_file)
-
-# Modified by Claude: Improved user input section with clear formatting
-print("\n" + "-" * 70)
-print("  >>> USER INPUT REQUIRED <<<")
-print("-" * 70)
-print("  Before running 0D simulation, please verify the following files:")
-print("    1. RCR boundary condition file: " + os.path.join(master_folder, 'rcrt.dat'))
-print("    2. Inflow file: " + inflow_file_path)
-print("    3. Parameter file: " + os.path.join(master_folder, 'params_0D.dat'))
-print("-" * 70)
-
-# Modified by Claude: Added 'skip' option to bypass 0D setup
-run_0d_setup = True  # Flag to track if we should run the setup
-while True:
-    answer = input("  Ready to run 0D simulation? (yes/no/skip): ")
-    if answer.lower() == "yes":
-        if not os.path.exists(res_folder_0D):
-            os.makedirs(res_folder_0D)
-        print_status("0D results folder: " + res_folder_0D)
-        Params0D = load_config(os.path.join(master_folder, 'params_0D.dat'),inflow_file_path,Params0D)
-        break
-    elif answer.lower() == "no":
-        print("  [INFO] Please fix the files, then type 'yes' when ready.\n")
-    elif answer.lower() == "skip":
-        print_info("Skipping 0D setup, continuing to next step...")
-        run_0d_setup = False
-        break
+def main(case):
+    """Extract the centerlines and build the 0D model of one case (a CaseConfig)."""
+    # set up 0D parameters
+    print_section_header("0D SIMULATION: Parameter Setup")
+    write_template_config(os.path.join(case.master_folder, 'params_0D.dat'), 0)
+
+    # output directories
+    Params0D = Parameters()
+    Params0D.output_directory = case.master_folder
+    Params0D.boundary_surfaces_dir = case.caps_folder
+    Params0D.inlet_face_input_file = 'inlet.vtp'
+    Params0D.centerlines_output_file = os.path.join(case.master_folder,'extracted_centerlines.vtp')
+    Params0D.surface_model = os.path.join(case.master_folder, 'remeshed_model.vtp')
+    Params0D.inflow_input_file = case.inflow_file_path
+    sync_flow_table(case.inflow_file_path)  # no-op without inflow_1d.fourier.json
+    Params0D.solver_output_file = os.path.join(case.master_folder,'0D_solver_input.json')
+    Params0D.model_name = 'your_model_name'
+    Params0D.outflow_bc_type = 'rcr'
+    Params0D.uniform_bc = False
+    Params0D.seg_size_adaptive = False
+    Params0D.seg_min_num = 4
+    Params0D.outlet_face_names_file = os.path.join(case.master_folder,'centerlines_outlets.dat')
+    Params0D.outflow_bc_file = os.path.join(case.master_folder, 'rcrt.dat')
+    Params0D.model_order = 0
+
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+    centerline_inputs = [Params0D.surface_model,
+                         os.path.join(case.caps_folder, 'inlet.vtp'),
+                         Params0D.outlet_face_names_file]
+
+    Cl = Centerlines()
+    if not stage_cache.is_fresh('centerlines', centerline_inputs, None, [Params0D.centerlines_output_file]):
+        try:
+            print_info("Extracting centerlines...")
+            with StageTimer('extract_centerlines', case.master_folder, outputs=[Params0D.centerlines_output_file]):
+                Cl.extract_center_lines(Params0D)
+            stage_cache.record('centerlines', centerline_inputs, None, [Params0D.centerlines_output_file])
+            print_status("Centerlines extracted successfully")
+        except Exception as e:
+            # Modified by Claude: improved error messages
+            print("\n  [ERROR] Error extracting centerlines: " + str(e))
+            print("  Possible solutions:")
+            print("    1. Smooth the model: smooth remeshed_model.vtp and save with same name")
+            print("    2. Create finer mesh: use a smaller element size")
     else:
-        print("  [ERROR] Invalid input. Please enter 'yes', 'no', or 'skip'.")
-
-# Modified by Claude: Only run setup if not skipped
-if run_0d_setup:
-    msh = mesh.Mesh()
-    msh.generate(Params0D, Cl)
+        stage_cache.skip_message('centerlines')
+        Cl.read(Params0D, Params0D.centerlines_output_file)
+        print_status("Centerlines loaded from: " + Params0D.centerlines_output_file)
+
+    # Modified by Claude: Improved user input section with clear formatting
+    print("\n" + "-" * 70)
+    print("  >>> USER INPUT REQUIRED <<<")
+    print("-" * 70)
+    print("  Before running 0D simulation, please verify the following files:")
+    print("    1. RCR boundary condition file: " + os.path.join(case.master_folder, 'rcrt.dat'))
+    print("    2. Inflow file: " + case.inflow_file_path)
+    print("    3. Parameter file: " + os.path.join(case.master_folder, 'params_0D.dat'))
+    print("-" * 70)
+
+    # Modified by Claude: Added 'skip' option to bypass 0D setup
+    run_0d_setup = True  # Flag to track if we should run the setup
+    while True:
+        answer = ask('simulation_0d.run', "  Ready to run 0D simulation? (yes/no/skip): ",
+                     choices=('yes', 'skip'), default='yes')
+        if answer.lower() == "yes":
+            if not os.path.exists(case.res_folder_0D):
+                os.makedirs(case.res_folder_0D)
+            print_status("0D results folder: " + case.res_folder_0D)
+            Params0D = load_config(os.path.join(case.master_folder, 'params_0D.dat'),case.inflow_file_path,Params0D)
+            break
+        elif answer.lower() == "no":
+            print("  [INFO] Please fix the files, then type 'yes' when ready.\n")
+        elif answer.lower() == "skip":
+            print_info("Skipping 0D setup, continuing to next step...")
+            run_0d_setup = False
+            break
+        else:
+            print("  [ERROR] Invalid input. Please enter 'yes', 'no', or 'skip'.")
+
+    # Modified by Claude: Only run setup if not skipped
+    if run_0d_setup:
+        mesh_0d_inputs = [Params0D.centerlines_output_file, Params0D.outflow_bc_file,
+                          case.inflow_file_path, os.path.join(case.master_folder, 'params_0D.dat'),
+                          Params0D.outlet_face_names_file]
+        mesh_0d_params = {'model_name': Params0D.model_name, 'seg_min_num': Params0D.seg_min_num,
+                          'seg_size_adaptive': Params0D.seg_size_adaptive}
+
+        if stage_cache.is_fresh('mesh_0d', mesh_0d_inputs, mesh_0d_params, [Params0D.solver_output_file]):
+            stage_cache.skip_message('mesh_0d')
+        else:
+            msh = mesh.Mesh()
+            with StageTimer('mesh_0d', case.master_folder, outputs=[Params0D.solver_output_file]):
+                msh.generate(Params0D, Cl)
+            stage_cache.record('mesh_0d', mesh_0d_inputs, mesh_0d_params, [Params0D.solver_output_file])
+
+            # Modified by Claude: Added completion message
+            print_status("0D mesh generated successfully")
+        print_info("Solver input: " + Params0D.solver_output_file)
+        print_info("Proceeding to run 0D solver...")
+    else:
+        # Modified by Claude: Message when setup is skipped
+        print_info("0D setup was skipped by user")
 
-    # Modified by Claude: Added completion message
-    print_status("0D mesh generated successfully")
-    print_info("Solver input: " + Params0D.solver_output_file)
-    print_info("Proceeding to run 0D solver...")
-else:
-    # Modified by Claude: Message when setup is skipped
-    print_info("0D setup was skipped by user")
 
 # run0D = subprocess.run(
 #     ['svzerodsolver',
@@ -141,3 +169,5 @@ else:
 #     print("0D simulation completed successfully after adjusting the number of segments.")
 
 
+if __name__ == "__main__":
+    main(case_config)
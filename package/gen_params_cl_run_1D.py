@@ -6,6 +6,11 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from package import *
 from package.helper_func import *
+from package.manifest import ask
+from package.stage_cache import StageCache
+from package.profiling import StageTimer
+from package.fourier_inflow import sync_flow_table
+from package.scheduler import mark_ready
 
 # Modified by Claude: Added helper functions for formatted output
 def print_section_header(title):
@@ -23,120 +28,159 @@ def print_info(message):
     print("  → " + message)
 # --- End helper functions ---
 
-print_section_header("1D SIMULATION: Parameter Setup")
-write_template_config(os.path.join(master_folder, 'params_1D.dat'), 1)
-
-# output directories
-Params1D = Parameters()
-Params1D.output_directory = master_folder
-Params1D.boundary_surfaces_dir = caps_folder
-Params1D.inlet_face_input_file = 'inlet.vtp'
-Params1D.centerlines_output_file = os.path.join(master_folder,'extracted_centerlines.vtp')
-Params1D.surface_model = os.path.join(master_folder, 'remeshed_model.vtp')
-Params1D.inflow_input_file = inflow_file_path
-Params1D.solver_output_file = os.path.join(master_folder,'1D_solver_input.in')
-Params1D.model_name = surf_name ## change this to your model name
-Params1D.outflow_bc_type = 'rcr'
-Params1D.uniform_bc = False
-Params1D.seg_size_adaptive = True
-Params1D.seg_min_num = 4
-Params1D.outlet_face_names_file = os.path.join(master_folder,'centerlines_outlets.dat')
-Params1D.outflow_bc_file = os.path.join(master_folder, 'rcrt.dat')
-
-Cl = Centerlines()
-if not os.path.exists(Params1D.centerlines_output_file):
-    try:
-        print_info("Extracting centerlines...")
-        Cl.extract_center_lines(Params1D)
-        print_status("Centerlines extracted successfully")
-    except Exception as e:
-        # Modified by Claude: improved error messages
-        print("\n  [ERROR] Error extracting centerlines: " + str(e))
-        print("  Possible solutions:")
-        print("    1. Smooth the model: smooth remeshed_model.vtp and save with same name")
-        print("    2. Create finer mesh: use a smaller element size")
-else:
-    Cl.read(Params1D, Params1D.centerlines_output_file)
-    print_status("Centerlines loaded from: " + Params1D.centerlines_output_file)
-
-# Modified by Claude: Improved user input section with clear formatting
-print("\n" + "-" * 70)
-print("  >>> USER INPUT REQUIRED <<<")
-print("-" * 70)
-print("  Before running 1D simulation, please verify the following files:")
-print("    1. RCR boundary condition file: " + os.path.join(master_folder, 'rcrt.dat'))
-print("    2. Inflow file: " + inflow_file_path)
-print("    3. Parameter file: " + os.path.join(master_folder, 'params_1D.dat'))
-print("-" * 70)
-
-# Modified by Claude: Added 'skip' option to bypass 1D simulation
-run_1d_sim = True  # Flag to track if we should run the simulation
-while True:
-    answer = input("  Ready to run 1D simulation? (yes/no/skip): ")
-    if answer.lower() == "yes":
-        if not os.path.exists(res_folder_1D):
-            os.makedirs(res_folder_1D)
-        print_status("1D results folder: " + res_folder_1D)
-        Params1D = load_config(os.path.join(master_folder, 'params_1D.dat'),inflow_file_path,Params1D)
-        break
-    elif answer.lower() == "no":
-        print("  [INFO] Please fix the files, then type 'yes' when ready.\n")
-    elif answer.lower() == "skip":
-        print_info("Skipping 1D simulation, continuing to next step...")
-        run_1d_sim = False
-        break
-    else:
-        print("  [ERROR] Invalid input. Please enter 'yes', 'no', or 'skip'.")
-
-# Modified by Claude: Only run simulation if not skipped
-if run_1d_sim:
-    msh = mesh.Mesh()
-    msh.generate(Params1D, Cl)
-
-    # Modified by Claude: Improved simulation run output
-    print_section_header("1D SIMULATION: Running Solver")
-
-    # run 1D simulation
-    try:
-        print_info("Simulation parameters:")
-        print("    - Time steps: " + str(Params1D.num_time_steps))
-        print("    - Step size: " + str(Params1D.time_step))
-        print("    - Solver input: " + Params1D.solver_output_file)
-        print("    - Results folder: " + res_folder_1D)
-        print("")
-        print_info("Running 1D solver... (this may take a moment)")
-        run_1d_simulation(OneDSolv, Params1D.solver_output_file, res_folder_1D)
-    except Exception as e:
-        print("\n  [ERROR] 1D simulation failed: " + str(e))
-        print("  Check the solver output file for details.\n")
-
-
-    # make sure simulation run successfully
-    num_of_file_in_res_folder_1D = len([f for f in os.listdir(res_folder_1D)])
-    #pdb.set_trace()
-    while num_of_file_in_res_folder_1D <= 3:
-        # Modified by Claude: improved error recovery messages
-        print("\n" + "-" * 70)
-        print("  [WARNING] Simulation may have failed (insufficient output files)")
-        print("-" * 70)
-        print("  Common cause: Large difference in inlet/outlet areas causing")
-        print("  negative outlet areas. Auto-adjusting mesh segmentation...")
-        Params1D.seg_min_num = Params1D.seg_min_num + 1
-        print_info("New minimum segments: " + str(Params1D.seg_min_num))
-        msh.generate(Params1D, Cl)
-        try:
-            print_info("Re-running 1D simulation...")
-            run_1d_simulation(OneDSolv, Params1D.solver_output_file, res_folder_1D)
+def main(case):
+    """Extract the centerlines, build the 1D model of one case (a CaseConfig) and solve it."""
+    print_section_header("1D SIMULATION: Parameter Setup")
+    write_template_config(os.path.join(case.master_folder, 'params_1D.dat'), 1)
+
+    # output directories
+    Params1D = Parameters()
+    Params1D.output_directory = case.master_folder
+    Params1D.boundary_surfaces_dir = case.caps_folder
+    Params1D.inlet_face_input_file = 'inlet.vtp'
+    Params1D.centerlines_output_file = os.path.join(case.master_folder,'extracted_centerlines.vtp')
+    Params1D.surface_model = os.path.join(case.master_folder, 'remeshed_model.vtp')
+    Params1D.inflow_input_file = case.inflow_file_path
+    sync_flow_table(case.inflow_file_path)  # no-op without inflow_1d.fourier.json
+    Params1D.solver_output_file = os.path.join(case.master_folder,'1D_solver_input.in')
+    Params1D.model_name = case.surf_name ## change this to your model name
+    Params1D.outflow_bc_type = 'rcr'
+    Params1D.uniform_bc = False
+    Params1D.seg_size_adaptive = True
+    Params1D.seg_min_num = 4
+    Params1D.outlet_face_names_file = os.path.join(case.master_folder,'centerlines_outlets.dat')
+    Params1D.outflow_bc_file = os.path.join(case.master_folder, 'rcrt.dat')
 
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+    centerline_inputs = [Params1D.surface_model,
+                         os.path.join(case.caps_folder, 'inlet.vtp'),
+                         Params1D.outlet_face_names_file]
+
+    Cl = Centerlines()
+    if not stage_cache.is_fresh('centerlines', centerline_inputs, None, [Params1D.centerlines_output_file]):
+        try:
+            print_info("Extracting centerlines...")
+            with StageTimer('extract_centerlines', case.master_folder, outputs=[Params1D.centerlines_output_file]):
+                Cl.extract_center_lines(Params1D)
+            stage_cache.record('centerlines', centerline_inputs, None, [Params1D.centerlines_output_file])
+            mark_ready(case.master_folder, 'centerlines')  # lets __main__ start the 0D model now
+            print_status("Centerlines extracted successfully")
         except Exception as e:
-            print("  [INFO] Continuing to adjust mesh segmentation...")
-        num_of_file_in_res_folder_1D = len([f for f in os.listdir(res_folder_1D)])
+            # Modified by Claude: improved error messages
+            print("\n  [ERROR] Error extracting centerlines: " + str(e))
+            print("  Possible solutions:")
+            print("    1. Smooth the model: smooth remeshed_model.vtp and save with same name")
+            print("    2. Create finer mesh: use a smaller element size")
+    else:
+        stage_cache.skip_message('centerlines')
+        Cl.read(Params1D, Params1D.centerlines_output_file)
+        mark_ready(case.master_folder, 'centerlines')
+        print_status("Centerlines loaded from: " + Params1D.centerlines_output_file)
+
+    # Modified by Claude: Improved user input section with clear formatting
+    print("\n" + "-" * 70)
+    print("  >>> USER INPUT REQUIRED <<<")
+    print("-" * 70)
+    print("  Before running 1D simulation, please verify the following files:")
+    print("    1. RCR boundary condition file: " + os.path.join(case.master_folder, 'rcrt.dat'))
+    print("    2. Inflow file: " + case.inflow_file_path)
+    print("    3. Parameter file: " + os.path.join(case.master_folder, 'params_1D.dat'))
+    print("-" * 70)
+
+    # Modified by Claude: Added 'skip' option to bypass 1D simulation
+    run_1d_sim = True  # Flag to track if we should run the simulation
+    while True:
+        answer = ask('simulation_1d.run', "  Ready to run 1D simulation? (yes/no/skip): ",
+                     choices=('yes', 'skip'), default='yes')
+        if answer.lower() == "yes":
+            if not os.path.exists(case.res_folder_1D):
+                os.makedirs(case.res_folder_1D)
+            print_status("1D results folder: " + case.res_folder_1D)
+            Params1D = load_config(os.path.join(case.master_folder, 'params_1D.dat'),case.inflow_file_path,Params1D)
+            break
+        elif answer.lower() == "no":
+            print("  [INFO] Please fix the files, then type 'yes' when ready.\n")
+        elif answer.lower() == "skip":
+            print_info("Skipping 1D simulation, continuing to next step...")
+            run_1d_sim = False
+            break
+        else:
+            print("  [ERROR] Invalid input. Please enter 'yes', 'no', or 'skip'.")
+
+    # Modified by Claude: Only run simulation if not skipped
+    if run_1d_sim:
+        mesh_1d_inputs = [Params1D.centerlines_output_file, Params1D.outflow_bc_file,
+                          case.inflow_file_path, os.path.join(case.master_folder, 'params_1D.dat'),
+                          Params1D.outlet_face_names_file]
+        # the base segment count: auto-retries below bump it, but start from here next time
+        mesh_1d_params = {'model_name': case.surf_name, 'seg_min_num': Params1D.seg_min_num,
+                          'seg_size_adaptive': Params1D.seg_size_adaptive}
+        solve_1d_params = {'solver': OneDSolv}
 
-    print_status("1D simulation completed successfully!")
-    print_info("Results saved to: " + res_folder_1D)
-else:
-    # Modified by Claude: Message when simulation is skipped
-    print_info("1D simulation was skipped by user")
+        msh = mesh.Mesh()
+        if stage_cache.is_fresh('mesh_1d', mesh_1d_inputs, mesh_1d_params, [Params1D.solver_output_file]):
+            stage_cache.skip_message('mesh_1d')
+            mesh_1d_cached = True
+        else:
+            with StageTimer('mesh_1d', case.master_folder, outputs=[Params1D.solver_output_file]):
+                msh.generate(Params1D, Cl)
+            mesh_1d_cached = False
+
+        if mesh_1d_cached and stage_cache.is_fresh('solve_1d', [Params1D.solver_output_file], solve_1d_params):
+            stage_cache.skip_message('solve_1d')
+            print_info("Results saved to: " + case.res_folder_1D)
+        else:
+            # Modified by Claude: Improved simulation run output
+            print_section_header("1D SIMULATION: Running Solver")
+
+            # run 1D simulation
+            try:
+                print_info("Simulation parameters:")
+                print("    - Time steps: " + str(Params1D.num_time_steps))
+                print("    - Step size: " + str(Params1D.time_step))
+                print("    - Solver input: " + Params1D.solver_output_file)
+                print("    - Results folder: " + case.res_folder_1D)
+                print("")
+                print_info("Running 1D solver... (this may take a moment)")
+                with StageTimer('onedsolver', case.master_folder, outputs=[case.res_folder_1D], children=True):
+                    run_1d_simulation(OneDSolv, Params1D.solver_output_file, case.res_folder_1D)
+            except Exception as e:
+                print("\n  [ERROR] 1D simulation failed: " + str(e))
+                print("  Check the solver output file for details.\n")
+
+
+            # make sure simulation run successfully
+            num_of_file_in_res_folder_1D = len([f for f in os.listdir(case.res_folder_1D)])
+            #pdb.set_trace()
+            while num_of_file_in_res_folder_1D <= 3:
+                # Modified by Claude: improved error recovery messages
+                print("\n" + "-" * 70)
+                print("  [WARNING] Simulation may have failed (insufficient output files)")
+                print("-" * 70)
+                print("  Common cause: Large difference in inlet/outlet areas causing")
+                print("  negative outlet areas. Auto-adjusting mesh segmentation...")
+                Params1D.seg_min_num = Params1D.seg_min_num + 1
+                print_info("New minimum segments: " + str(Params1D.seg_min_num))
+                with StageTimer('mesh_1d_retry', case.master_folder):
+                    msh.generate(Params1D, Cl)
+                try:
+                    print_info("Re-running 1D simulation...")
+                    with StageTimer('onedsolver_retry', case.master_folder, outputs=[case.res_folder_1D], children=True):
+                        run_1d_simulation(OneDSolv, Params1D.solver_output_file, case.res_folder_1D)
+
+                except Exception as e:
+                    print("  [INFO] Continuing to adjust mesh segmentation...")
+                num_of_file_in_res_folder_1D = len([f for f in os.listdir(case.res_folder_1D)])
+
+            print_status("1D simulation completed successfully!")
+            print_info("Results saved to: " + case.res_folder_1D)
+
+            stage_cache.record('mesh_1d', mesh_1d_inputs, mesh_1d_params, [Params1D.solver_output_file])
+            flow_files = [os.path.join(case.res_folder_1D, f) for f in os.listdir(case.res_folder_1D) if f.endswith('_flow.dat')]
+            stage_cache.record('solve_1d', [Params1D.solver_output_file], solve_1d_params, flow_files)
+    else:
+        # Modified by Claude: Message when simulation is skipped
+        print_info("1D simulation was skipped by user")
 
 
 ####### 0D ########
@@ -215,3 +259,6 @@ else:
 # except Exception as e:
 #     print("well")
 
+
+if __name__ == "__main__":
+    main(case_config)
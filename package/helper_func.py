@@ -2,104 +2,86 @@ from sv import *
 from sv_rom_simulation import *
 from sv_auto_lv_modeling.modeling.src import meshing as svmeshtool
 import numpy as np
-import pdb
 import vtk
-from vtk.util import numpy_support
-from vtk.util.numpy_support import vtk_to_numpy as v2n
-from vtk.util.numpy_support import numpy_to_vtk as n2v
-import os 
-import shutil
-import time
+import os
 import sys
-import csv
 import subprocess
-import configparser
+from package.manifest import ask, is_headless
+from package.vtk_utils import get_points, get_point_array, get_polys
+from package.edge_size import surface_edge_lengths, centerline_fits_surface, edge_size_estimate
+from package.surface_faces import (FACE_ID_ARRAY, face_properties, face_table, write_face_table,
+                                   split_faces, write_polydata_files)
+# configparser is only needed by the 1D/0D parameter files and is imported there
 
 
 # ========================================================================
 # === Adaptive Edge Size (Added by Claude) ===
 # ========================================================================
 
-def compute_adaptive_edge_size(polydata):
+def compute_adaptive_edge_size(polydata, centerline=None):
     """
     Compute adaptive edge size based on model geometry.
 
     This function analyzes the input surface mesh and determines an appropriate
     edge size for remeshing based on:
     1. Model bounding box dimensions
-    2. Average existing edge length
-    3. Minimum vessel diameter estimation
+    2. Median length of all existing edges
+    3. Smallest vessel radii, when a centerline with radii is given
 
     Modified by Claude: Automatic edge size detection for robust meshing
 
     Parameters:
-    - polydata: VTK PolyData object (surface mesh)
+    - polydata:   VTK PolyData object (surface mesh)
+    - centerline: Optional centerline PolyData with a radius array
 
     Returns:
     - edge_size: Recommended edge size for remeshing
     """
-    import math
-
-    # Get bounding box
-    bounds = polydata.GetBounds()
-    size_x = bounds[1] - bounds[0]
-    size_y = bounds[3] - bounds[2]
-    size_z = bounds[5] - bounds[4]
-    max_dim = max(size_x, size_y, size_z)
-
-    # Sample existing edge lengths to understand current mesh density
-    points = polydata.GetPoints()
-    num_cells = polydata.GetNumberOfCells()
-
-    edge_lengths = []
-    sample_size = min(1000, num_cells)  # Sample up to 1000 cells
-    step = max(1, num_cells // sample_size)
-
-    for i in range(0, num_cells, step):
-        cell = polydata.GetCell(i)
-        if cell.GetNumberOfPoints() >= 3:
-            # Get first edge of the cell
-            p0 = points.GetPoint(cell.GetPointId(0))
-            p1 = points.GetPoint(cell.GetPointId(1))
-            edge_len = math.sqrt((p1[0]-p0[0])**2 + (p1[1]-p0[1])**2 + (p1[2]-p0[2])**2)
-            if edge_len > 0:
-                edge_lengths.append(edge_len)
-
-    if edge_lengths:
-        avg_edge = sum(edge_lengths) / len(edge_lengths)
-        min_edge = min(edge_lengths)
-        max_edge = max(edge_lengths)
-    else:
-        # Fallback: use 1.5% of max dimension
-        avg_edge = max_dim * 0.015
-        min_edge = avg_edge
-        max_edge = avg_edge
+    est = edge_size_estimate(polydata, centerline)
 
-    # Compute recommended edge size:
-    # - Use average edge length as baseline
-    # - Ensure it's reasonable relative to model size (0.5% to 3% of max dimension)
-    recommended = avg_edge
+    print("  [AUTO] Edge size computation:")
+    print("    Model dimensions: {:.2f} x {:.2f} x {:.2f}".format(*est['dims']))
+    print("    Existing edge lengths ({} edges): p5={:.4f}, median={:.4f}, mean={:.4f}, p95={:.4f}"
+          .format(est['n_edges'], est['p5'], est['median'], est['mean'], est['p95']))
+    if est['centerline_ignored']:
+        print("    [WARNING] Centerline lies outside the surface (another case?); using the surface only")
+    if est['radius_based'] is not None:
+        print("    Centerline radius p10: {:.4f} -> radius-based edge size {:.4f}"
+              .format(est['radius_p10'], est['radius_based']))
+    print("    Recommended edge size: {:.4f}".format(est['recommended']))
 
-    # Clamp to reasonable range based on model size
-    min_allowed = max_dim * 0.005  # At least 0.5% of model size
-    max_allowed = max_dim * 0.03   # At most 3% of model size
+    return est['recommended']
 
-    recommended = max(min_allowed, min(max_allowed, recommended))
 
-    # Round to 2 significant figures for cleaner value
-    if recommended > 0:
-        magnitude = 10 ** math.floor(math.log10(abs(recommended)))
-        recommended = round(recommended / magnitude, 1) * magnitude
+# ========================================================================
 
-    print("  [AUTO] Edge size computation:")
-    print("    Model dimensions: {:.2f} x {:.2f} x {:.2f}".format(size_x, size_y, size_z))
-    print("    Existing edge lengths: min={:.4f}, avg={:.4f}, max={:.4f}".format(min_edge, avg_edge, max_edge))
-    print("    Recommended edge size: {:.4f}".format(recommended))
 
-    return recommended
+_surface_cache = {}
 
 
-# ========================================================================
+def read_surface_cached(path, file_format='vtp'):
+    """
+    read_surface() with an in-process cache keyed by path, size and mtime.
+
+    Inside the persistent SimVascular worker (sv_worker.py) this module stays
+    imported between stages, so a surface read by one stage is reused by the
+    next instead of being parsed from disk again. Returns a copy, so callers
+    may modify the result freely.
+
+    Parameters:
+    - path:        Path to the surface file.
+    - file_format: Format passed on to read_surface (default 'vtp').
+
+    Returns:
+    - polydata: vtkPolyData owned by the caller.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _surface_cache:
+        _surface_cache[key] = read_surface(path, file_format, None)
+    polydata = vtk.vtkPolyData()
+    polydata.DeepCopy(_surface_cache[key])
+    return polydata
 
 
 def write_text(filename: str, content: str, mode: str = 'w') -> None:
@@ -119,62 +101,54 @@ def write_text(filename: str, content: str, mode: str = 'w') -> None:
         print("Error writing to file {!r}: {}".format(filename, e))
 
 
-def write_caps_and_wall(fpath,modeler):
-        # total_face_ids = modeler.get_face_ids()
-        # get_cap_ids = modeler.identify_caps()
-        # keep_true_cap = [i+1 for i in range(len(get_cap_ids)) if get_cap_ids[i] == True]
-        # for i , id in enumerate(keep_true_cap):
-        #     write_polydata(os.path.join(fpath,'cap_'+str(id)+'.vtp'),modeler.get_face_polydata(id))
-        # print("Caps written to: ", fpath)
+def write_caps_and_wall(fpath, modeler, max_workers=None):
+    """
+    Write every cap (cap_<face id>.vtp) and the wall (wall.vtp) of the model,
+    and the cap names to centerlines_outlets.dat next to `fpath`.
+
+    The faces are cut out of the model in one pass over its ModelFaceID array
+    (split_faces) and written on a thread pool.
+
+    Parameters:
+    - fpath:       caps_and_wall folder.
+    - modeler:     sv.modeling.PolyData of the capped, remeshed model;
+                   the first id of get_face_ids() is the wall, all others are caps.
+    - max_workers: Writer threads (default: up to 8).
+    """
+    total_face_ids = modeler.get_face_ids()
+    wall_id = total_face_ids[0]
+    cap_ids = total_face_ids[1:]  # All other ids are caps
+    print("Total face ids: ", total_face_ids)
+    print("Wall ids: ", wall_id)
+    print("Cap ids: ", cap_ids)
+
+    paths = {face_id: os.path.join(fpath, 'cap_' + str(face_id) + '.vtp') for face_id in cap_ids}
+    paths[wall_id] = os.path.join(fpath, 'wall.vtp')
+
+    polydata = modeler.get_polydata()
+    if polydata.GetCellData().GetArray(FACE_ID_ARRAY) is not None:
+        faces = split_faces(polydata, list(paths))
+    else:
+        faces = {face_id: modeler.get_face_polydata(face_id) for face_id in paths}
+    write_polydata_files({paths[face_id]: face for face_id, face in faces.items()}, max_workers)
+
+    cap_names = ['cap_' + str(face_id) for face_id in cap_ids]
+    write_text(os.path.join(os.path.dirname(fpath), 'centerlines_outlets.dat'),
+               ''.join(name + '\n' for name in cap_names), 'w')
 
-        # wall_ids = [i+1 for i in range(len(total_face_ids)) if i not in keep_true_cap]
-        # print("Total face ids: ", total_face_ids)
-        
-        # print('cap ids: ', keep_true_cap)
-        # print("Wall ids: ", wall_ids)
 
-        
-        # id 0 is the wall
-        total_face_ids = modeler.get_face_ids()
-        wall_ids = total_face_ids[0]
-        print("Total face ids: ", total_face_ids)
-        print("Wall ids: ", wall_ids)
-        cap_ids = total_face_ids[1:]  # All other ids are caps
-        print("Cap ids: ", cap_ids)
-        for i in cap_ids:
-            write_polydata(os.path.join(fpath, 'cap_' + str(i) + '.vtp'), modeler.get_face_polydata(i))
-        for i in [wall_ids]:
-            write_polydata(os.path.join(fpath, 'wall.vtp'), modeler.get_face_polydata(i))
-        # for i in total_face_ids:
-        #       write_polydata(os.path.join(fpath, 'face_' + str(i) + '.vtp'), modeler.get_face_polydata(i))
-        cap_names = [f for f in os.listdir(fpath)
-             if f.startswith('cap_') and f.endswith('.vtp')]
-        
-        for i, name in enumerate(cap_names):
-                name_no_ext = os.path.splitext(name)[0]          # strip '.vtp'
-                mode = 'w' if i == 0 else 'a'                    # write first, then append
-                write_text(os.path.join(os.path.dirname(fpath), 'centerlines_outlets.dat'),
-                        name_no_ext + '\n',
-                        mode)
-                
-                
 def create_rcr_bc_template(cap_folder_path, save_to):
     # extract filenames that start with 'cap_'
     cap_filenames = [f for f in os.listdir(cap_folder_path) if f.startswith('cap_') and f.endswith('.vtp')]
     cap_names = [os.path.splitext(fn)[0] for fn in cap_filenames]
     # sort the cap names
     cap_names.sort()
-    # write out the line separator
-    write_text(save_to,'2\n', 'w')
+    # line separator, then one block per cap; written at once
+    blocks = ['2\n']
     for i in cap_names:
-        # write out the cap name
-        write_text(save_to,'2\n', 'a')
-        write_text(save_to, i + '\n', 'a')
-        write_text(save_to, '<R_proximal>\n', 'a')
-        write_text(save_to, '<capacitance>\n', 'a') 
-        write_text(save_to, '<R_distal>\n', 'a')
-        write_text(save_to, '0.0 0.0\n', 'a')
-        write_text(save_to, '1.0 0.0\n', 'a')
+        blocks.append('2\n' + i + '\n' + '<R_proximal>\n' + '<capacitance>\n' + '<R_distal>\n'
+                      + '0.0 0.0\n' + '1.0 0.0\n')
+    write_text(save_to, ''.join(blocks), 'w')
 
 
 
@@ -182,7 +156,7 @@ def get_inlet_cap_name(caps_folder):
     """
     Ask the user for a cap name (without ".vtp"), verify it exists,
     and atomically set it as inlet.vtp (overwriting any previous one).
-    Works on both Windows and Linux/macOS.
+    Works on both Windows and Linux/macOS. Returns the chosen cap name.
 
     Modified by Claude: Improved user prompts with clearer formatting
     """
@@ -198,11 +172,14 @@ def get_inlet_cap_name(caps_folder):
 
     while True:
         # Modified by Claude: clearer input prompt
-        name = input("  Enter inlet cap name (e.g., cap_2): ")
+        name = ask('inlet_cap', "  Enter inlet cap name (e.g., cap_2): ")
         src = os.path.join(caps_folder, name + '.vtp')
         dst = os.path.join(caps_folder, 'inlet.vtp')
 
         if not os.path.exists(src):
+            if is_headless():
+                raise ValueError("Inlet cap '{0}.vtp' from the run manifest does not exist in {1}"
+                                 .format(name, caps_folder))
             print("  [ERROR] Cap file '{0}.vtp' does not exist. Try again.\n".format(name))
             continue
 
@@ -214,7 +191,7 @@ def get_inlet_cap_name(caps_folder):
             sys.exit(1)
 
         print("  [OK] Inlet cap set: '{0}.vtp' -> 'inlet.vtp'\n".format(name))
-        return
+        return name
     # rename path to inlet.vtp
     # later centerlines_outlets.dat will automatically be changed (remove the cap name of the inlet)
 
@@ -246,29 +223,59 @@ def compute_surface_area(polydata: vtk.vtkPolyData) -> float:
     return mass.GetSurfaceArea()
 
 
-def write_helper_txt(master_folder,caps_folder):
+def write_helper_txt(master_folder, caps_folder, polydata=None, inlet_name=None):
+    """
+    Write the cap table of the model: model_info.txt (readable, for setting
+    RCR values) and model_info.csv (area, equivalent radius, centroid and
+    normal of every cap).
+
+    Parameters:
+    - master_folder: Folder the two files are written to.
+    - caps_folder:   Folder with the cap_<face id>.vtp files and inlet.vtp.
+    - polydata:      Capped model with its ModelFaceID array (modeler.get_polydata());
+                     all caps are then measured in one pass over it. Without it,
+                     each cap file is read and measured on its own.
+    - inlet_name:    Cap chosen as inlet (e.g. 'cap_2'), now stored as inlet.vtp.
+
+    Returns:
+    - helper_txt: path of model_info.txt
+    """
     helper_txt = os.path.join(master_folder, 'model_info.txt')
-    for i in range(len(os.listdir(caps_folder))):
-        cap_file = os.listdir(caps_folder)[i]
-        if cap_file.startswith('cap_') and cap_file.endswith('.vtp'):
-            cap_polydata = read_surface(os.path.join(caps_folder, cap_file), 'vtp', None)
-            area = compute_surface_area(cap_polydata)
-            cap_name = os.path.splitext(cap_file)[0]
-            if i == 0:
-                write_text(
-                                helper_txt,
-                                'Cap {} area: {}\n'.format(cap_name, area),
-                                'w'
-                                )
-            else:
-                write_text(
-                                helper_txt,
-                                'Cap {} area: {}\n'.format(cap_name, area),
-                                'a'
-                                )
-    write_text(helper_txt, 'for more information about rcr, consult other resources such as https://www.youtube.com/watch?v=3QRYhTRz9nw', mode = 'a')
-    write_text(helper_txt, 'total Resistance = R_proximal + R_distal = P_mean/Q_mean', mode = 'a')
-    write_text(helper_txt, 'characteristic fill time of compliance = C * R_distal', mode = 'a')
+    cap_files = sorted((f for f in os.listdir(caps_folder) if f.endswith('.vtp')
+                        and (f.startswith('cap_') or f == 'inlet.vtp')),
+                       key=lambda f: (f != 'inlet.vtp', len(f), f))
+    names = [os.path.splitext(f)[0] for f in cap_files]
+    roles = ['inlet' if name == 'inlet' else 'outlet' for name in names]
+
+    def face_id(name):
+        name = inlet_name if name == 'inlet' else name
+        try:
+            return int(name.split('_', 1)[1])
+        except (AttributeError, IndexError, ValueError):
+            return -1
+
+    face_ids = [face_id(name) for name in names]
+    if polydata is not None and polydata.GetCellData().GetArray(FACE_ID_ARRAY) is not None \
+            and all(i >= 0 for i in face_ids):
+        properties = face_properties(polydata, face_ids)
+    else:
+        per_cap = [face_properties(read_surface(os.path.join(caps_folder, f), 'vtp', None), [0], None)
+                   for f in cap_files]
+        properties = {key: np.concatenate([p[key] for p in per_cap]) if per_cap else np.zeros(0)
+                      for key in ('area', 'centroid', 'normal', 'equivalent_radius')}
+        properties['face_id'] = np.asarray(face_ids)
+    rows = face_table(properties, [inlet_name if n == 'inlet' and inlet_name else n for n in names], roles)
+    write_face_table(os.path.join(master_folder, 'model_info.csv'), rows)
+
+    lines = []
+    for row in rows:
+        label = row['name'] + (' (inlet)' if row['role'] == 'inlet' else '')
+        lines.append('Cap {} area: {} equivalent radius: {}\n'.format(label, row['area'], row['equivalent_radius']))
+    lines.append('Per-cap centroids and normals: model_info.csv\n')
+    lines.append('for more information about rcr, consult other resources such as https://www.youtube.com/watch?v=3QRYhTRz9nw\n')
+    lines.append('total Resistance = R_proximal + R_distal = P_mean/Q_mean\n')
+    lines.append('characteristic fill time of compliance = C * R_distal\n')
+    write_text(helper_txt, ''.join(lines), 'w')
     return helper_txt
 
 def get_number_of_timesteps(n_cyc,inflow_file):
@@ -282,7 +289,11 @@ def get_number_of_timesteps(n_cyc,inflow_file):
         if num_time_steps < num_lines:
             print('Number of time steps is trivial')
             print("Please check the inflow file or adjust the number of cycles.")
+            if is_headless():
+                raise ValueError("number_of_cycles={} gives fewer time steps than one inflow cycle"
+                                 .format(n_cyc))
             n_cyc = int(input("Enter the number of cycles: "))
+            num_time_steps = n_cyc * num_lines
         else: 
             #print("The number of time steps is: ", num_time_steps)
             return num_time_steps
@@ -383,6 +394,7 @@ def write_template_config(path,order):
     Writes out an INI-style template config file at `path`.
     Users can open and edit this, changing values as needed.
     """
+    import configparser
     cfg = configparser.ConfigParser()
 
     # Section for your 1D sim parameters
@@ -427,6 +439,7 @@ def load_config(path, inflow_file_path,P = None):
     if not os.path.exists(path):
         raise IOError("Config file not found: {}".format(path))
 
+    import configparser
     cfg = configparser.ConfigParser()
     cfg.read(path)
 
@@ -0,0 +1,272 @@
+"""
+inflow_builder.py - Inflow waveforms without the GUI editor
+
+gen_inflow.py asks a person to drag control points in a matplotlib window,
+which is not possible on headless compute nodes. This module builds the same
+inflow_1d.flow from
+  - a template shape (TEMPLATES: aortic, carotid, coronary, pulmonary),
+    scaled to a cardiac output / mean flow and a heart rate, or
+  - a measured waveform in a CSV file (time, flow columns).
+The waveform is closed into one periodic cycle and resampled with the same
+quadratic interpolation the GUI uses (resample_inflow, shared with
+gen_inflow.postprocess_inflow).
+
+Usage:
+    python -m package.inflow_builder --template aortic --hr 70 --cardiac-output 5.0 --steps 1200
+    python -m package.inflow_builder --csv measured_flow.csv --steps 1200 --out inflow_1d.flow
+    python -m package.inflow_builder --list
+
+Headless runs (run manifest) build the inflow in the inflow stage instead of
+opening the editor:
+
+    inflow:
+      template: aortic       # or  csv: /path/to/flow.csv
+      heart_rate: 70         # bpm
+      cardiac_output: 5.0    # L/min (or mean_flow: mL/s)
+      steps: 1200            # time steps per cycle
+      fourier_modes: 32      # optional: also keep it as a Fourier series (fourier_inflow.py)
+
+The templates are typical textbook shapes for the named vessels, meant as a
+starting point when no patient measurement is available.
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+try:
+    from package.manifest import get_value
+except ImportError:  # imported next to the stage scripts (from __init__ import *)
+    from manifest import get_value
+
+# name -> (normalized time [0-1], flow relative to the peak, default mean flow [mL/s])
+TEMPLATES = {
+    'aortic': (
+        [0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40, 0.50, 0.60, 0.70, 0.80, 0.90, 1.0],
+        [0.0, 0.35, 0.95, 1.00, 0.75, 0.40, 0.05, -0.08, 0.0, 0.02, 0.01, 0.0, 0.0, 0.0, 0.0],
+        83.3),   # 5 L/min
+    'carotid': (
+        [0.0, 0.05, 0.10, 0.14, 0.20, 0.26, 0.32, 0.40, 0.55, 0.70, 0.85, 1.0],
+        [0.30, 0.45, 0.95, 1.00, 0.70, 0.50, 0.55, 0.45, 0.38, 0.34, 0.31, 0.30],
+        6.5),
+    'coronary': (
+        [0.0, 0.05, 0.12, 0.22, 0.32, 0.40, 0.48, 0.58, 0.70, 0.82, 0.92, 1.0],
+        [0.35, 0.30, 0.45, 0.40, 0.55, 1.00, 0.95, 0.80, 0.65, 0.52, 0.42, 0.35],
+        1.2),
+    'pulmonary': (
+        [0.0, 0.05, 0.10, 0.15, 0.22, 0.30, 0.36, 0.42, 0.50, 0.60, 0.75, 0.90, 1.0],
+        [0.0, 0.30, 0.85, 1.00, 0.80, 0.40, 0.05, -0.03, 0.0, 0.0, 0.0, 0.0, 0.0],
+        83.3),   # 5 L/min
+}
+
+
+def close_cycle(x_norm, y):
+    """
+    Make a waveform exactly periodic over normalized time [0, 1]: append the
+    first value at 1 if the samples stop short of it, and give the first and
+    last sample the same value (as the GUI editor does when dragging either).
+    """
+    x_norm = np.asarray(x_norm, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x_norm[-1] < 1.0:
+        x_norm = np.append(x_norm, 1.0)
+        y = np.append(y, y[0])
+    y = y.copy()
+    y[0] = y[-1] = 0.5 * (y[0] + y[-1])
+    return x_norm, y
+
+
+def resample_inflow(x_norm, y, hr, steps):
+    """
+    Sample a waveform given over normalized time [0, 1] at `steps` points of
+    one cardiac cycle, with quadratic interpolation in real seconds.
+
+    Parameters:
+    - x_norm, y: Waveform samples (e.g. the GUI control curve or a template).
+    - hr:        Heart rate [bpm]; the cycle lasts 60 / hr seconds.
+    - steps:     Number of samples per cycle (first and last at 0 and 60 / hr).
+
+    Returns:
+    - time, flow: 1D arrays of length `steps`.
+    """
+    from scipy.interpolate import interp1d
+
+    # compute cycle length and time axis
+    cyc  = 60.0 / hr
+    time = np.linspace(0, cyc, steps)
+
+    # build interpolator in real seconds
+    x_time = np.asarray(x_norm, dtype=float) * cyc
+    f_time = interp1d(x_time, y, kind='quadratic', fill_value='extrapolate')
+    return time, f_time(time)
+
+
+def cycle_mean(time, flow):
+    """Time-averaged flow over one sampled cycle."""
+    return 0.5 * np.sum((flow[1:] + flow[:-1]) * np.diff(time)) / (time[-1] - time[0])
+
+
+def read_waveform_csv(path, time_column=0, flow_column=1, period=None):
+    """
+    Read a measured waveform (one cycle) from a CSV / whitespace-separated file.
+    Header and comment lines are skipped.
+
+    Parameters:
+    - period: Cycle length [s]; default: the time span plus one sampling
+              interval (samples cover the cycle without repeating t = 0).
+
+    Returns:
+    - x_norm, flow, period
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.replace(',', ' ').split()
+            try:
+                rows.append([float(v) for v in fields])
+            except ValueError:
+                continue  # header or comment
+    rows = [r for r in rows if len(r) > max(time_column, flow_column)]
+    if len(rows) < 3:
+        raise ValueError("{} holds fewer than 3 numeric rows with columns {} and {}"
+                         .format(path, time_column, flow_column))
+    data = np.array([(r[time_column], r[flow_column]) for r in rows])
+    time, flow = data[:, 0], data[:, 1]
+    order = np.argsort(time, kind='stable')
+    time, flow = time[order] - time[order][0], flow[order]
+    if period is None:
+        period = time[-1] + np.median(np.diff(time))
+    return time / period, flow, period
+
+
+def build_inflow(template=None, csv=None, hr=None, steps=1200, cardiac_output=None, mean_flow=None,
+                 period=None):
+    """
+    Periodic inflow waveform from a template or a measured CSV.
+
+    Parameters:
+    - template:       Name in TEMPLATES (ignored if csv is given).
+    - csv:            Measured waveform file (time, flow).
+    - hr:             Heart rate [bpm]; default 60 for templates, the measured
+                      period for a CSV.
+    - steps:          Time steps per cycle.
+    - cardiac_output: Target mean flow in L/min, or
+    - mean_flow:      target mean flow in mL/s. Without either, a template
+                      uses its default mean flow and a CSV keeps its values.
+
+    Returns:
+    - time, flow: arrays of length `steps` (the contents of inflow_1d.flow).
+    """
+    # manifest values arrive as strings from an .ini file
+    hr, period, cardiac_output, mean_flow = (None if v is None else float(v)
+                                             for v in (hr, period, cardiac_output, mean_flow))
+    if csv:
+        x_norm, y, period = read_waveform_csv(csv, period=period)
+        hr = hr or 60.0 / period
+        default_mean = None
+    else:
+        if template not in TEMPLATES:
+            raise ValueError("Unknown inflow template '{}' (available: {})"
+                             .format(template, ', '.join(sorted(TEMPLATES))))
+        x_norm, y, default_mean = TEMPLATES[template]
+        hr = hr or 60.0
+
+    x_norm, y = close_cycle(x_norm, y)
+    time, flow = resample_inflow(x_norm, y, hr, int(steps))
+
+    if cardiac_output is not None:
+        mean_flow = cardiac_output * 1000.0 / 60.0  # L/min -> mL/s
+    target = mean_flow if mean_flow is not None else default_mean
+    if target is not None:
+        flow = flow * (float(target) / cycle_mean(time, flow))
+    return time, flow
+
+
+def write_inflow_file(path, time, flow):
+    """Write an inflow_1d.flow table ("time flow" per line) in one call."""
+    np.savetxt(path, np.column_stack([time, flow]), fmt='%.6f %.6f')
+    return path
+
+
+def save_inflow(path, time, flow, fourier_modes=None):
+    """
+    Write inflow_1d.flow; with `fourier_modes`, also store the waveform as a
+    Fourier series (fourier_inflow.py) and write the table synthesized from it.
+    """
+    if not fourier_modes:
+        # a series left from an earlier waveform would overwrite this table in the 1D/0D setup
+        stale = os.path.splitext(path)[0] + '.fourier.json'
+        if os.path.exists(stale):
+            os.remove(stale)
+            print("  [INFO] Removed {} of the previous waveform".format(os.path.basename(stale)))
+        return write_inflow_file(path, time, flow)
+    try:
+        from package.fourier_inflow import write_spectral_inflow
+    except ImportError:
+        from fourier_inflow import write_spectral_inflow
+    write_spectral_inflow(path, time, flow, int(fourier_modes))
+    return path
+
+
+def build_from_manifest(inflow_file_path):
+    """
+    Build inflow_1d.flow from the `inflow` block of the run manifest.
+
+    Returns:
+    - path, or None if the manifest names neither a template nor a csv.
+    """
+    template, csv = get_value('inflow.template'), get_value('inflow.csv')
+    if not template and not csv:
+        return None
+    time, flow = build_inflow(template=template, csv=csv,
+                              hr=get_value('inflow.heart_rate'),
+                              steps=int(get_value('inflow.steps', 1200)),
+                              cardiac_output=get_value('inflow.cardiac_output'),
+                              mean_flow=get_value('inflow.mean_flow'),
+                              period=get_value('inflow.period'))
+    save_inflow(inflow_file_path, time, flow, get_value('inflow.fourier_modes'))
+    print("Inflow built from {} ({} steps, mean flow {:.3f} mL/s): {}".format(
+        'template ' + template if not csv else csv, len(time), cycle_mean(time, flow), inflow_file_path))
+    return inflow_file_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m package.inflow_builder',
+                                     description='Build inflow_1d.flow from a template or a measured CSV.')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--template', choices=sorted(TEMPLATES), help='waveform template')
+    source.add_argument('--csv', help='measured waveform: time and flow columns, one cycle')
+    source.add_argument('--list', action='store_true', help='list the templates and exit')
+    parser.add_argument('--hr', type=float, default=None, help='heart rate [bpm]')
+    parser.add_argument('--steps', type=int, default=1200, help='time steps per cycle (default: 1200)')
+    parser.add_argument('--cardiac-output', type=float, default=None, help='mean flow [L/min]')
+    parser.add_argument('--mean-flow', type=float, default=None, help='mean flow [mL/s]')
+    parser.add_argument('--period', type=float, default=None, help='cycle length of the CSV data [s]')
+    parser.add_argument('--out', default=None, help='output file (default: inflow_1d.flow of the case)')
+    parser.add_argument('--fourier-modes', type=int, default=None,
+                        help='also store the waveform as this many Fourier harmonics (<out>.fourier.json)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in sorted(TEMPLATES):
+            print("  {:<10} default mean flow {:>6.1f} mL/s".format(name, TEMPLATES[name][2]))
+        return 0
+    if not args.template and not args.csv:
+        parser.error('give --template or --csv')
+
+    out = args.out
+    if out is None:
+        from package import case_config
+        out = case_config.inflow_file_path
+    time, flow = build_inflow(args.template, args.csv, args.hr, args.steps,
+                              args.cardiac_output, args.mean_flow, args.period)
+    save_inflow(out, time, flow, args.fourier_modes)
+    print("  ✓ Inflow written: {} ({} steps, cycle {:.3f} s, mean flow {:.3f} mL/s)".format(
+        out, len(time), time[-1], cycle_mean(time, flow)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
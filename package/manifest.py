@@ -0,0 +1,149 @@
+"""
+manifest.py - Run manifest for unattended (headless) MIROS runs
+
+A run manifest answers, ahead of time, every question MIROS would otherwise
+ask on the terminal (run mode, inlet cap, extraction options, skip flags).
+`python -m package --manifest run.yaml` exports the manifest path through the
+MIROS_MANIFEST environment variable so every stage script launched as a
+subprocess picks up the same answers.
+
+Supported formats: JSON (.json), YAML (.yaml/.yml, needs PyYAML) and INI
+(.ini/.cfg). Example (YAML):
+
+    run_mode: 1
+    inlet_cap: cap_2
+    inflow:
+      use_existing: yes
+    simulation_1d:
+      run: yes          # yes / skip
+    simulation_0d:
+      run: yes          # yes / skip
+    extract_1d:
+      plot: no
+      display_geometry: no
+      project_3d: no    # build (once) / use the volume mesh
+      segments: outlets # all / outlets
+    extract_0d:
+      show_plots: no
+      save_plots: yes
+      segments: outlets # all / outlets
+
+In INI files, top-level keys go in a [miros] section and every other section
+maps to the nested block of the same name.
+"""
+
+import os
+import json
+import configparser
+
+MANIFEST_ENV = 'MIROS_MANIFEST'
+
+_manifest_cache = {}
+
+
+def load_manifest(path):
+    """
+    Read a run manifest from disk and return it as a nested dict.
+
+    Parameters:
+    - path: Path to a .json, .yaml/.yml or .ini/.cfg manifest.
+
+    Returns:
+    - manifest: dict, top-level keys plus one nested dict per section.
+    """
+    if not os.path.exists(path):
+        raise IOError("Run manifest not found: {}".format(path))
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    elif ext in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML manifests requires PyYAML (pip install pyyaml), "
+                              "or use a .json/.ini manifest instead.")
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = yaml.safe_load(f) or {}
+    elif ext in ('.ini', '.cfg'):
+        cfg = configparser.ConfigParser()
+        cfg.read(path)
+        manifest = {}
+        for section in cfg.sections():
+            if section.lower() == 'miros':
+                manifest.update(cfg[section])
+            else:
+                manifest[section] = dict(cfg[section])
+    else:
+        raise ValueError("Unsupported manifest format '{}' (use .json, .yaml or .ini)".format(ext))
+
+    if not isinstance(manifest, dict):
+        raise ValueError("Run manifest {} must contain a mapping at the top level".format(path))
+    return manifest
+
+
+def get_manifest():
+    """
+    Return the manifest named by MIROS_MANIFEST, or an empty dict when MIROS
+    is running interactively.
+    """
+    path = os.environ.get(MANIFEST_ENV)
+    if not path:
+        return {}
+    if path not in _manifest_cache:
+        _manifest_cache[path] = load_manifest(path)
+    return _manifest_cache[path]
+
+
+def is_headless():
+    """True when a run manifest drives this run (no terminal prompts)."""
+    return bool(os.environ.get(MANIFEST_ENV))
+
+
+def get_value(key, default=None):
+    """
+    Look up a dotted key (e.g. 'extract_1d.plot') in the active manifest.
+    """
+    node = get_manifest()
+    for part in key.split('.'):
+        if not isinstance(node, dict) or part not in node:
+            return default
+        node = node[part]
+    return node
+
+
+def _normalize(value):
+    """Turn manifest values (bools, ints, strings) into prompt-style answers."""
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    return str(value).strip()
+
+
+def ask(key, prompt, choices=None, default=None):
+    """
+    Answer a prompt from the run manifest, or fall back to input().
+
+    Parameters:
+    - key:     Dotted manifest key holding the answer (e.g. 'simulation_1d.run').
+    - prompt:  Text passed to input() when running interactively.
+    - choices: Accepted answers in headless mode; anything else is an error
+               instead of a re-prompt, since nobody is there to retry.
+    - default: Answer used in headless mode when the manifest omits `key`.
+
+    Returns:
+    - answer: str, as typed by the user or taken from the manifest.
+    """
+    if not is_headless():
+        return input(prompt)
+
+    value = get_value(key, default)
+    if value is None:
+        raise ValueError("Run manifest {} has no value for '{}', which is required "
+                         "in headless mode".format(os.environ[MANIFEST_ENV], key))
+    answer = _normalize(value)
+    if choices is not None and answer.lower() not in choices:
+        raise ValueError("Run manifest value {}={!r} is invalid, expected one of: {}"
+                         .format(key, answer, ', '.join(choices)))
+    print(prompt + answer + "  [manifest]")
+    return answer
@@ -1,13 +1,22 @@
 import pyvista as pv 
 import vtk
 import numpy as np
-from scipy.spatial.distance import pdist, squareform
-import pdb
 import os
-from __init__ import *
-from scipy.spatial.distance import cdist
-import numpy as np
-from scipy.sparse.csgraph import minimum_spanning_tree
+import time
+try:
+    from package import *
+    from package.manifest import ask
+    from package.vtk_utils import (write_vtk, get_points, get_polys, get_cells, get_point_array, get_cell_array,
+                                   make_polys, numpy_to_vtk_array)
+except ImportError:  # run as a script next to __init__.py
+    from __init__ import *
+    from manifest import ask
+    from vtk_utils import (write_vtk, get_points, get_polys, get_cells, get_point_array, get_cell_array,
+                           make_polys, numpy_to_vtk_array)
+from vtk.util.numpy_support import vtk_to_numpy
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree, connected_components, depth_first_order, shortest_path
 import math 
         
 def clip_segseq_TF():
@@ -19,8 +28,9 @@ def clip_segseq_TF():
         print( "\n Do you want to automatically clip the seqseg model? \n")
         print('note: depending on your model complexity (are there any branch outlet next to other vessels),this method may not be robust.')
         print('Recommend using SimVascular to clip the caps open tailoring to your needs.')
-        answer = input(
-            "Do you want to automatically clip the seqseg model? (yes/no): "
+        answer = ask('auto_clip',
+            "Do you want to automatically clip the seqseg model? (yes/no): ",
+            choices=('yes', 'no'), default='no'
         )
         if answer.lower() == "yes":
             print("Clipping the seqseg model...")
@@ -33,150 +43,180 @@ def clip_segseq_TF():
 
 
 
-def compute_mst_per_branch(cl_dict):
+def group_branches(centerline_ids):
+    """
+    Point indices of every centerline branch, from the per-point CenterlineId
+    array, with one stable argsort instead of a loop over the points.
+
+    Returns:
+      branches: {branch_id: int array of point indices (ascending)}
+    """
+    centerline_ids = np.asarray(centerline_ids).ravel()
+    order = np.argsort(centerline_ids, kind='stable')
+    branch_ids, starts = np.unique(centerline_ids[order], return_index=True)
+    return {int(cid): idx for cid, idx in zip(branch_ids, np.split(order, starts[1:]))}
+
+
+def branch_mst(pts_arr, k=8):
+    """
+    Minimum spanning tree of one branch's points over a sparse k-nearest-
+    neighbour graph (cKDTree), so memory grows linearly with the number of
+    points instead of the N x N distance matrix. k is doubled until the graph
+    is connected; at k = N-1 this is the complete graph.
+
+    Returns:
+      mst: scipy.sparse matrix holding the N-1 tree edges (weights = lengths)
+    """
+    n = pts_arr.shape[0]
+    tree = cKDTree(pts_arr)
+    # coincident points have distance 0, which csgraph reads as "no edge"
+    eps = 1e-12 * max(float(np.ptp(pts_arr, axis=0).max()), 1.0)
+    while True:
+        kk = min(k, n - 1)
+        dist, idx = tree.query(pts_arr, k=kk + 1)  # column 0 is the point itself
+        rows = np.repeat(np.arange(n), kk)
+        graph = coo_matrix((np.maximum(dist[:, 1:].ravel(), eps), (rows, idx[:, 1:].ravel())),
+                           shape=(n, n)).tocsr()
+        graph = graph.maximum(graph.T)
+        if kk == n - 1 or connected_components(graph, directed=False, return_labels=False) == 1:
+            return minimum_spanning_tree(graph)
+        k *= 2
+
+
+def compute_mst_per_branch(cl_dict, k=8):
     """
     Input:
-      cl_dict: {branch_id: [(x,y,z), …], …}
+      cl_dict: {branch_id: (N,3) array or [(x,y,z), …], …}
+      k:       neighbours per point in the sparse graph (raised automatically
+               if the branch's k-NN graph is disconnected)
     Returns:
-      mst_edges: {branch_id: [(i,j), …], …}
-        where each (i,j) is an edge in the MST over that branch’s points
+      mst_edges: {branch_id: (N-1,2) int array, …}
+        where each row (i,j) is an edge in the MST over that branch’s points
         using the point‐indices in the original list.
     """
     mst_edges = {}
     for cid, pts in cl_dict.items():
-        pts_arr = np.array(pts)              # shape (N,3)
+        pts_arr = np.asarray(pts, dtype=float)  # shape (N,3)
         if pts_arr.shape[0] < 2:
-            mst_edges[cid] = []
+            mst_edges[cid] = np.zeros((0, 2), dtype=np.int64)
             continue
 
-        # 1) Compute full N×N distance matrix
-        D = squareform(pdist(pts_arr))
-        # 2) Minimum spanning tree (returns sparse)
-        mst_sparse = minimum_spanning_tree(D)
-        # 3) Extract edges: use the COO format for simplicity
-        coo = mst_sparse.tocoo()
-        edges = list(zip(coo.row.tolist(), coo.col.tolist()))
-        mst_edges[cid] = edges
+        coo = branch_mst(pts_arr, k).tocoo()
+        mst_edges[cid] = np.stack([coo.row, coo.col], axis=1).astype(np.int64)
 
     return mst_edges
 
 def get_ordered_centerlines(cl_dict, mst_trees):
     """
-    Reorders each branch’s points according to its MST edges.
+    Orders each branch’s points along its MST, without recursion.
+
+    The traversal starts at one end of the tree's longest path (the point
+    farthest from an arbitrary point, measured along the tree) and visits the
+    points depth-first (scipy.sparse.csgraph.depth_first_order), so a
+    branch of any length is ordered end to end.
 
     Parameters
     ----------
-    cl_dict : dict[int, list[tuple]]
-        Mapping branch_id → list of (x,y,z) points (unsorted).
-    mst_trees : dict[int, list[tuple[int,int]]]
-        Mapping branch_id → list of edges (i,j) from compute_mst_per_branch.
+    cl_dict : dict[int, array-like]
+        Mapping branch_id → (N,3) points (unsorted).
+    mst_trees : dict[int, ndarray]
+        Mapping branch_id → (N-1,2) edges from compute_mst_per_branch.
 
     Returns
     -------
-    ordered_dict : dict[int, list[tuple]]
-        Mapping branch_id → list of (x,y,z) points ordered along the MST.
+    ordered_dict : dict[int, ndarray]
+        Mapping branch_id → indices into that branch's points, in MST order.
     """
     ordered_dict = {}
 
     for cid, edges in mst_trees.items():
-        pts = cl_dict[cid]
-        N = len(pts)
+        pts = np.asarray(cl_dict[cid], dtype=float)
+        N = pts.shape[0]
         # trivial cases
         if N <= 1:
-            ordered_dict[cid] = pts.copy()
+            ordered_dict[cid] = np.arange(N)
             continue
 
-        # 1) build adjacency list
-        adj = {i: [] for i in range(N)}
-        for i, j in edges:
-            adj[i].append(j)
-            adj[j].append(i)
+        # 1) undirected tree as a sparse graph, edge weights = segment lengths
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        lengths = np.linalg.norm(pts[edges[:, 0]] - pts[edges[:, 1]], axis=1)
+        lengths = np.maximum(lengths, 1e-12 * max(float(np.ptp(pts, axis=0).max()), 1.0))
+        tree = coo_matrix((lengths, (edges[:, 0], edges[:, 1])), shape=(N, N)).tocsr()
 
-        # 2) find endpoints (nodes of degree 1)
-        endpoints = [i for i, nbrs in adj.items() if len(nbrs) == 1]
-        start = endpoints[0] if endpoints else 0
+        # 2) start at an end of the longest path: the point farthest from point 0
+        dist = shortest_path(tree, directed=False, indices=0)
+        start = int(np.argmax(np.where(np.isfinite(dist), dist, -1.0)))
 
-        # 3) traverse the tree (DFS) to collect indices in order
-        visited = set()
-        ordered_idx = []
-
-        def dfs(u):
-            visited.add(u)
-            ordered_idx.append(u)
-            for v in adj[u]:
-                if v not in visited:
-                    dfs(v)
-
-        dfs(start)
-
-        # 4) map indices back to coordinates
-        ordered_dict[cid] = [pts[k] for k in ordered_idx]
+        # 3) iterative depth-first traversal
+        ordered_dict[cid] = depth_first_order(tree, start, directed=False, return_predecessors=False)
 
     return ordered_dict
 
-def orient_centerlines(ordered_cl_dict, reference_point=None):
+def orient_centerlines(ordered_cl_dict, reference_point=None, points=None):
     """
     Ensure every centerline branch starts closest to `reference_point`.
 
     Parameters
     ----------
-    ordered_cl_dict : dict[int, list[tuple]]
-        branch_id → its list of (x,y,z) in some end‑to‑end order
+    ordered_cl_dict : dict[int, ndarray]
+        branch_id → its (N,3) points in some end‑to‑end order, or its point
+        indices into `points` in that order
     reference_point : array‑like of shape (3,), optional
        The “root” location all branch‐starts should approximate.
        If None, we auto‑compute it as the centroid of all branch‐endpoints.
+    points : ndarray (M,3), optional
+       Centerline points the index arrays refer to.
 
     Returns
     -------
-    oriented_cl_dict : dict[int, list[tuple]]
+    oriented_cl_dict : dict[int, ndarray]
         Same keys, but each value reversed if needed so that its first
         point is the endpoint closest to reference_point.
     """
-    # 1) compute a reference if none given
+    cids = list(ordered_cl_dict)
+    arrays = [np.asarray(ordered_cl_dict[cid]) for cid in cids]
+    if not arrays:
+        return {}
+    first = np.array([arr[0] for arr in arrays])
+    last = np.array([arr[-1] for arr in arrays])
+    if points is not None:
+        first, last = points[first], points[last]
+    first, last = first.astype(float), last.astype(float)
+
+    # 1) compute a reference if none given: centroid of every branch's two ends
     if reference_point is None:
-        # collect all candidates: every branch's two ends
-        pts = []
-        for pts_list in ordered_cl_dict.values():
-            #pdb.set_trace()
-            pts.append(pts_list[0])
-            pts.append(pts_list[-1])
-        reference_point = np.mean(np.array(pts), axis=0)
-
-    ref = np.array(reference_point)
-
-    # 2) re‑orient each branch
-    oriented = {}
-    for cid, pts_list in ordered_cl_dict.items():
-        arr = np.array(pts_list)
-        d0 = np.linalg.norm(arr[0]  - ref)
-        d1 = np.linalg.norm(arr[-1] - ref)
-        if d1 < d0:
-            # end is closer → flip
-            oriented[cid] = pts_list[::-1]
-        else:
-            oriented[cid] = pts_list.copy()
+        reference_point = np.vstack([first, last]).mean(axis=0)
+    ref = np.asarray(reference_point, dtype=float)
 
-    return oriented
+    # 2) re‑orient each branch: flip where the end is closer than the start
+    flip = np.linalg.norm(last - ref, axis=1) < np.linalg.norm(first - ref, axis=1)
+    return {cid: arr[::-1] if f else arr for cid, arr, f in zip(cids, arrays, flip)}
 
-def get_clipping_box_parameters(final_cl,clpd):
+def get_clipping_box_parameters(final_cl, points, radii):
     """
     get endpoints (the last 90 percent), unit vector, and cross sectional area of each line
+
+    Parameters
+    ----------
+    final_cl : dict[int, ndarray]
+        branch_id → oriented point indices into `points`
+    points : ndarray (M,3)
+        centerline points
+    radii : ndarray (M,)
+        MaximumInscribedSphereRadius of each centerline point
     """
     clipping_params = {}
-    for cid, coords in final_cl.items():
-        start = np.array(coords[0])
-        length = len(coords)
+    for cid, ids in final_cl.items():
+        start = points[ids[0]]
+        length = len(ids)
         length_to_use = int(length * 0.95)  # use the last 90 percent
-        second_to_last = np.array(coords[length_to_use - 1])
-        end = np.array(coords[length_to_use])
+        second_to_last = points[ids[length_to_use - 1]]
+        end_id = ids[length_to_use]
+        end = points[end_id]
         unit_vector = (end - second_to_last) / np.linalg.norm(end - second_to_last)
-        
-        # get cross sectional area by reading the centerline polydata and extract attribute MaximumInscribedSphereRadius
-        # this is a proxy for the cross sectional area
-        
-        index = np.where(clpd.points == end)[0][0]
-        cross_sectional_area = clpd['MaximumInscribedSphereRadius'][index] ** 2 * np.pi   
 
+        # MaximumInscribedSphereRadius at the end point is a proxy for the cross sectional area
+        cross_sectional_area = radii[end_id] ** 2 * np.pi
 
         clipping_params[cid] = {
             'start': start,
@@ -185,25 +225,17 @@ def get_clipping_box_parameters(final_cl,clpd):
             'cross_sectional_area': cross_sectional_area
         }
     return clipping_params
-def generate_oriented_boxes(clipping_params, output_folder, box_scale=3):
+def oriented_box_frames(clipping_params, box_scale=3):
     """
-    Args:
-      clipping_params: dict mapping an integer key to a dict with:
-        - 'start':      np.array([x,y,z], dtype=float)
-        - 'unit_vector':np.array([ux,uy,uz], dtype=float)
-        - 'cross_sectional_area': float
-      output_folder:   str, path to write box_<key>.vtp files
-      box_scale:       float, multiplier for box size
+    Placement of one clipping cube per branch: a cube of side box_scale * r
+    (r = equivalent radius at the branch end), its z-axis along the branch
+    direction, starting at the end point.
 
     Returns:
-      (combined_polydata, list_of_individual_polydata)
+      frames: list of (matrix, half_size); matrix is the 4x4 cube-to-world
+              transform (numpy), half_size half the side length
     """
-    if not os.path.isdir(output_folder):
-        os.makedirs(output_folder, exist_ok=True)
-
-    append_all = vtk.vtkAppendPolyData()
-    pd_list = []
-
+    frames = []
     for idx, params in clipping_params.items():
         end = params['end']
         uv    = params['unit_vector']
@@ -218,22 +250,49 @@ def generate_oriented_boxes(clipping_params, output_folder, box_scale=3):
             end[2] + 0.5 * box_scale * radius * uv[2],
         ]
 
-        # build the cube
-        cube = vtk.vtkCubeSource()
-        cube.SetXLength(box_scale * radius)
-        cube.SetYLength(box_scale * radius)
-        cube.SetZLength(box_scale * radius)
-        cube.Update()
-
         # figure out rotation to align cube's z-axis with uv
         z_axis = np.array([0.0, 0.0, 1.0])
         rot_axis = np.cross(z_axis, uv)
-        angle_deg = np.degrees(np.arccos(np.dot(uv, z_axis)))
+        angle_deg = np.degrees(np.arccos(np.clip(np.dot(uv, z_axis), -1.0, 1.0)))
 
         tf = vtk.vtkTransform()
         tf.Translate(center)
         if np.linalg.norm(rot_axis) > 1e-8:
             tf.RotateWXYZ(angle_deg, rot_axis)
+        matrix = np.array([[tf.GetMatrix().GetElement(i, j) for j in range(4)] for i in range(4)])
+        frames.append((matrix, 0.5 * box_scale * radius))
+    return frames
+
+
+def generate_oriented_boxes(clipping_params, output_folder, box_scale=3):
+    """
+    Args:
+      clipping_params: dict mapping an integer key to a dict with:
+        - 'start':      np.array([x,y,z], dtype=float)
+        - 'unit_vector':np.array([ux,uy,uz], dtype=float)
+        - 'cross_sectional_area': float
+      output_folder:   str, path to write box_<key>.vtp files
+      box_scale:       float, multiplier for box size
+
+    Returns:
+      (combined_polydata, list_of_individual_polydata)
+    """
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder, exist_ok=True)
+
+    append_all = vtk.vtkAppendPolyData()
+    pd_list = []
+
+    for matrix, half_size in oriented_box_frames(clipping_params, box_scale):
+        # build the cube
+        cube = vtk.vtkCubeSource()
+        cube.SetXLength(2 * half_size)
+        cube.SetYLength(2 * half_size)
+        cube.SetZLength(2 * half_size)
+        cube.Update()
+
+        tf = vtk.vtkTransform()
+        tf.SetMatrix(matrix.ravel().tolist())
 
         tf_filter = vtk.vtkTransformPolyDataFilter()
         tf_filter.SetInputConnection(cube.GetOutputPort())
@@ -244,15 +303,10 @@ def generate_oriented_boxes(clipping_params, output_folder, box_scale=3):
         pd_list.append(pd)
         append_all.AddInputData(pd)
 
-        
-
     append_all.Update()
    
-    writer = vtk.vtkXMLPolyDataWriter()
     out_file = os.path.join(output_folder, f"box_for_clipping.vtp")
-    writer.SetFileName(out_file)
-    writer.SetInputData(append_all.GetOutput())
-    writer.Write()
+    write_vtk(out_file, append_all.GetOutput())
     return append_all.GetOutput(), pd_list
 
 def write_polydata(file_path, polydata):
@@ -263,86 +317,235 @@ def write_polydata(file_path, polydata):
         file_path (str): The path to the output file.
         polydata (vtk.vtkPolyData): The polydata to write.
     """
-    writer = vtk.vtkXMLPolyDataWriter()
-    writer.SetFileName(file_path)
-    writer.SetInputData(polydata)
-    writer.Write()
+    write_vtk(file_path, polydata)
     print(f"PolyData written to {file_path}")
 
-def bryan_clip_surface(surf1, surf2):
-    # Create an implicit function from surf2
-    implicit_function = vtk.vtkImplicitPolyDataDistance()
-    implicit_function.SetInput(surf2)
+def _cube_distance(points, matrix, half_size):
+    """Signed distance of `points` (n,3) to one oriented cube (negative inside)."""
+    local = np.abs((points - matrix[:3, 3]) @ matrix[:3, :3]) - half_size  # cube frame, per axis
+    return np.linalg.norm(np.maximum(local, 0.0), axis=1) + np.minimum(local.max(axis=1), 0.0)
+
+
+def box_signed_distance(points, frames, tree=None):
+    """
+    Signed distance of surface points to the union of oriented cubes
+    (negative inside), evaluated analytically in NumPy.
+
+    Parameters:
+      points: (n,3) surface points
+      frames: cubes from oriented_box_frames()
+      tree:   cKDTree of `points`; if given, each cube is only evaluated for
+              the points inside its circumscribed sphere and all other
+              points get +inf ("outside")
+    """
+    sdf = np.full(points.shape[0], np.inf)
+    for matrix, half_size in frames:
+        if tree is not None:
+            near = np.asarray(tree.query_ball_point(matrix[:3, 3], half_size * math.sqrt(3.0)), dtype=np.int64)
+        else:
+            near = slice(None)
+        sdf[near] = np.minimum(sdf[near], _cube_distance(points[near], matrix, half_size))
+    return sdf
+
 
-    # Create a vtkClipPolyData filter and set the input and implicit function
-    clipper = vtk.vtkClipPolyData()
-    clipper.SetInputData(surf1)
-    clipper.SetClipFunction(implicit_function)
-    clipper.InsideOutOff()  # keep the part of surf1 outside of surf2
-    clipper.Update()
+def _select_cells(offsets, conn, mask):
+    """Offsets and connectivity of the cells of (offsets, conn) where `mask` is True."""
+    sizes = np.diff(offsets)[mask]
+    new_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    corners = np.repeat(offsets[:-1][mask] - new_offsets[:-1], sizes) + np.arange(new_offsets[-1])
+    return new_offsets, conn[corners]
 
-    # Get the output polyData with the part enclosed by surf2 clipped away
-    clipped_surf1 = clipper.GetOutput()
 
-    return clipped_surf1
+def _has_negative(sdf, offsets, conn):
+    """Per cell: does any corner have a negative distance?"""
+    if conn.size == 0:
+        return np.zeros(offsets.size - 1, dtype=bool)
+    return np.minimum.reduceat(sdf[conn], offsets[:-1]) < 0
+
+
+def clip_surface_with_boxes(surface, frames):
+    """
+    Clip away the parts of `surface` inside the oriented cubes `frames`
+    (from oriented_box_frames), using their analytic signed distance as clip
+    scalars instead of a vtkImplicitPolyDataDistance against box polydata.
+
+    Only the polygons with a corner inside a cube go through vtkClipPolyData;
+    the rest of the surface is passed through untouched and stitched back to
+    the clipped part by point id, so the result stays one connected mesh.
+    Triangle strips are clipped as triangles; verts and lines with a point
+    inside a cube are removed, the others are kept. Point and cell arrays of
+    the input are carried over.
+    """
+    if not frames:
+        return surface
+    if surface.GetNumberOfStrips() > 0:
+        triangles = vtk.vtkTriangleFilter()
+        triangles.SetInputData(surface)
+        triangles.PassVertsOn()
+        triangles.PassLinesOn()
+        triangles.Update()
+        surface = triangles.GetOutput()
+
+    points = get_points(surface).astype(float, copy=False)
+    offsets, conn = get_polys(surface)
+    n_points = points.shape[0]
+    if n_points == 0:
+        return surface
+
+    # 1) distances near the cubes only (the sign is exact everywhere)
+    sdf = box_signed_distance(points, frames, tree=cKDTree(points))
+    cut = _has_negative(sdf, offsets, conn)
+    verts, lines = get_cells(surface.GetVerts()), get_cells(surface.GetLines())
+    keep_verts = ~_has_negative(sdf, *verts)
+    keep_lines = ~_has_negative(sdf, *lines)
+    if not cut.any() and keep_verts.all() and keep_lines.all():
+        return surface
+    first_poly = surface.GetNumberOfVerts() + surface.GetNumberOfLines()
+    cell_arrays = [surface.GetCellData().GetArray(i) for i in range(surface.GetCellData().GetNumberOfArrays())]
+    cell_arrays = [a for a in cell_arrays if a is not None]
+    point_arrays = [surface.GetPointData().GetArray(i) for i in range(surface.GetPointData().GetNumberOfArrays())]
+    point_arrays = [a for a in point_arrays if a is not None]
+
+    # 2) clip the cut cells; the original point id tells copied input points from new edge points
+    clipped = None
+    q, copied, new_id = np.zeros((0, 3)), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    c_offsets, c_conn = np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if cut.any():
+        cut_offsets, cut_conn = _select_cells(offsets, conn, cut)
+        # exact distances on every corner of a cell to clip
+        corner_ids = np.unique(cut_conn)
+        sdf[corner_ids] = box_signed_distance(points[corner_ids], frames)
+
+        cut_pd = vtk.vtkPolyData()
+        cut_pd.SetPoints(surface.GetPoints())
+        cut_pd.GetPointData().ShallowCopy(surface.GetPointData())
+        cut_pd.SetPolys(make_polys(cut_offsets, cut_conn))
+        cut_cells = first_poly + np.flatnonzero(cut)
+        for array in cell_arrays:
+            cut_pd.GetCellData().AddArray(numpy_to_vtk_array(vtk_to_numpy(array)[cut_cells], array.GetName()))
+        cut_pd.GetPointData().AddArray(numpy_to_vtk_array(np.arange(n_points, dtype=float), '_ClipOrigId'))
+        # clip on the distance without replacing the surface's own active scalars
+        cut_pd.GetPointData().AddArray(numpy_to_vtk_array(sdf, '_ClipBoxDistance'))
+        cut_pd.GetPointData().SetActiveScalars('_ClipBoxDistance')
+
+        clipper = vtk.vtkClipPolyData()
+        clipper.SetInputData(cut_pd)
+        clipper.SetValue(0.0)
+        clipper.InsideOutOff()  # keep the part of the surface outside of the boxes
+        clipper.Update()
+        clipped = clipper.GetOutput()
+
+        # 3) stitch: input points keep their id, new edge points are appended
+        q = get_points(clipped).astype(float, copy=False).reshape(-1, 3)
+        orig = get_point_array(clipped, '_ClipOrigId')
+        orig = np.clip(np.rint(orig).astype(np.int64), 0, n_points - 1) if orig is not None else np.zeros(0, np.int64)
+        copied = np.all(q == points[orig], axis=1)
+        new_id = np.where(copied, orig, n_points + np.cumsum(~copied) - 1)
+        c_offsets, c_conn = get_polys(clipped)
+
+    keep_offsets, keep_conn = _select_cells(offsets, conn, ~cut)
+    poly_offsets = np.concatenate([keep_offsets, keep_offsets[-1] + c_offsets[1:]])
+    poly_conn = np.concatenate([keep_conn, new_id[c_conn]])
+    vert_offsets, vert_conn = _select_cells(*verts, keep_verts)
+    line_offsets, line_conn = _select_cells(*lines, keep_lines)
+
+    # drop points no cell uses any more (inside the cubes)
+    n_total = n_points + int((~copied).sum())
+    is_used = np.zeros(n_total, dtype=bool)
+    for cell_conn in (vert_conn, line_conn, poly_conn):
+        is_used[cell_conn] = True
+    used = np.flatnonzero(is_used)
+    local = np.cumsum(is_used) - 1
+    merged_points = np.vstack([points, q[~copied]])[used]
+
+    result = vtk.vtkPolyData()
+    result_points = vtk.vtkPoints()
+    result_points.SetData(numpy_to_vtk_array(merged_points))
+    result.SetPoints(result_points)
+    result.SetVerts(make_polys(vert_offsets, local[vert_conn]))
+    result.SetLines(make_polys(line_offsets, local[line_conn]))
+    result.SetPolys(make_polys(poly_offsets, local[poly_conn]))
+
+    for array in point_arrays:
+        values = vtk_to_numpy(array)
+        if clipped is not None:
+            clipped_values = get_point_array(clipped, array.GetName())
+            if clipped_values is None:
+                continue  # not interpolated by the clipper (e.g. a string array)
+            values = np.concatenate([values, clipped_values[~copied]])
+        result.GetPointData().AddArray(numpy_to_vtk_array(values[used], array.GetName()))
+    n_verts = surface.GetNumberOfVerts()
+    kept_cells = np.concatenate([np.flatnonzero(keep_verts), n_verts + np.flatnonzero(keep_lines),
+                                 first_poly + np.flatnonzero(~cut)])
+    for array in cell_arrays:
+        values = vtk_to_numpy(array)[kept_cells]
+        if clipped is not None:
+            clipped_values = get_cell_array(clipped, array.GetName())
+            if clipped_values is None:
+                continue
+            values = np.concatenate([values, clipped_values])
+        result.GetCellData().AddArray(numpy_to_vtk_array(values, array.GetName()))
+    active = surface.GetPointData().GetScalars()
+    if active is not None and active.GetName() and result.GetPointData().GetArray(active.GetName()) is not None:
+        result.GetPointData().SetActiveScalars(active.GetName())
+    return result
+
+def auto_clip_case(surface_path, centerline_path, output_folder, box_scale=10.0):
+    """
+    Open the outlets of one SeqSeg surface using its centerline: order and
+    orient every branch, place a clipping box at each branch end, clip the
+    surface and keep its largest connected part.
+
+    Writes postprocessed_seqseg.vtp and box_for_clipping.vtp to output_folder.
+
+    Returns:
+      info: dict with the output path, number of branches and timing
+    """
+    start = time.time()
+    os.makedirs(output_folder, exist_ok=True)
+
+    # 1) Read the centerline and surface
+    clpd = pv.read(centerline_path)
+    surf_pd = pv.read(surface_path)
+    clpts = np.asarray(clpd.points)                                 # (N,3) array
+    cl_ids = np.asarray(clpd['CenterlineId'])                       # (N,) array of ints
+    cl_radii = np.asarray(clpd['MaximumInscribedSphereRadius'])     # (N,) array
+
+    # 2) Build dict: key = branch ID, value = indices of its points
+    cl_dict = group_branches(cl_ids)
+    branch_points = {cid: clpts[ids] for cid, ids in cl_dict.items()}
+
+    mst_trees = compute_mst_per_branch(branch_points)
+    ordered_idx = get_ordered_centerlines(branch_points, mst_trees)
+
+    # carry the original point indices through the ordering
+    ordered_centerlines = {cid: cl_dict[cid][order] for cid, order in ordered_idx.items()}
+    final_cl = orient_centerlines(ordered_centerlines, points=clpts)
+
+    clipping_params = get_clipping_box_parameters(final_cl, clpts, cl_radii)
+    # boxes for inspection in ParaView
+    generate_oriented_boxes(clipping_params, output_folder=output_folder, box_scale=box_scale)
+
+    # 3) Clip the surface using the boxes, keep the largest piece
+    clipped = clip_surface_with_boxes(surf_pd, oriented_box_frames(clipping_params, box_scale=box_scale))
+    keep_largest = pv.wrap(clipped).extract_largest()
+    if not isinstance(keep_largest, pv.PolyData):  # older PyVista returns an UnstructuredGrid
+        keep_largest = keep_largest.extract_surface()
+    clipped_file = os.path.join(output_folder, 'postprocessed_seqseg.vtp')
+    write_vtk(clipped_file, keep_largest)
+
+    return {'output': clipped_file, 'branches': len(final_cl),
+            'cells': keep_largest.GetNumberOfCells(), 'seconds': round(time.time() - start, 1)}
+
 
 if __name__ == "__main__":
 
-    from collections import defaultdict
     import sys
     ans = clip_segseq_TF()
-    if not ans or not os.path.exists(seqseg_cl):
+    if not ans or not seqseg_cl or not os.path.exists(seqseg_cl):
         print('You chose not to clip the seqseg model, or the rough seqseg centerline file does not exist.')
         print("please manually clip your surface, and save it according to your <clipped_seqseg_results> from init file  .")
         sys.exit(0)
-    # 1) Read your centerline VTP
-    clpd = pv.read(seqseg_cl)
-    surf_pd = pv.read(segseqed_model)
-    clpts = clpd.points            # (N,3) array
-    cl_ids = clpd['CenterlineId']  # (N,) array of ints
-
-    # 2) Build dict: key = branch ID, value = list of (x,y,z)
-    cl_dict = defaultdict(list)
-    for pt, cid in zip(clpts, cl_ids):
-        cl_dict[int(cid)].append(tuple(pt))
-
-    mst_trees = compute_mst_per_branch(cl_dict)
-
-    # assume cl_dict and mst_trees already exist
-    ordered_centerlines = get_ordered_centerlines(cl_dict, mst_trees)
-
-    for cid, coords in ordered_centerlines.items():
-        print(f"Branch {cid}: {len(coords)} ordered points")
-        # coords is now the connected, end‑to‑end sequence of your (x,y,z) tuples
-    final_cl = orient_centerlines(ordered_centerlines)
-
-    clipping_params = get_clipping_box_parameters(final_cl, clpd)
-    #pdb.set_trace()
-    # generate oriented boxes
-    boxpd, boxpdlst = generate_oriented_boxes(
-        clipping_params,
-        output_folder=master_folder,
-        box_scale=10.0  # adjust as needed
-    )
-    
-    # 3) Clip the surface using the boxes
-    # Assuming you have a surface to clip, e.g., from segseqed_model
-    clipped = bryan_clip_surface(surf_pd, boxpd)
-    # 4) Save the clipped surface
-    clipped_file = os.path.join(master_folder, 'postprocessed_seqseg.vtp')
-    write_polydata(clipped_file, clipped)
-    clipped = pv.read(clipped_file)  # to visualize in PyVista
-    keep_largest = clipped.extract_largest() 
-    write_polydata(os.path.join(master_folder, 'postprocessed_seqseg.vtp'), keep_largest)
-    
-    
-
-
-    # # print each endpoint 
-    # for cid, coords in final_cl.items():
-    #     print(f"Branch {cid}: {coords[0]} to {coords[-1]}")
-
-    # now use final_cl to get each line's endpts, unit vector, and cross sectional area to clip surfaces
-
-
-    pdb.set_trace()
\ No newline at end of file
+    info = auto_clip_case(segseqed_model, seqseg_cl, master_folder, box_scale=10.0)  # adjust box_scale as needed
+    print(f"Clipped {info['branches']} branches in {info['seconds']} s")
+    print(f"PolyData written to {info['output']}")
@@ -0,0 +1,273 @@
+"""
+profiling.py - Per-stage timing, memory and artifact-size instrumentation
+
+Every stage launched by __main__.py, and the major sub-steps inside the stage
+scripts (TetGen, centerline extraction, msh.generate, the OneDSolver run,
+result extraction, ...), is wrapped in a StageTimer. Each finished step
+appends one JSON line to <master_folder>/miros_trace.jsonl with:
+
+    name, category, pid, start (epoch s), wall_s, cpu_s, peak_rss_mb,
+    outputs {path: bytes}, status, session
+
+cpu_s includes child processes that finished during the step (e.g. the
+OneDSolver). peak_rss_mb is the high-water mark of the process (or, for
+steps that launch subprocesses, of its largest child) reached during the
+step. The OS only keeps one high-water mark per process lifetime, so a step
+that stays below the peak of an earlier step records None (unavailable)
+rather than that earlier peak.
+
+Stages served by the persistent SimVascular worker (sv_worker.py) never show
+up in this process's child usage: the worker measures every request itself
+and the client credits that CPU time and peak to the StageTimers active in
+the calling thread (add_external_usage).
+
+At the end of a run __main__.py exports the session's records with
+export_chrome_trace() to miros_trace.json, which opens in chrome://tracing
+or https://ui.perfetto.dev to show where the minutes go.
+"""
+
+import os
+import glob
+import sys
+import json
+import time
+import threading
+
+TRACE_LOG = 'miros_trace.jsonl'
+TRACE_EXPORT = 'miros_trace.json'
+SESSION_ENV = 'MIROS_TRACE_SESSION'
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb(children=False):
+    """Peak resident set size in MB of this process (or its largest child)."""
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    if children:
+        return None
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0)
+    except (ImportError, AttributeError):
+        return None
+
+
+def _cpu_seconds():
+    """CPU time of this process plus its waited-for children."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def usage_snapshot():
+    """CPU seconds and peak RSS values of this process, for usage_since()."""
+    return {'cpu_s': _cpu_seconds(), 'self': _peak_rss_mb(), 'children': _peak_rss_mb(children=True)}
+
+
+def usage_since(before, children=None):
+    """
+    CPU time and peak RSS of the work done since `before` (a usage_snapshot()).
+
+    Parameters:
+    - before:   Snapshot taken when the work started.
+    - children: True: peak of child processes, False: of this process,
+                None: the larger of both.
+
+    Returns:
+    - usage: dict with 'cpu_s' and 'peak_rss_mb'. The peak is None when the
+             high-water mark did not grow, i.e. the work stayed below the peak
+             of something that ran earlier in the same process.
+    """
+    now = usage_snapshot()
+    keys = ('self', 'children') if children is None else ('children' if children else 'self',)
+    peaks = [now[k] for k in keys if now[k] is not None and (before[k] is None or now[k] > before[k])]
+    return {'cpu_s': now['cpu_s'] - before['cpu_s'], 'peak_rss_mb': max(peaks) if peaks else None}
+
+
+# StageTimers running in each thread, innermost last
+_active = threading.local()
+
+
+def add_external_usage(usage):
+    """
+    Credit CPU time and peak RSS measured in another process (a usage_since()
+    dict, e.g. from the persistent SimVascular worker) to every StageTimer
+    active in the calling thread.
+    """
+    for timer in getattr(_active, 'timers', ()):
+        timer.external.append(usage)
+
+
+def _artifact_size(path):
+    """Size in bytes of a file, of all files under a directory, or of all matches of a glob pattern."""
+    if glob.has_magic(path):
+        sizes = [_artifact_size(p) for p in glob.glob(path)]
+        return sum(sizes) if sizes else None
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    if os.path.isdir(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for f in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, f))
+                except OSError:
+                    pass
+        return total
+    return None
+
+
+class StageTimer:
+    """
+    Record wall time, CPU time, peak RSS and output sizes of one step.
+
+    Use as a context manager:
+
+        with StageTimer('tetgen', master_folder, outputs=[volume_mesh_path]):
+            tetgen_mesher.generate_mesh(mesh_options)
+
+    or, around long module-level blocks, with explicit start()/stop().
+
+    Parameters:
+    - name:     Step name shown in the trace.
+    - folder:   Case master folder holding miros_trace.jsonl.
+    - outputs:  Files or directories whose sizes are recorded when the step ends.
+    - category: 'stage' for __main__ stages, 'step' for sub-steps inside a script.
+    - children: Report the peak RSS of child processes instead of this process
+                (for steps that mostly wait on a subprocess).
+
+    A peak below an earlier step's peak in the same process is recorded as
+    None (shown as '-'), since it cannot be measured.
+    """
+
+    def __init__(self, name, folder, outputs=(), category='step', children=False):
+        self.name = name
+        self.folder = folder
+        self.outputs = list(outputs)
+        self.category = category
+        self.children = children
+        self.external = []  # usage measured by other processes (add_external_usage)
+        self.record = None
+
+    def start(self):
+        self._start = time.time()
+        self._t0 = time.perf_counter()
+        self._usage0 = usage_snapshot()
+        if not hasattr(_active, 'timers'):
+            _active.timers = []
+        _active.timers.append(self)
+        return self
+
+    def stop(self, status='ok'):
+        wall = time.perf_counter() - self._t0
+        timers = getattr(_active, 'timers', [])  # stop() may run in another thread than start()
+        if self in timers:
+            timers.remove(self)
+        usage = usage_since(self._usage0, self.children)
+        peaks = [u['peak_rss_mb'] for u in [usage] + self.external if u['peak_rss_mb'] is not None]
+        self.record = {
+            'name': self.name,
+            'category': self.category,
+            'pid': os.getpid(),
+            'session': os.environ.get(SESSION_ENV),
+            'start': self._start,
+            'wall_s': round(wall, 4),
+            'cpu_s': round(usage['cpu_s'] + sum(u['cpu_s'] for u in self.external), 4),
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'outputs': {p: _artifact_size(p) for p in self.outputs},
+            'status': status,
+        }
+        write_record(self.folder, self.record)
+        return self.record
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is KeyboardInterrupt:
+            status = 'interrupted'
+        else:
+            status = 'ok' if exc_type is None or exc_type is SystemExit and not exc.code else 'failed'
+        self.stop(status)
+        return False
+
+
+def write_record(folder, record):
+    """Append one record to <folder>/miros_trace.jsonl (one write per line)."""
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, TRACE_LOG), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    except OSError as e:
+        # instrumentation must never break a run
+        print("  [WARNING] Could not write trace record: {}".format(e))
+
+
+def load_records(folder, session=None):
+    """Read trace records, optionally only those of one session."""
+    path = os.path.join(folder, TRACE_LOG)
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if session is None or rec.get('session') == session:
+                records.append(rec)
+    return records
+
+
+def export_chrome_trace(folder, session=None, out_path=None):
+    """
+    Convert trace records to the Chrome trace-event format (also read by Perfetto).
+
+    Returns:
+    - out_path: path of the written JSON file.
+    """
+    records = load_records(folder, session)
+    events = []
+    pids = set()
+    for rec in records:
+        pids.add(rec['pid'])
+        events.append({
+            'name': rec['name'],
+            'cat': rec['category'],
+            'ph': 'X',
+            'ts': rec['start'] * 1e6,
+            'dur': rec['wall_s'] * 1e6,
+            'pid': rec['pid'],
+            'tid': rec['pid'],
+            'args': {k: rec[k] for k in ('cpu_s', 'peak_rss_mb', 'outputs', 'status')},
+        })
+    for pid in pids:
+        label = 'MIROS main' if pid == os.getpid() else 'stage process {}'.format(pid)
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': pid,
+                       'args': {'name': label}})
+
+    out_path = out_path or os.path.join(folder, TRACE_EXPORT)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return out_path
+
+
+def print_summary(folder, session=None):
+    """Print the wall/CPU/memory table of the top-level stages of a session."""
+    records = [r for r in load_records(folder, session) if r['category'] == 'stage']
+    if not records:
+        return
+    print("\n  {:<28} {:>10} {:>10} {:>12}".format('stage', 'wall [s]', 'cpu [s]', 'peak [MB]'))
+    for r in records:
+        peak = '-' if r['peak_rss_mb'] is None else '{:.0f}'.format(r['peak_rss_mb'])
+        print("  {:<28} {:>10.1f} {:>10.1f} {:>12}".format(r['name'], r['wall_s'], r['cpu_s'], peak))
@@ -0,0 +1,84 @@
+"""
+remesh_cache.py - Content-addressed store of remeshed surfaces, shared across cases
+
+The per-case stage cache (stage_cache.py) skips remeshing when a master folder
+already holds an up-to-date remeshed_model.vtp. This store covers the other
+cases: a new master folder, a parameter sweep over many folders sharing one
+clipped surface, or re-running a case after its folder was cleaned. The key
+is a SHA-256 digest of the input surface bytes and the remesh parameters
+(the resolved edge sizes, so an 'auto' size that comes out the same hits too):
+
+    <remesh_cache_dir>/<key>.vtp     remeshed surface
+    <remesh_cache_dir>/<key>.json    parameters and source path, for inspection
+
+Entries are written atomically (temporary file + os.replace), so cases
+running in parallel may share the store. Delete the directory to clear it.
+"""
+
+import os
+import json
+import time
+import shutil
+
+from package.stage_cache import hash_file, hash_params
+
+REMESH_CACHE_ENV = 'MIROS_REMESH_CACHE'
+
+# bump when the remeshing recipe in sv_preprocess.py changes, to invalidate old entries
+REMESH_RECIPE = 'cap+remesh_polydata/1'
+
+
+class RemeshCache:
+    """
+    Remeshed surfaces keyed by input geometry and remesh parameters.
+
+    Parameters:
+    - folder: Store directory; None disables the cache. MIROS_REMESH_CACHE
+              overrides it (an empty value disables it).
+    """
+
+    def __init__(self, folder):
+        folder = os.environ.get(REMESH_CACHE_ENV, folder)
+        self.folder = os.path.abspath(os.path.expanduser(folder)) if folder else None
+
+    @property
+    def enabled(self):
+        return self.folder is not None
+
+    def key(self, surface_path, params, surface_digest=None):
+        """
+        Cache key of remeshing `surface_path` with `params`.
+
+        Parameters:
+        - surface_digest: SHA-256 of the surface if already known (e.g. from
+                          StageCache.file_digest), to avoid hashing it again.
+        """
+        digest = surface_digest or hash_file(surface_path)
+        return hash_params({'surface': digest, 'params': params, 'recipe': REMESH_RECIPE})
+
+    def _entry(self, key):
+        return os.path.join(self.folder, key + '.vtp')
+
+    def fetch(self, key, dest):
+        """Copy the cached surface for `key` to `dest`. Returns True on a hit."""
+        if not self.enabled or not os.path.exists(self._entry(key)):
+            return False
+        tmp = dest + '.tmp'
+        shutil.copyfile(self._entry(key), tmp)
+        os.replace(tmp, dest)
+        return True
+
+    def store(self, key, src, params=None, source=None):
+        """Add the remeshed surface `src` under `key`."""
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp = self._entry(key) + '.{}.tmp'.format(os.getpid())
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, self._entry(key))
+            with open(os.path.join(self.folder, key + '.json'), 'w', encoding='utf-8') as f:
+                json.dump({'params': params, 'source': source, 'time': time.time()}, f, indent=2)
+        except OSError as e:
+            # the cache is an optimization only
+            print("  [WARNING] Could not store remeshed surface in cache: {}".format(e))
@@ -1,8 +1,8 @@
 import os
+import sys
 from __init__ import *
-import pysvzerod
-import pdb
-import pandas as pd
+from stage_cache import StageCache
+from profiling import StageTimer
 
 # Modified by Claude: Added helper functions for formatted output
 def print_section_header(title):
@@ -20,35 +20,56 @@ def print_info(message):
     print("  → " + message)
 # --- End helper functions ---
 
-print_section_header("0D SIMULATION: Running Solver")
-print_info("Input file: " + os.path.join(master_folder, '0D_solver_input.json'))
-print_info("Running 0D solver... (this may take a moment)")
-
-solver = pysvzerod.Solver(os.path.join(master_folder, '0D_solver_input.json'))
-try:
-    solver.run()
-    data = solver.get_full_result()
-    df = pd.DataFrame(data)
-    df.to_csv(os.path.join(res_folder_0D, '0D_results.csv'))
-    # Modified by Claude: Added success message
-    print_status("0D simulation completed successfully!")
-    print_info("Results saved to: " + os.path.join(res_folder_0D, '0D_results.csv'))
-
-    # Final summary
-    print("\n" + "=" * 70)
-    print("  [COMPLETE] MIROS Workflow Finished")
-    print("=" * 70)
-    print("  All simulations completed. Results (if ran) can be found at:")
-    print("    - 1D results: " + res_folder_1D)
-    print("    - 0D results: " + res_folder_0D)
-    print("=" * 70 + "\n")
-
-except Exception as e:
-    # Modified by Claude: improved error messages
-    print("\n  [ERROR] 0D simulation failed: " + str(e))
-    print("-" * 70)
-    print("  Troubleshooting:")
-    print("    1. Ensure pysvzerod is correctly installed")
-    print("    2. Check that the input file is properly formatted")
-    print("    3. Review mesh geometry and boundary conditions")
-    print("-" * 70)
\ No newline at end of file
+def main(case):
+    """Solve the 0D model of one case (a CaseConfig)."""
+    print_section_header("0D SIMULATION: Running Solver")
+    print_info("Input file: " + os.path.join(case.master_folder, '0D_solver_input.json'))
+
+    zerod_input = os.path.join(case.master_folder, '0D_solver_input.json')
+    zerod_results = os.path.join(case.res_folder_0D, '0D_results.csv')
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+
+    try:
+        if stage_cache.is_fresh('solve_0d', [zerod_input], None, [zerod_results]):
+            stage_cache.skip_message('solve_0d')
+        else:
+            # solver and pandas are only loaded when the 0D model actually has to be solved
+            import pysvzerod
+            import pandas as pd
+            print_info("Running 0D solver... (this may take a moment)")
+            with StageTimer('zerod_solver', case.master_folder):
+                solver = pysvzerod.Solver(zerod_input)
+                solver.run()
+                data = solver.get_full_result()
+            with StageTimer('write_0d_results', case.master_folder, outputs=[zerod_results]):
+                df = pd.DataFrame(data)
+                df.to_csv(zerod_results)
+            stage_cache.record('solve_0d', [zerod_input], None, [zerod_results])
+        # Modified by Claude: Added success message
+        print_status("0D simulation completed successfully!")
+        print_info("Results saved to: " + os.path.join(case.res_folder_0D, '0D_results.csv'))
+
+        # Final summary
+        print("\n" + "=" * 70)
+        print("  [COMPLETE] MIROS Workflow Finished")
+        print("=" * 70)
+        print("  All simulations completed. Results (if ran) can be found at:")
+        print("    - 1D results: " + case.res_folder_1D)
+        print("    - 0D results: " + case.res_folder_0D)
+        print("=" * 70 + "\n")
+
+    except Exception as e:
+        # Modified by Claude: improved error messages
+        print("\n  [ERROR] 0D simulation failed: " + str(e))
+        print("-" * 70)
+        print("  Troubleshooting:")
+        print("    1. Ensure pysvzerod is correctly installed")
+        print("    2. Check that the input file is properly formatted")
+        print("    3. Review mesh geometry and boundary conditions")
+        print("-" * 70)
+        # a nonzero exit marks the stage as failed in the checkpoints (--resume runs it again)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(case_config)
@@ -0,0 +1,58 @@
+"""
+scheduler.py - Cross-process readiness signals between MIROS stages
+
+The stage scripts run as separate processes, so a stage that only needs part
+of another stage's work (the 0D model only needs the centerlines, not the 1D
+solution) cannot simply wait for that process to exit. The producing script
+calls mark_ready() as soon as the artifact exists; __main__.py blocks in
+wait_ready() and then starts the dependent work in parallel with the rest of
+the producer.
+
+Signals are small files (<master_folder>/.miros_ready_<name>) holding the run
+session id, so a marker left behind by an earlier run is never mistaken for
+the current one.
+"""
+
+import os
+import time
+
+from package.profiling import SESSION_ENV
+
+
+def _marker(folder, name):
+    return os.path.join(folder, '.miros_ready_' + name)
+
+
+def mark_ready(folder, name):
+    """Announce that artifact `name` is available for the current session."""
+    marker = _marker(folder, name)
+    with open(marker + '.tmp', 'w') as f:
+        f.write(os.environ.get(SESSION_ENV, ''))
+    os.replace(marker + '.tmp', marker)
+
+
+def is_ready(folder, name):
+    """True if `name` was marked ready during the current session."""
+    try:
+        with open(_marker(folder, name), 'r') as f:
+            return f.read() == os.environ.get(SESSION_ENV, '')
+    except OSError:
+        return False
+
+
+def wait_ready(folder, name, abort=None, poll=0.5):
+    """
+    Block until `name` is marked ready in this session.
+
+    Parameters:
+    - abort: Optional callable; waiting stops (returning False) once it returns
+             True, e.g. when the producing stage has already finished or failed.
+
+    Returns:
+    - ready: bool
+    """
+    while not is_ready(folder, name):
+        if abort is not None and abort():
+            return is_ready(folder, name)
+        time.sleep(poll)
+    return True
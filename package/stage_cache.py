@@ -0,0 +1,193 @@
+"""
+stage_cache.py - Content-hash cache for MIROS pipeline stages
+
+Every stage records the SHA-256 of its input files and parameters in
+<master_folder>/.miros_stages.json once it succeeds. On the next run a stage
+whose inputs, parameters and outputs are unchanged is skipped. Because each
+stage lists the previous stage's outputs as its inputs, a change ripples
+downstream like make: editing rcrt.dat re-runs the 1D mesh/solve and the 0D
+setup/solve, while remeshing, TetGen and centerline extraction stay cached.
+
+Stage graph (inputs -> stage -> outputs):
+
+    clipped surface           -> remesh        -> remeshed_model.vtp
+    clipped surface           -> volume_mesh   -> mesh-complete/*
+    remeshed_model.vtp        -> caps          -> caps_and_wall/*, centerlines_outlets.dat,
+                                                  rcrt.dat template, model_info.txt
+    remeshed model + caps     -> centerlines   -> extracted_centerlines.vtp
+    centerlines + rcrt/inflow -> mesh_1d       -> 1D_solver_input.in
+    1D_solver_input.in        -> solve_1d      -> 1D_results/*_flow.dat ...
+    centerlines + rcrt/inflow -> mesh_0d       -> 0D_solver_input.json
+    0D_solver_input.json      -> solve_0d      -> 0D_results/0D_results.csv
+    solver results            -> extract_1d/0d -> extracted results
+"""
+
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+
+STAGE_MANIFEST = '.miros_stages.json'
+
+
+def hash_params(params):
+    """SHA-256 of a JSON-serializable parameter dict (key order independent)."""
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, or None if the file does not exist."""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(lock, timeout=10.0):
+    """
+    Exclusive lock between processes, held by creating the file `lock`.
+
+    Parameters:
+    - lock:    Lock file path.
+    - timeout: A lock file older than this (s) was left behind by a killed
+               process and is broken; holders only keep it for a file write.
+    """
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(lock) > timeout
+                if stale:
+                    os.remove(lock)
+            except FileNotFoundError:
+                pass  # released (or broken by another waiter) meanwhile
+            else:
+                if not stale:
+                    time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            pass  # broken by a process that took us for a stale lock
+
+
+class StageCache:
+    """
+    Per-case stage manifest stored in `folder`.
+
+    Parameters:
+    - folder:  Case master folder; the manifest lives at folder/.miros_stages.json.
+    - enabled: When False every stage is reported stale and nothing is recorded.
+    """
+
+    def __init__(self, folder, enabled=True):
+        self.folder = folder
+        self.enabled = enabled
+        self.path = os.path.join(folder, STAGE_MANIFEST)
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {'stages': {}, 'files': {}}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # a corrupt manifest only costs a re-run
+            return {'stages': {}, 'files': {}}
+        data.setdefault('stages', {})
+        data.setdefault('files', {})
+        return data
+
+    def _locked(self, timeout=10.0):
+        """
+        Serialize manifest updates between stage processes running at the same
+        time (e.g. the 0D setup running alongside the 1D solve).
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        return file_lock(self.path + '.lock', timeout)
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def file_digest(self, path):
+        """
+        Hash `path`, reusing the stored digest when size and mtime are
+        unchanged so large meshes are not re-read on every check.
+        """
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        known = self._data['files'].get(path)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            return known['sha256']
+        digest = hash_file(path)
+        self._data['files'][path] = {'sha256': digest, 'size': st.st_size,
+                                     'mtime_ns': st.st_mtime_ns}
+        return digest
+
+    def fingerprint(self, inputs=(), params=None):
+        """Combined digest of the input files (by content) and parameters."""
+        files = {os.path.abspath(p): self.file_digest(p) for p in inputs}
+        return hash_params({'inputs': files, 'params': params or {}})
+
+    def is_fresh(self, stage, inputs=(), params=None, outputs=()):
+        """
+        True if `stage` last succeeded with the same inputs and parameters
+        and all of its recorded outputs still exist.
+
+        Output contents are deliberately not compared, so a hand-edited
+        output (e.g. a smoothed remeshed_model.vtp) is kept and only the
+        stages downstream of it re-run.
+        """
+        if not self.enabled:
+            return False
+        entry = self._data['stages'].get(stage)
+        if entry is None:
+            return False
+        if entry['fingerprint'] != self.fingerprint(inputs, params):
+            return False
+        recorded_outputs = list(entry.get('outputs', [])) + [os.path.abspath(p) for p in outputs]
+        return all(os.path.exists(p) for p in recorded_outputs)
+
+    def record(self, stage, inputs=(), params=None, outputs=()):
+        """Mark `stage` as successfully completed for these inputs/params."""
+        if not self.enabled:
+            return
+        entry = {
+            'fingerprint': self.fingerprint(inputs, params),
+            'outputs': [os.path.abspath(p) for p in outputs],
+            'time': time.time(),
+        }
+        # merge with what other stage processes recorded since we loaded
+        with self._locked():
+            disk = self._load()
+            disk['files'].update(self._data['files'])
+            disk['stages'][stage] = entry
+            self._data = disk
+            self._save()
+
+    def invalidate(self, stage):
+        """Forget `stage`, forcing it to re-run next time."""
+        if self._data['stages'].pop(stage, None) is not None:
+            self._save()
+
+    def skip_message(self, stage):
+        print("  → [CACHE] '{}' inputs unchanged, reusing previous outputs".format(stage))
@@ -0,0 +1,226 @@
+"""
+surface_faces.py - Per-face geometry of a capped surface, in one NumPy pass
+
+A capped SimVascular model carries a ModelFaceID cell array: one id for the
+wall and one per cap. Everything MIROS needs per cap (area, centroid, outward
+normal, equivalent radius) is a sum over the triangles of that face, so it is
+computed for all faces at once with np.bincount over the face-id array instead
+of extracting, triangulating and measuring every cap separately.
+
+split_faces() partitions the surface the same way: one argsort of the face-id
+array gives the cells of every face, so all caps and the wall are cut out in
+a single pass instead of one get_face_polydata() call per face.
+
+Only NumPy and VTK are used, so this module also works outside SimVascular.
+"""
+
+import os
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import vtk_to_numpy
+
+try:
+    from package.vtk_utils import get_points, get_polys, get_cell_array, make_polys, numpy_to_vtk_array, write_vtk
+except ImportError:  # imported next to the stage scripts (from __init__ import *)
+    from vtk_utils import get_points, get_polys, get_cell_array, make_polys, numpy_to_vtk_array, write_vtk
+
+FACE_ID_ARRAY = 'ModelFaceID'
+
+# columns of model_info.csv
+FACE_COLUMNS = ['name', 'face_id', 'role', 'area', 'equivalent_radius',
+                'centroid_x', 'centroid_y', 'centroid_z', 'normal_x', 'normal_y', 'normal_z']
+
+
+def triangle_corners(polydata):
+    """
+    Fan-triangulate the polygons of `polydata` without a vtkTriangleFilter.
+
+    Returns:
+    - triangles: (n_triangles, 3) point ids
+    - cell_of:   (n_triangles,) index of the polygon each triangle came from
+    """
+    offsets, conn = get_polys(polydata)
+    sizes = np.diff(offsets)
+    n_tri = np.maximum(sizes - 2, 0)
+    if n_tri.size and np.all(n_tri == 1):
+        # pure triangle mesh, the usual case
+        return conn.reshape(-1, 3), np.arange(sizes.size)
+    cell_of = np.repeat(np.arange(sizes.size), n_tri)
+    # k-th triangle of a cell is (v0, v(k+1), v(k+2))
+    k = np.arange(cell_of.size) - np.repeat(np.cumsum(n_tri) - n_tri, n_tri)
+    first = offsets[:-1][cell_of]
+    triangles = np.stack([conn[first], conn[first + k + 1], conn[first + k + 2]], axis=1)
+    return triangles, cell_of
+
+
+def _poly_face_ids(polydata, array_name):
+    """Face id of every polygon of `polydata` (zeros if it has no face-id array)."""
+    cell_face = get_cell_array(polydata, array_name) if array_name else None
+    if cell_face is None:
+        cell_face = np.zeros(polydata.GetNumberOfCells(), dtype=np.int64)
+    cell_face = np.asarray(cell_face).ravel().astype(np.int64)
+    # polys follow verts and lines in the cell numbering of a vtkPolyData
+    first_poly = polydata.GetNumberOfVerts() + polydata.GetNumberOfLines()
+    return cell_face[first_poly:first_poly + polydata.GetNumberOfPolys()], first_poly
+
+
+def face_properties(polydata, face_ids=None, array_name=FACE_ID_ARRAY):
+    """
+    Area, centroid, normal and equivalent radius of every face of a surface.
+
+    Parameters:
+    - polydata:   Surface with a face-id cell array (e.g. a capped SimVascular model).
+    - face_ids:   Face ids to report (default: all ids present, ascending).
+    - array_name: Name of the face-id cell array; if the surface has none (or
+                  array_name is None) it is treated as a single face with id 0.
+
+    Returns:
+    - dict of NumPy arrays, one entry per face: 'face_id', 'area', 'centroid'
+      (n, 3), 'normal' (n, 3, unit area-weighted normal) and 'equivalent_radius'
+      (radius of the circle with the same area).
+    """
+    points = get_points(polydata).astype(np.float64, copy=False)
+    cell_face, _ = _poly_face_ids(polydata, array_name)
+
+    if face_ids is None:
+        face_ids = np.unique(cell_face)
+    face_ids = np.asarray(face_ids, dtype=np.int64)
+
+    if polydata.GetNumberOfPolys() == 0 or face_ids.size == 0:
+        empty = np.zeros((face_ids.size, 3))
+        return {'face_id': face_ids, 'area': np.zeros(face_ids.size), 'centroid': empty,
+                'normal': empty.copy(), 'equivalent_radius': np.zeros(face_ids.size)}
+
+    triangles, cell_of = triangle_corners(polydata)
+    p0, p1, p2 = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    area_vectors = 0.5 * np.cross(p1 - p0, p2 - p0)
+    areas = np.sqrt(np.einsum('ij,ij->i', area_vectors, area_vectors))
+    centers = (p0 + p1 + p2) / 3.0
+
+    # compact face ids to 0..n-1 so bincount stays small for sparse ids
+    present_ids, slot = np.unique(cell_face[cell_of], return_inverse=True)
+    n = present_ids.size
+    area = np.bincount(slot, weights=areas, minlength=n)
+    moment = np.stack([np.bincount(slot, weights=centers[:, j] * areas, minlength=n) for j in range(3)], axis=1)
+    normal = np.stack([np.bincount(slot, weights=area_vectors[:, j], minlength=n) for j in range(3)], axis=1)
+
+    # requested faces without triangles get zero area
+    idx = np.minimum(np.searchsorted(present_ids, face_ids), max(n - 1, 0))
+    found = (present_ids[idx] == face_ids) if n else np.zeros(face_ids.size, dtype=bool)
+    area = np.where(found, area[idx], 0.0)
+    moment = np.where(found[:, None], moment[idx], 0.0)
+    normal = np.where(found[:, None], normal[idx], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroid = np.where(area[:, None] > 0, moment / area[:, None], np.nan)
+        length = np.linalg.norm(normal, axis=1)
+        normal = np.where(length[:, None] > 0, normal / length[:, None], np.nan)
+    return {'face_id': face_ids, 'area': area, 'centroid': centroid,
+            'normal': normal, 'equivalent_radius': np.sqrt(area / np.pi)}
+
+
+def split_faces(polydata, face_ids=None, array_name=FACE_ID_ARRAY):
+    """
+    Cut a surface into one vtkPolyData per face, in a single pass.
+
+    The polygons are grouped by sorting the face-id array once; each face
+    then gets its own compacted points and the point and cell arrays of the
+    input (ModelFaceID included) restricted to it.
+
+    Parameters:
+    - polydata:   Surface with a face-id cell array.
+    - face_ids:   Faces to extract (default: all ids present). Ids without
+                  cells give an empty vtkPolyData.
+    - array_name: Name of the face-id cell array.
+
+    Returns:
+    - faces: dict face id -> vtkPolyData
+    """
+    cell_face, first_poly = _poly_face_ids(polydata, array_name)
+    points = get_points(polydata)
+    offsets, conn = get_polys(polydata)
+    sizes = np.diff(offsets)
+
+    order = np.argsort(cell_face, kind='stable')
+    present_ids, starts = np.unique(cell_face[order], return_index=True)
+    groups = dict(zip(present_ids.tolist(), np.split(order, starts[1:])))
+    if face_ids is None:
+        face_ids = present_ids.tolist()
+
+    point_data, cell_data = polydata.GetPointData(), polydata.GetCellData()
+    point_arrays = [point_data.GetArray(i) for i in range(point_data.GetNumberOfArrays())]
+    cell_arrays = [cell_data.GetArray(i) for i in range(cell_data.GetNumberOfArrays())]
+    point_arrays = [(a.GetName(), vtk_to_numpy(a)) for a in point_arrays if a is not None]
+    cell_arrays = [(a.GetName(), vtk_to_numpy(a)) for a in cell_arrays if a is not None]
+
+    faces = {}
+    for face_id in face_ids:
+        cells = groups.get(int(face_id), order[:0])
+        cell_sizes = sizes[cells]
+        face_offsets = np.concatenate([[0], np.cumsum(cell_sizes)])
+        # corner positions of the selected cells in the input connectivity
+        corners = np.repeat(offsets[:-1][cells] - face_offsets[:-1], cell_sizes) + np.arange(face_offsets[-1])
+        used, local_conn = np.unique(conn[corners], return_inverse=True)
+
+        face = vtk.vtkPolyData()
+        face_points = vtk.vtkPoints()
+        face_points.SetData(numpy_to_vtk_array(points[used]))
+        face.SetPoints(face_points)
+        face.SetPolys(make_polys(face_offsets, local_conn.ravel()))
+        for name, values in point_arrays:
+            face.GetPointData().AddArray(numpy_to_vtk_array(values[used], name))
+        for name, values in cell_arrays:
+            face.GetCellData().AddArray(numpy_to_vtk_array(values[first_poly + cells], name))
+        faces[face_id] = face
+    return faces
+
+
+def write_polydata_files(surfaces, max_workers=None):
+    """
+    Write several vtkPolyData to .vtp files concurrently.
+
+    Parameters:
+    - surfaces:    dict path -> vtkPolyData
+    - max_workers: Writer threads (default: min(8, number of files)).
+    """
+    def write(item):
+        write_vtk(*item)
+
+    items = list(surfaces.items())
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, len(items))) as pool:
+        list(pool.map(write, items))  # re-raises the first writer error
+
+
+def face_table(properties, names, roles=None):
+    """
+    Rows (dicts with FACE_COLUMNS keys) of the faces in `properties`.
+
+    Parameters:
+    - properties: Result of face_properties().
+    - names:      Name of each face, in the same order (e.g. 'cap_3').
+    - roles:      Optional role of each face ('inlet', 'outlet', 'wall').
+    """
+    roles = roles or [''] * len(names)
+    rows = []
+    for i, (name, role) in enumerate(zip(names, roles)):
+        c, n = properties['centroid'][i], properties['normal'][i]
+        rows.append({'name': name, 'face_id': int(properties['face_id'][i]), 'role': role,
+                     'area': float(properties['area'][i]),
+                     'equivalent_radius': float(properties['equivalent_radius'][i]),
+                     'centroid_x': float(c[0]), 'centroid_y': float(c[1]), 'centroid_z': float(c[2]),
+                     'normal_x': float(n[0]), 'normal_y': float(n[1]), 'normal_z': float(n[2])})
+    return rows
+
+
+def write_face_table(path, rows):
+    """Write face_table() rows as CSV in a single write."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FACE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
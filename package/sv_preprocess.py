@@ -3,18 +3,9 @@ from sv_rom_simulation import *
 from sv_auto_lv_modeling.modeling.src import meshing as svmeshtool
 # from inflow_editor import * # we are running this in a subprocess
 import numpy as np
-import pdb
 import vtk
-from vtk.util import numpy_support
-from vtk.util.numpy_support import vtk_to_numpy as v2n
-from vtk.util.numpy_support import numpy_to_vtk as n2v
-import os 
-import shutil
-import time
+import os
 import sys
-import csv
-
-import warnings
 import subprocess
 
 # ========================================================================
@@ -23,6 +14,13 @@ import subprocess
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
 from package import *
 from package.helper_func import *
+from package.manifest import get_value
+from package.stage_cache import StageCache
+from package.remesh_cache import RemeshCache
+from package.profiling import StageTimer
+from package.vtk_utils import write_vtk
+from package.volume_mesh import (volume_mesh_paths, default_sv_launch, start_build as start_volume_mesh,
+                                 current_state as current_volume_mesh_state)
 # ========================================================================
 # ============================ preprocess  ================================
 # Modified by Claude: Improved user prompts for better readability
@@ -50,181 +48,156 @@ def print_info(message):
 
 ### here! model(clipped_seqseg_results) needs to have boundary clipped open
 
-print_section_header("PRE-PROCESSING: Model Setup")
-
-# create master folder if not exists
-if not os.path.exists(master_folder):
-    os.makedirs(master_folder)
-print_status("Results folder: " + master_folder)
-
-
-# read the model using sv built-in function
-segseqed_vtp = read_surface(clipped_seqseg_results,'vtp',None)
-
-# load the model into a sv modeler object
-modeler = modeling.PolyData(segseqed_vtp)
-
-# compute faces (only 1 being the wall)
-modeler.compute_boundary_faces(90.0)
-
-# fill holes with ids
-filled = vmtk.cap(segseqed_vtp)
-modeler = modeling.PolyData(filled)
-
-# ========================================================================
-# Compute edge size (auto or user-specified)
-# ========================================================================
-if edge_size == 'auto':
-    print_info("Computing adaptive edge size based on model geometry...")
-    computed_edge_size = compute_adaptive_edge_size(modeler.get_polydata())
-    edge_min_use = computed_edge_size
-    edge_max_use = computed_edge_size
-    print_status("Adaptive edge size: " + str(round(computed_edge_size, 4)))
-else:
-    edge_min_use = edge_min
-    edge_max_use = edge_max
-    print_info("Using user-specified edge size: " + str(edge_size))
-
-# remesh the model, ensure boundary mesh quality
-model_vtp = svmeshtool.remesh_polydata(modeler.get_polydata(), edge_min_use, edge_max_use)
-modeler = modeling.PolyData(model_vtp)
-write_polydata(os.path.join(master_folder, 'remeshed_model.vtp'), modeler.get_polydata())
-print_status("Remeshed model saved: " + os.path.join(master_folder, 'remeshed_model.vtp'))
-
-# ========================================================================
-# === Generate Volume Mesh (Added by Claude for 3D result visualization) ===
-# ========================================================================
-print_info("Generating volume mesh for 3D visualization...")
-print_info("This may take a few minutes...")
-
-try:
-    # Create mesh-complete directory
-    mesh_complete_dir = os.path.join(master_folder, 'mesh-complete')
-    if not os.path.exists(mesh_complete_dir):
-        os.makedirs(mesh_complete_dir)
-
-    # Use original clipped model (before remeshing) - this produces cleaner surfaces
-    # The remeshed model can have non-manifold edges that prevent volume meshing
-    surface_for_vol = read_surface(clipped_seqseg_results, 'vtp', None)
-    modeler_for_vol = modeling.PolyData(surface_for_vol)
-
-    # Cap the surface using vmtk (properly fills holes at outlets)
-    print_info("Capping surface for volume mesh...")
-    capped_surface = vmtk.cap(modeler_for_vol.get_polydata())
-
-    # Load capped surface and compute boundary faces
-    modeler_for_vol = modeling.PolyData(capped_surface)
-    modeler_for_vol.compute_boundary_faces(angle=60.0)
-
-    # Save processed model with face IDs
-    processed_model_path = os.path.join(mesh_complete_dir, 'processed_surface.vtp')
-    write_polydata(processed_model_path, modeler_for_vol.get_polydata())
-
-    # Use TetGen to generate volume mesh
-    tetgen_mesher = meshing.TetGen()
-    tetgen_mesher.load_model(processed_model_path)
-
-    # Get face IDs and set walls (face ID 1 is typically the wall)
-    face_ids = tetgen_mesher.get_model_face_ids()
-    print_info("Model face IDs: " + str(len(face_ids)) + " faces detected")
-
-    # Set wall face IDs
-    if 1 in face_ids:
-        tetgen_mesher.set_walls([1])
-
-    # Set meshing options - use coarser edge for faster volume mesh generation
-    # Get model size for edge calculation
-    bounds = capped_surface.GetBounds()
-    max_dim = max(bounds[1]-bounds[0], bounds[3]-bounds[2], bounds[5]-bounds[4])
-    vol_edge_size = max_dim * 0.03  # 3% of model size
-
-    mesh_options = meshing.TetGenOptions(
-        global_edge_size=vol_edge_size,
-        surface_mesh_flag=False,  # Don't remesh surface, just create volume
-        volume_mesh_flag=True
-    )
-    mesh_options.optimization = 3
-    mesh_options.quality_ratio = 1.5
-
-    # Generate the mesh
-    tetgen_mesher.generate_mesh(mesh_options)
-
-    # Get the volume and surface meshes
-    volume_mesh = tetgen_mesher.get_mesh()
-    surface_mesh = tetgen_mesher.get_surface()
-
-    # Add GlobalNodeID array to volume mesh (required for result projection)
-    num_points = volume_mesh.GetNumberOfPoints()
-    global_node_ids = vtk.vtkIntArray()
-    global_node_ids.SetName("GlobalNodeID")
-    global_node_ids.SetNumberOfTuples(num_points)
-    for i in range(num_points):
-        global_node_ids.SetValue(i, i)
-    volume_mesh.GetPointData().AddArray(global_node_ids)
-    print_info("Added GlobalNodeID array for result projection")
-
-    # Add GlobalNodeID to surface mesh as well
-    num_surf_points = surface_mesh.GetNumberOfPoints()
-    surf_node_ids = vtk.vtkIntArray()
-    surf_node_ids.SetName("GlobalNodeID")
-    surf_node_ids.SetNumberOfTuples(num_surf_points)
-    for i in range(num_surf_points):
-        surf_node_ids.SetValue(i, i)
-    surface_mesh.GetPointData().AddArray(surf_node_ids)
-
-    # Write volume mesh
-    volume_mesh_path = os.path.join(mesh_complete_dir, 'mesh-complete.mesh.vtu')
-    writer = vtk.vtkXMLUnstructuredGridWriter()
-    writer.SetFileName(volume_mesh_path)
-    writer.SetInputData(volume_mesh)
-    writer.Write()
-    print_status("Volume mesh saved: " + volume_mesh_path)
-    print_info("  Points: " + str(volume_mesh.GetNumberOfPoints()) + ", Cells: " + str(volume_mesh.GetNumberOfCells()))
-
-    # Write exterior surface
-    exterior_path = os.path.join(mesh_complete_dir, 'mesh-complete.exterior.vtp')
-    write_polydata(exterior_path, surface_mesh)
-    print_status("Exterior surface saved: " + exterior_path)
-
-    print_status("Volume mesh generation complete!")
-
-except Exception as e:
-    print("  [WARNING] Volume mesh generation failed: " + str(e))
-    print("  [INFO] 3D visualization will not be available, but 1D/0D simulations can still run.")
-    print("  [INFO] You can generate the volume mesh manually in SimVascular if needed.")
-
-# ========================================================================
-
-# create a folder and write out caps
-caps_folder = os.path.join(master_folder, 'caps_and_wall')
-if not os.path.exists(caps_folder):
-    os.makedirs(caps_folder)
-write_caps_and_wall(caps_folder, modeler)
-print_status("Caps and wall written to: " + caps_folder)
-
-# --- User input section (Modified by Claude) ---
-print("\n" + "-" * 70)
-print("  >>> USER INPUT REQUIRED <<<")
-print("-" * 70)
-print("  Please define the inflow cap from the caps in: " + caps_folder)
-print("-" * 70)
-get_inlet_cap_name(caps_folder)
-
-# create rcr boundary condition template from caps
-create_rcr_bc_template(caps_folder, os.path.join(master_folder, bc_filename))
-print_status("RCR boundary condition template created: " + os.path.join(master_folder, bc_filename))
-
-# compute cap areas use vtk
-helper_txt_path = write_helper_txt(master_folder, caps_folder)
-
-# --- User action required notice (Modified by Claude) ---
-print("\n" + "-" * 70)
-print("  >>> ACTION REQUIRED <<<")
-print("-" * 70)
-print("  1. Edit the RCR boundary condition file:")
-print("     " + os.path.join(master_folder, bc_filename))
-print("  2. Reference model_info.txt for cap areas to help set RCR values")
-print("-" * 70)
-print("  Pre-processing complete. Continuing to next step...")
-print("-" * 70 + "\n")
-
+def preprocess(case):
+    """Remesh the clipped surface of one case (a CaseConfig), write its caps and the RCR template."""
+    print_section_header("PRE-PROCESSING: Model Setup")
+
+    # create master folder if not exists
+    if not os.path.exists(case.master_folder):
+        os.makedirs(case.master_folder)
+    print_status("Results folder: " + case.master_folder)
+
+    stage_cache = StageCache(case.master_folder, enabled=use_stage_cache)
+    remeshed_model_path = os.path.join(case.master_folder, 'remeshed_model.vtp')
+    # edge_min/edge_max keys keep remesh cache entries of earlier runs valid
+    remesh_params = {'edge_size': case.edge_size, 'edge_min': case.edge_size, 'edge_max': case.edge_size}
+    remesh_inputs = [case.clipped_surface]
+
+    # a SeqSeg centerline with radii lets the automatic edge size resolve the smallest vessels
+    # (only this case's centerline: CaseConfig drops the default one when the surface is changed)
+    radius_centerline = case.centerline if case.edge_size == 'auto' and case.centerline and \
+        os.path.exists(case.centerline) else None
+    if radius_centerline:
+        remesh_inputs.append(radius_centerline)
+
+    if stage_cache.is_fresh('remesh', remesh_inputs, remesh_params, [remeshed_model_path]):
+        stage_cache.skip_message('remesh')
+        modeler = modeling.PolyData(read_surface_cached(remeshed_model_path))
+    else:
+        # read the model using sv built-in function
+        segseqed_vtp = read_surface_cached(case.clipped_surface)
+
+        # load the model into a sv modeler object
+        modeler = modeling.PolyData(segseqed_vtp)
+
+        # compute faces (only 1 being the wall)
+        modeler.compute_boundary_faces(90.0)
+
+        # fill holes with ids
+        filled = vmtk.cap(segseqed_vtp)
+        modeler = modeling.PolyData(filled)
+
+        # ========================================================================
+        # Compute edge size (auto or user-specified)
+        # ========================================================================
+        if case.edge_size == 'auto':
+            print_info("Computing adaptive edge size based on model geometry...")
+            with StageTimer('edge_size', case.master_folder):
+                centerline = read_surface_cached(radius_centerline) if radius_centerline else None
+                computed_edge_size = compute_adaptive_edge_size(modeler.get_polydata(), centerline)
+            edge_min_use = computed_edge_size
+            edge_max_use = computed_edge_size
+            print_status("Adaptive edge size: " + str(round(computed_edge_size, 4)))
+        else:
+            edge_min_use = case.edge_size
+            edge_max_use = case.edge_size
+            print_info("Using user-specified edge size: " + str(case.edge_size))
+
+        # remesh the model, ensure boundary mesh quality; the same surface remeshed with the
+        # same edge sizes (e.g. by another case of a sweep) is taken from the shared cache
+        remesh_cache = RemeshCache(remesh_cache_dir)
+        remesh_key = remesh_cache.key(case.clipped_surface, {'edge_min': edge_min_use, 'edge_max': edge_max_use},
+                                      stage_cache.file_digest(case.clipped_surface))
+        if remesh_cache.fetch(remesh_key, remeshed_model_path):
+            print_info("[CACHE] Remeshed surface reused from " + remesh_cache.folder)
+            modeler = modeling.PolyData(read_surface_cached(remeshed_model_path))
+        else:
+            with StageTimer('remesh', case.master_folder, outputs=[remeshed_model_path]):
+                model_vtp = svmeshtool.remesh_polydata(modeler.get_polydata(), edge_min_use, edge_max_use)
+                modeler = modeling.PolyData(model_vtp)
+                write_vtk(remeshed_model_path, modeler.get_polydata())
+            remesh_cache.store(remesh_key, remeshed_model_path,
+                               {'edge_min': edge_min_use, 'edge_max': edge_max_use}, case.clipped_surface)
+        stage_cache.record('remesh', remesh_inputs, remesh_params, [remeshed_model_path])
+        print_status("Remeshed model saved: " + remeshed_model_path)
+
+    # ========================================================================
+    # === Generate Volume Mesh (Added by Claude for 3D result visualization) ===
+    # ========================================================================
+    # The volume mesh is only needed for 3D projection in extract_1d_res.py, which
+    # builds it on demand. With prebuild_volume_mesh, TetGen starts now in its own
+    # SimVascular process while caps, centerlines and the 1D solve go ahead.
+    mesh_complete_dir, volume_mesh_path, exterior_path = volume_mesh_paths(case.master_folder)
+    volume_mesh_state = current_volume_mesh_state(case, use_stage_cache)
+
+    if volume_mesh_state == 'done':
+        stage_cache.skip_message('volume_mesh')
+    elif volume_mesh_state == 'building':
+        print_info("Volume mesh is already being generated in the background")
+    elif not prebuild_volume_mesh:
+        print_info("Volume mesh will be built on demand if a 3D projection is requested")
+    else:
+        try:
+            start_volume_mesh(case, *default_sv_launch())
+            print_info("Generating volume mesh for 3D visualization in the background...")
+            print_info("Log: " + os.path.join(mesh_complete_dir, 'volume_mesh.log'))
+        except Exception as e:
+            print("  [WARNING] Could not start volume mesh generation: " + str(e))
+            print("  [INFO] 3D visualization will not be available, but 1D/0D simulations can still run.")
+            print("  [INFO] You can generate the volume mesh manually in SimVascular if needed.")
+
+    # ========================================================================
+
+    # create a folder and write out caps
+    caps_folder = case.caps_folder
+    caps_outputs = [os.path.join(caps_folder, 'wall.vtp'),
+                    os.path.join(caps_folder, 'inlet.vtp'),
+                    os.path.join(case.master_folder, 'centerlines_outlets.dat'),
+                    os.path.join(case.master_folder, case.bc_filename),
+                    os.path.join(case.master_folder, 'model_info.txt'),
+                    os.path.join(case.master_folder, 'model_info.csv')]
+    caps_params = {'inlet_cap': get_value('inlet_cap')}
+
+    if stage_cache.is_fresh('caps', [remeshed_model_path], caps_params, caps_outputs):
+        # keeps the inlet choice and, importantly, the user's edited rcrt.dat
+        stage_cache.skip_message('caps')
+        print_info("Keeping inlet cap and " + case.bc_filename + " (delete caps_and_wall/inlet.vtp to choose again)")
+    else:
+        if not os.path.exists(caps_folder):
+            os.makedirs(caps_folder)
+        with StageTimer('write_caps', case.master_folder, outputs=[caps_folder]):
+            write_caps_and_wall(caps_folder, modeler)
+        print_status("Caps and wall written to: " + caps_folder)
+
+        # --- User input section (Modified by Claude) ---
+        print("\n" + "-" * 70)
+        print("  >>> USER INPUT REQUIRED <<<")
+        print("-" * 70)
+        print("  Please define the inflow cap from the caps in: " + caps_folder)
+        print("-" * 70)
+        with StageTimer('inlet_prompt', case.master_folder):
+            inlet_name = get_inlet_cap_name(caps_folder)
+
+        # create rcr boundary condition template from caps
+        create_rcr_bc_template(caps_folder, os.path.join(case.master_folder, case.bc_filename))
+        print_status("RCR boundary condition template created: " + os.path.join(case.master_folder, case.bc_filename))
+
+        # cap areas, centroids and normals in one pass over the model's face ids
+        with StageTimer('cap_areas', case.master_folder):
+            helper_txt_path = write_helper_txt(case.master_folder, caps_folder, modeler.get_polydata(), inlet_name)
+        stage_cache.record('caps', [remeshed_model_path], caps_params, caps_outputs)
+
+    # --- User action required notice (Modified by Claude) ---
+    print("\n" + "-" * 70)
+    print("  >>> ACTION REQUIRED <<<")
+    print("-" * 70)
+    print("  1. Edit the RCR boundary condition file:")
+    print("     " + os.path.join(case.master_folder, case.bc_filename))
+    print("  2. Reference model_info.txt (or model_info.csv) for cap areas to help set RCR values")
+    print("-" * 70)
+    print("  Pre-processing complete. Continuing to next step...")
+    print("-" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    preprocess(case_config)
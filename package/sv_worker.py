@@ -0,0 +1,209 @@
+"""
+sv_worker.py - Persistent SimVascular Python worker
+
+Launching `simvascular --python -- script.py` for every stage pays the full
+SimVascular startup and re-imports sv, sv_rom_simulation and
+sv_auto_lv_modeling each time. This module keeps one SimVascular interpreter
+alive for a whole MIROS session instead:
+
+  - server side (runs inside SimVascular):
+        simvascular --python -- sv_worker.py <address_file>
+    imports the heavy modules once, then listens on a localhost socket and
+    runs each requested stage script with runpy, so modules (and surfaces
+    read through helper_func.read_surface_cached) stay warm between stages.
+
+  - client side (SVWorker, used by __main__.py): starts the server, sends
+    stage requests and raises CalledProcessError when a stage fails, just
+    like subprocess.run(..., check=True).
+
+The worker measures the CPU time and peak memory of every request itself
+(its own usage, which never appears in the client's child-process usage)
+and the client credits them to the calling stage's StageTimers.
+
+Stage scripts keep printing to and reading from the terminal, because the
+worker inherits the parent's stdin/stdout. Each request carries its case
+(CaseConfig.to_env), and the worker points the `package` names at it before
+running the script, so one worker can serve several cases.
+"""
+
+import os
+import sys
+import time
+import subprocess
+
+try:
+    from package.profiling import usage_snapshot, usage_since, add_external_usage
+except ImportError:  # started as a script by SimVascular
+    from profiling import usage_snapshot, usage_since, add_external_usage
+
+AUTHKEY_ENV = 'MIROS_WORKER_AUTHKEY'
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+# ========================================================================
+# ============================ client ====================================
+
+class SVWorker:
+    """
+    Client handle for a persistent SimVascular worker process.
+
+    Parameters:
+    - launch:   Command prefix that runs a script under SimVascular's Python,
+                e.g. [sv_py_bin, '--python', '--'] or, on Windows,
+                '"sv.bat" --python --' (a string, run through the shell).
+    - cwd:      Working directory for the SimVascular process.
+    - env:      Environment for the SimVascular process.
+    - timeout:  Seconds to wait for SimVascular to start listening.
+    """
+
+    def __init__(self, launch, cwd, env, timeout=300):
+        self.launch = launch
+        self.cwd = cwd
+        self.env = dict(env)
+        self.timeout = timeout
+        self.proc = None
+        self.address = None
+        self.authkey = os.urandom(16)
+
+    def start(self):
+        """Launch the worker and wait until it accepts requests."""
+        import tempfile
+        fd, address_file = tempfile.mkstemp(prefix='miros_sv_worker_', suffix='.addr')
+        os.close(fd)
+        os.remove(address_file)  # the worker recreates it once it is listening
+
+        self.env[AUTHKEY_ENV] = self.authkey.hex()
+        worker_script = os.path.abspath(__file__)
+        if isinstance(self.launch, str):
+            cmd = '{} "{}" "{}"'.format(self.launch, worker_script, address_file)
+            self.proc = subprocess.Popen(cmd, cwd=self.cwd, env=self.env, shell=True)
+        else:
+            cmd = list(self.launch) + [worker_script, address_file]
+            self.proc = subprocess.Popen(cmd, cwd=self.cwd, env=self.env)
+
+        deadline = time.time() + self.timeout
+        while not os.path.exists(address_file):
+            if self.proc.poll() is not None:
+                raise RuntimeError("SimVascular worker exited during startup (code {})"
+                                   .format(self.proc.returncode))
+            if time.time() > deadline:
+                self.proc.kill()
+                raise RuntimeError("SimVascular worker did not start within {} s".format(self.timeout))
+            time.sleep(0.1)
+
+        with open(address_file, 'r') as f:
+            host, port = f.read().split()
+        os.remove(address_file)
+        self.address = (host, int(port))
+        return self
+
+    def _request(self, message):
+        from multiprocessing.connection import Client
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(message)
+            return conn.recv()
+
+    def run(self, script, case=None):
+        """
+        Run `script` inside the worker as if it were `simvascular --python -- script`.
+        Raises subprocess.CalledProcessError if the stage fails.
+
+        Parameters:
+        - case: CaseConfig the stage works on (default: the worker's startup case).
+        """
+        message = {'cmd': 'run', 'script': os.path.abspath(script),
+                   'case': case.to_env({}) if case is not None else None}
+        try:
+            reply = self._request(message)
+        except (EOFError, OSError) as e:
+            # the SimVascular process died (e.g. a crash inside TetGen)
+            raise subprocess.CalledProcessError(-1, script, output=str(e))
+        if reply.get('usage'):
+            add_external_usage(reply['usage'])
+        if reply['returncode'] != 0:
+            raise subprocess.CalledProcessError(reply['returncode'], script, output=reply.get('error'))
+
+    def close(self):
+        """Ask the worker to exit and wait for it."""
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        try:
+            self._request({'cmd': 'shutdown'})
+            self.proc.wait(timeout=30)
+        except Exception:
+            self.proc.kill()
+
+
+# ========================================================================
+# ============================ server ====================================
+
+def use_case(case_env):
+    """Point the `package` names (case_config, master_folder, ...) at the case in `case_env`."""
+    import package
+    from package.config import CASE_ENV, CaseConfig
+    os.environ.pop(CASE_ENV, None)  # the MIROS_* values describe the case completely
+    os.environ.update(case_env)
+    package.case_config = CaseConfig.from_env(package.default_case_config)
+    vars(package).update(package.case_config.as_globals())
+
+
+def serve(address_file):
+    """Import SimVascular modules once, then run stage scripts on request."""
+    import runpy
+    import traceback
+    from multiprocessing.connection import Listener
+
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+    # warm imports: this is the startup cost paid once per session
+    import sv
+    import sv_rom_simulation
+    from sv_auto_lv_modeling.modeling.src import meshing
+    import package.helper_func
+
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+    listener = Listener(('127.0.0.1', 0), authkey=authkey)
+    host, port = listener.address
+
+    # publish the address atomically so the client never reads a partial file
+    with open(address_file + '.tmp', 'w') as f:
+        f.write('{} {}'.format(host, port))
+    os.replace(address_file + '.tmp', address_file)
+
+    while True:
+        with listener.accept() as conn:
+            message = conn.recv()
+            if message['cmd'] == 'shutdown':
+                conn.send({'returncode': 0})
+                break
+
+            # mimic `simvascular --python -- script`: script dir first on sys.path, fresh argv
+            script = message['script']
+            sys.argv = [script]
+            sys.path.insert(0, os.path.dirname(script))
+            returncode, error = 0, None
+            before = usage_snapshot()
+            try:
+                if message.get('case'):
+                    use_case(message['case'])
+                runpy.run_path(script, run_name='__main__')
+            except SystemExit as e:
+                if isinstance(e.code, int):
+                    returncode = e.code
+                elif e.code is not None:
+                    returncode, error = 1, str(e.code)
+            except Exception as e:
+                traceback.print_exc()
+                returncode, error = 1, repr(e)
+            finally:
+                sys.path.remove(os.path.dirname(script))
+            sys.stdout.flush()
+            conn.send({'returncode': returncode, 'error': error, 'usage': usage_since(before)})
+
+    listener.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1])
@@ -0,0 +1,385 @@
+"""
+volume_mesh.py - TetGen volume mesh for 3D result projection, built on demand
+
+The volume mesh (mesh-complete/mesh-complete.mesh.vtu + .exterior.vtp) is
+only needed by extract_1d_res.py to project 1D results onto 3D, and most runs
+never open it. It is therefore a deferred artifact: request_volume_mesh()
+builds it the first time a 3D projection is requested and the stage cache
+keeps it until the clipped surface changes. With prebuild_volume_mesh = True
+(package/__init__.py) sv_preprocess.py starts the build right away instead.
+
+TetGen runs in its own SimVascular process:
+
+    simvascular --python -- volume_mesh.py      (case from the MIROS_* environment)
+
+start_build() launches that process and returns immediately. Progress is kept
+in mesh-complete/volume_mesh.status ({"state": "building" | "done" | "failed",
+"pid": ..., "build": ..., "error": ...}) and the builder's output in
+mesh-complete/volume_mesh.log. The status is written before the launch and
+only ever moved forward under a lock, so a fast builder's 'done' cannot be
+overwritten by its launcher. wait_for_volume_mesh() blocks until the build
+has finished, its process is gone, or the timeout runs out.
+
+This module is imported by the local-Python extraction stage too, so the
+SimVascular modules are only imported inside build_volume_mesh().
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+try:
+    from package.stage_cache import file_lock
+except ImportError:  # run as a script by SimVascular (volume_mesh.py)
+    from stage_cache import file_lock
+
+MESH_DIR = 'mesh-complete'
+STATUS_FILE = 'volume_mesh.status'
+LOG_FILE = 'volume_mesh.log'
+BUILD_ENV = 'MIROS_VOLUME_MESH_BUILD'
+VOLUME_MESH_TIMEOUT = 3600  # s, default wait of request_volume_mesh()
+VOLUME_MESH_PARAMS = {'cap_angle': 60.0, 'edge_fraction': 0.03, 'optimization': 3, 'quality_ratio': 1.5}
+
+
+def volume_mesh_paths(master_folder):
+    """
+    Returns:
+    - mesh_dir, volume_mesh_path (.mesh.vtu), exterior_path (.exterior.vtp)
+    """
+    mesh_dir = os.path.join(master_folder, MESH_DIR)
+    return (mesh_dir,
+            os.path.join(mesh_dir, 'mesh-complete.mesh.vtu'),
+            os.path.join(mesh_dir, 'mesh-complete.exterior.vtp'))
+
+
+# ========================================================================
+# ============================ status =====================================
+
+def _load_status(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_status(master_folder, state, error=None, pid=None, build=None, replace_pid=None):
+    """
+    Atomically record the build state (and the pid of the building process).
+
+    Parameters:
+    - build:       Id of the build (start_build); kept from the current status if None.
+    - replace_pid: Compare-and-set: only write if the current status is
+                   'building' by this pid (the launcher handing over to its child).
+
+    Returns:
+    - written: False if the compare-and-set did not match.
+    """
+    mesh_dir = volume_mesh_paths(master_folder)[0]
+    os.makedirs(mesh_dir, exist_ok=True)
+    path = os.path.join(mesh_dir, STATUS_FILE)
+    with file_lock(path + '.lock'):
+        current = _load_status(path)
+        if replace_pid is not None and (current is None or current['state'] != 'building'
+                                        or current.get('pid') != replace_pid):
+            return False
+        if build is None and current is not None:
+            build = current.get('build')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'state': state, 'pid': pid or os.getpid(), 'build': build,
+                       'time': time.time(), 'error': error}, f)
+        os.replace(path + '.tmp', path)
+    return True
+
+
+def _pid_alive(pid):
+    """Whether process `pid` is still running (exited and zombie processes are not)."""
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # access denied: exists, owned by someone else
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        # our own child: reap it if it has exited, so it does not linger as a zombie
+        reaped, _ = os.waitpid(pid, os.WNOHANG)
+        return reaped == 0
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    try:
+        # someone else's child that exited but was not reaped yet
+        with open('/proc/{}/stat'.format(pid), 'r') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def read_status(master_folder):
+    """
+    State of the volume mesh of a case: 'done', 'building', 'failed' or
+    'missing'. A 'building' status whose process is gone counts as 'failed'.
+    """
+    mesh_dir, volume_mesh_path, exterior_path = volume_mesh_paths(master_folder)
+    status = _load_status(os.path.join(mesh_dir, STATUS_FILE))
+
+    if status is not None and status['state'] == 'building':
+        return 'building' if _pid_alive(status['pid']) else 'failed'
+    if status is not None and status['state'] == 'failed':
+        return 'failed'
+    if os.path.exists(volume_mesh_path) and os.path.exists(exterior_path):
+        return 'done'
+    return 'missing'
+
+
+def current_state(case_config, use_cache=True):
+    """
+    Like read_status(), but a finished mesh built from an older clipped
+    surface (stage cache fingerprint mismatch) is reported as 'stale'.
+    """
+    state = read_status(case_config.master_folder)
+    if state == 'done' and use_cache:
+        from package.stage_cache import StageCache
+        _, volume_mesh_path, exterior_path = volume_mesh_paths(case_config.master_folder)
+        if not StageCache(case_config.master_folder).is_fresh(
+                'volume_mesh', [case_config.clipped_surface], VOLUME_MESH_PARAMS,
+                [volume_mesh_path, exterior_path]):
+            return 'stale'
+    return state
+
+
+# ========================================================================
+# ============================ launcher ===================================
+
+def default_sv_launch():
+    """
+    SimVascular launch command from package/__init__.py.
+
+    Returns:
+    - sv_launch, cwd: arguments for start_build().
+    """
+    from package import Windows, sv_bat, sv_dir, sv_py_bin
+    if Windows:
+        return '"{}" --python --'.format(sv_bat), sv_dir
+    return [sv_py_bin, "--python", "--"], None
+
+
+def start_build(case_config, sv_launch, cwd=None):
+    """
+    Start the volume mesh build in a separate SimVascular process and return
+    without waiting for it.
+
+    Parameters:
+    - case_config: CaseConfig of the case to mesh.
+    - sv_launch:   Command prefix running a script under SimVascular's Python,
+                   [sv_py_bin, '--python', '--'], or on Windows a shell string
+                   '"sv.bat" --python --'.
+    - cwd:         Working directory of the SimVascular process (sv_dir on Windows).
+
+    Returns:
+    - proc: subprocess.Popen handle of the builder.
+    """
+    mesh_dir = volume_mesh_paths(case_config.master_folder)[0]
+    os.makedirs(mesh_dir, exist_ok=True)
+
+    env = case_config.to_env()
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    prev = env.get('PYTHONPATH', '')
+    env['PYTHONPATH'] = project_root + (os.pathsep + prev if prev else '')
+
+    # 'building' is recorded before the launch (by this process, which is
+    # alive meanwhile), so the builder's own status writes always come later
+    build = os.urandom(8).hex()
+    env[BUILD_ENV] = build
+    write_status(case_config.master_folder, 'building', pid=os.getpid(), build=build)
+
+    script = os.path.abspath(__file__)
+    log = open(os.path.join(mesh_dir, LOG_FILE), 'w')
+    try:
+        if isinstance(sv_launch, str):
+            proc = subprocess.Popen('{} "{}"'.format(sv_launch, script), shell=True, cwd=cwd, env=env,
+                                    stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        else:
+            proc = subprocess.Popen(list(sv_launch) + [script], cwd=cwd or os.path.dirname(script), env=env,
+                                    stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+    except Exception as e:
+        write_status(case_config.master_folder, 'failed', repr(e))
+        raise
+    finally:
+        log.close()  # the child holds its own handle
+
+    # hand the status over to the child, unless the builder already wrote its own
+    write_status(case_config.master_folder, 'building', pid=proc.pid, replace_pid=os.getpid())
+    return proc
+
+
+def request_volume_mesh(case_config, use_cache=True, timeout=VOLUME_MESH_TIMEOUT):
+    """
+    Make sure an up-to-date volume mesh exists: reuse it, wait for a build in
+    progress, or build it now. Gives up after `timeout` seconds (None: no limit).
+
+    Returns:
+    - available: True if the volume and exterior meshes can be used.
+    """
+    state = current_state(case_config, use_cache)
+    if state == 'done':
+        return True
+    proc = None
+    if state != 'building':
+        print("  → Building the volume mesh for 3D projection (TetGen, may take a few minutes)...")
+        print("  → Log: " + os.path.join(volume_mesh_paths(case_config.master_folder)[0], LOG_FILE))
+        sv_launch, cwd = default_sv_launch()
+        proc = start_build(case_config, sv_launch, cwd)
+    return wait_for_volume_mesh(case_config.master_folder, timeout, proc=proc)
+
+
+def wait_for_volume_mesh(master_folder, timeout=None, poll=2.0, proc=None):
+    """
+    Block while a background build of the volume mesh is running.
+
+    Parameters:
+    - timeout: Seconds to wait at most (None: until the build ends).
+    - proc:    Popen handle of the builder, if this process launched it. It is
+               reaped, and a builder that exits without a final status is
+               recorded as failed.
+
+    Returns:
+    - available: True if the volume and exterior meshes exist afterwards.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    announced = False
+    while True:
+        # poll our own builder first, so Popen (not read_status) reaps it
+        if proc is not None and proc.poll() is not None:
+            # exited without writing 'done' or 'failed' (e.g. SimVascular crashed)
+            write_status(master_folder, 'failed', 'builder exited with code {}'.format(proc.returncode),
+                         pid=proc.pid, replace_pid=proc.pid)
+        if read_status(master_folder) != 'building':
+            break
+        if not announced:
+            print("  → Waiting for the volume mesh (TetGen)...")
+            announced = True
+        if deadline is not None and time.time() > deadline:
+            print("  [WARNING] Volume mesh still building after {} s, continuing without it".format(timeout))
+            return False
+        time.sleep(poll)
+    return read_status(master_folder) == 'done'
+
+
+# ========================================================================
+# ============================ builder ====================================
+
+def build_volume_mesh(clipped_surface, master_folder):
+    """
+    Cap the clipped surface and mesh it with TetGen; runs under SimVascular.
+    Writes mesh-complete.mesh.vtu and mesh-complete.exterior.vtp, both with a
+    GlobalNodeID point array.
+    """
+    import sv
+    from package.helper_func import read_surface_cached
+    from package.vtk_utils import add_global_node_ids, write_vtk
+    from package.profiling import StageTimer
+
+    mesh_dir, volume_mesh_path, exterior_path = volume_mesh_paths(master_folder)
+    os.makedirs(mesh_dir, exist_ok=True)
+
+    # Use original clipped model (before remeshing) - this produces cleaner surfaces
+    # The remeshed model can have non-manifold edges that prevent volume meshing
+    surface_for_vol = read_surface_cached(clipped_surface)
+    modeler_for_vol = sv.modeling.PolyData(surface_for_vol)
+
+    # Cap the surface using vmtk (properly fills holes at outlets)
+    print("  → Capping surface for volume mesh...")
+    capped_surface = sv.vmtk.cap(modeler_for_vol.get_polydata())
+
+    # Load capped surface and compute boundary faces
+    modeler_for_vol = sv.modeling.PolyData(capped_surface)
+    modeler_for_vol.compute_boundary_faces(angle=VOLUME_MESH_PARAMS['cap_angle'])
+
+    # Save processed model with face IDs
+    processed_model_path = os.path.join(mesh_dir, 'processed_surface.vtp')
+    write_vtk(processed_model_path, modeler_for_vol.get_polydata())
+
+    # Use TetGen to generate volume mesh
+    tetgen_mesher = sv.meshing.TetGen()
+    tetgen_mesher.load_model(processed_model_path)
+
+    # Get face IDs and set walls (face ID 1 is typically the wall)
+    face_ids = tetgen_mesher.get_model_face_ids()
+    print("  → Model face IDs: " + str(len(face_ids)) + " faces detected")
+    if 1 in face_ids:
+        tetgen_mesher.set_walls([1])
+
+    # Set meshing options - use coarser edge for faster volume mesh generation
+    bounds = capped_surface.GetBounds()
+    max_dim = max(bounds[1]-bounds[0], bounds[3]-bounds[2], bounds[5]-bounds[4])
+    vol_edge_size = max_dim * VOLUME_MESH_PARAMS['edge_fraction']  # 3% of model size
+
+    mesh_options = sv.meshing.TetGenOptions(
+        global_edge_size=vol_edge_size,
+        surface_mesh_flag=False,  # Don't remesh surface, just create volume
+        volume_mesh_flag=True
+    )
+    mesh_options.optimization = VOLUME_MESH_PARAMS['optimization']
+    mesh_options.quality_ratio = VOLUME_MESH_PARAMS['quality_ratio']
+
+    with StageTimer('tetgen', master_folder):
+        tetgen_mesher.generate_mesh(mesh_options)
+
+    volume_mesh = tetgen_mesher.get_mesh()
+    surface_mesh = tetgen_mesher.get_surface()
+
+    # GlobalNodeID is required for result projection
+    add_global_node_ids(volume_mesh)
+    add_global_node_ids(surface_mesh)
+
+    with StageTimer('write_volume_mesh', master_folder, outputs=[volume_mesh_path, exterior_path]):
+        write_vtk(volume_mesh_path, volume_mesh)
+        write_vtk(exterior_path, surface_mesh)
+    print("  ✓ Volume mesh saved: " + volume_mesh_path)
+    print("  → Points: " + str(volume_mesh.GetNumberOfPoints()) + ", Cells: " + str(volume_mesh.GetNumberOfCells()))
+    return volume_mesh_path, exterior_path
+
+
+def main():
+    """Entry point of the background builder process (runs under SimVascular)."""
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from package import case_config, use_stage_cache
+    from package.stage_cache import StageCache
+
+    master_folder = case_config.master_folder
+    _, volume_mesh_path, exterior_path = volume_mesh_paths(master_folder)
+    write_status(master_folder, 'building', build=os.environ.get(BUILD_ENV))
+    try:
+        build_volume_mesh(case_config.clipped_surface, master_folder)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        write_status(master_folder, 'failed', repr(e))
+        return 1
+    StageCache(master_folder, enabled=use_stage_cache).record(
+        'volume_mesh', [case_config.clipped_surface], VOLUME_MESH_PARAMS, [volume_mesh_path, exterior_path])
+    write_status(master_folder, 'done')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+vtk_utils.py - NumPy-backed VTK data arrays
+
+MIROS attaches per-point / per-cell arrays (GlobalNodeID, ModelFaceID, ...)
+to meshes with millions of points. Filling them with SetValue() in a Python
+loop costs one interpreter round trip per entry; the helpers here hand VTK
+the NumPy buffer instead, so building or reading an array is O(1) Python
+calls regardless of mesh size.
+
+Zero-copy arrays share memory with the NumPy array they were built from.
+That buffer must outlive the VTK array, so the NumPy array is stored on the
+VTK array object (`_numpy_reference`, the same attribute vtk.util.numpy_support
+uses in older VTK releases), which VTK's Python wrapper keeps for as long as
+the C++ object exists.
+Arrays read back with get_point_array()/get_cell_array() are views into VTK
+memory and are only valid while the mesh is alive - copy them if needed.
+
+write_vtk() is the one writer for every .vtp/.vtu MIROS produces, with the
+encoding set by vtk_encoding / vtk_compression_level in package/__init__.py
+(or MIROS_VTK_ENCODING, e.g. 'lz4' or 'zlib:9'):
+
+    'raw'              appended binary, uncompressed - fastest to write and read
+    'zlib' 'lz4' 'lzma' appended binary, compressed at vtk_compression_level (1-9)
+    'ascii'            human-readable, for debugging only
+
+VTK's own default (zlib, base64-encoded appended data) is about a third larger
+than 'zlib' here, which stores the appended data unencoded.
+"""
+
+import os
+import sys
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy, numpy_to_vtkIdTypeArray
+
+
+def numpy_to_vtk_array(values, name=None, dtype=None):
+    """
+    Wrap a NumPy array as a VTK data array without copying it.
+
+    Parameters:
+    - values: 1D (one component) or 2D (n_tuples x n_components) array-like.
+    - name:   Name of the VTK array.
+    - dtype:  Optional NumPy dtype to convert to first (e.g. np.int32 for the
+              vtkIntArray SimVascular expects for GlobalNodeID).
+
+    Returns:
+    - vtk_array: vtkDataArray sharing memory with `values` (or with its
+                 converted/contiguous copy, which it keeps alive).
+    """
+    values = np.ascontiguousarray(values, dtype=dtype)
+    # int32 -> vtkIntArray, int64 -> vtkIdTypeArray, float64 -> vtkDoubleArray, ...
+    vtk_array = numpy_to_vtk(values, deep=False)
+    vtk_array._numpy_reference = values  # keep the buffer alive with the VTK array
+    if name is not None:
+        vtk_array.SetName(name)
+    return vtk_array
+
+
+def attach_point_array(dataset, name, values, dtype=None):
+    """Add (or replace) a point-data array on `dataset` from NumPy values."""
+    vtk_array = numpy_to_vtk_array(values, name, dtype)
+    dataset.GetPointData().AddArray(vtk_array)
+    return vtk_array
+
+
+def attach_cell_array(dataset, name, values, dtype=None):
+    """Add (or replace) a cell-data array on `dataset` from NumPy values."""
+    vtk_array = numpy_to_vtk_array(values, name, dtype)
+    dataset.GetCellData().AddArray(vtk_array)
+    return vtk_array
+
+
+def add_global_node_ids(dataset, name='GlobalNodeID'):
+    """Number the points of `dataset` 0..n-1 in a vtkIntArray (needed for result projection)."""
+    return attach_point_array(dataset, name, np.arange(dataset.GetNumberOfPoints(), dtype=np.int32))
+
+
+def get_point_array(dataset, name):
+    """Point-data array `name` as a NumPy view, or None if the dataset has none."""
+    array = dataset.GetPointData().GetArray(name)
+    return None if array is None else vtk_to_numpy(array)
+
+
+def get_cell_array(dataset, name):
+    """Cell-data array `name` as a NumPy view, or None if the dataset has none."""
+    array = dataset.GetCellData().GetArray(name)
+    return None if array is None else vtk_to_numpy(array)
+
+
+def get_points(dataset):
+    """Point coordinates of `dataset` as an (n, 3) NumPy view."""
+    if dataset.GetPoints() is None:
+        return np.zeros((0, 3))
+    return vtk_to_numpy(dataset.GetPoints().GetData())
+
+
+def get_polys(polydata):
+    """
+    Polygon connectivity of `polydata` as flat NumPy arrays.
+
+    Returns:
+    - offsets:      (n_cells + 1,) int64; cell i uses connectivity[offsets[i]:offsets[i+1]]
+    - connectivity: (n_corners,) int64 point ids
+    """
+    return get_cells(polydata.GetPolys())
+
+
+def get_cells(cells):
+    """get_polys() for any vtkCellArray (e.g. GetVerts(), GetLines())."""
+    if hasattr(cells, 'GetOffsetsArray'):
+        # VTK >= 9 stores offsets + connectivity directly
+        return (vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64, copy=False),
+                vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64, copy=False))
+
+    # legacy layout [n, id0, ..., id(n-1), n, ...]
+    legacy = vtk_to_numpy(cells.GetData()).astype(np.int64)
+    if legacy.size and np.all(legacy[::4] == 3) and legacy.size % 4 == 0:
+        # pure triangle mesh, the usual case
+        return np.arange(0, 3 * (legacy.size // 4) + 1, 3, dtype=np.int64), legacy.reshape(-1, 4)[:, 1:].ravel()
+    sizes, starts, i = [], [], 0
+    while i < legacy.size:
+        sizes.append(legacy[i])
+        starts.append(i + 1)
+        i += legacy[i] + 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    connectivity = np.concatenate([legacy[b:b + n] for b, n in zip(starts, sizes)]) if sizes else legacy[:0]
+    return offsets, connectivity
+
+
+def make_polys(offsets, connectivity):
+    """
+    vtkCellArray from flat NumPy connectivity (the inverse of get_polys()).
+
+    Parameters:
+    - offsets:      (n_cells + 1,) cell i uses connectivity[offsets[i]:offsets[i+1]]
+    - connectivity: (n_corners,) point ids
+    """
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    connectivity = np.ascontiguousarray(connectivity, dtype=np.int64)
+    polys = vtk.vtkCellArray()
+    if hasattr(polys, 'GetOffsetsArray'):
+        polys.SetData(numpy_to_vtkIdTypeArray(offsets, deep=True), numpy_to_vtkIdTypeArray(connectivity, deep=True))
+        return polys
+
+    # legacy layout [n, id0, ..., id(n-1), n, ...]
+    sizes = np.diff(offsets)
+    legacy = np.empty(sizes.size + connectivity.size, dtype=np.int64)
+    starts = offsets[:-1] + np.arange(sizes.size)
+    legacy[starts] = sizes
+    mask = np.ones(legacy.size, dtype=bool)
+    mask[starts] = False
+    legacy[mask] = connectivity
+    polys.SetCells(sizes.size, numpy_to_vtkIdTypeArray(legacy, deep=True))
+    return polys
+
+
+# ========================================================================
+# ============================ writing ====================================
+
+VTK_ENCODING_ENV = 'MIROS_VTK_ENCODING'
+VTK_ENCODINGS = ('raw', 'zlib', 'lz4', 'lzma', 'ascii')
+DEFAULT_VTK_ENCODING = ('zlib', None)
+
+
+def parse_vtk_encoding(value):
+    """'lz4' -> ('lz4', None), 'zlib:9' -> ('zlib', 9)."""
+    encoding, _, level = str(value).strip().lower().partition(':')
+    if encoding not in VTK_ENCODINGS:
+        raise ValueError("VTK encoding must be one of {}, got '{}'".format(', '.join(VTK_ENCODINGS), value))
+    return encoding, int(level) if level else None
+
+
+def vtk_output_settings():
+    """
+    Encoding and compression level for write_vtk(): MIROS_VTK_ENCODING, else
+    vtk_encoding / vtk_compression_level of the already imported package
+    settings, else zlib at VTK's default level.
+    """
+    if os.environ.get(VTK_ENCODING_ENV):
+        return parse_vtk_encoding(os.environ[VTK_ENCODING_ENV])
+    # stage scripts import the settings as `package` or, next to them, as `__init__`
+    for name in ('package', '__init__'):
+        settings = sys.modules.get(name)
+        if settings is not None and hasattr(settings, 'vtk_encoding'):
+            encoding, level = parse_vtk_encoding(settings.vtk_encoding)
+            return encoding, getattr(settings, 'vtk_compression_level', None) if level is None else level
+    return DEFAULT_VTK_ENCODING
+
+
+def xml_writer(dataset):
+    """XML writer matching the type of `dataset` (.vtp, .vtu, ...)."""
+    if dataset.IsA('vtkPolyData'):
+        return vtk.vtkXMLPolyDataWriter()
+    if dataset.IsA('vtkUnstructuredGrid'):
+        return vtk.vtkXMLUnstructuredGridWriter()
+    return vtk.vtkXMLDataSetWriter()
+
+
+def configure_writer(writer, encoding=None, level=None):
+    """Apply an encoding ('raw', 'zlib', 'lz4', 'lzma', 'ascii') and compression level to a vtkXMLWriter."""
+    encoding, default_level = vtk_output_settings() if encoding is None else parse_vtk_encoding(encoding)
+    level = default_level if level is None else level
+
+    if encoding == 'ascii':
+        writer.SetDataModeToAscii()
+        writer.SetCompressorTypeToNone()
+        return writer
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()  # raw bytes instead of base64
+    if encoding == 'raw':
+        writer.SetCompressorTypeToNone()
+        return writer
+    compressor = {'zlib': 'SetCompressorTypeToZLib', 'lz4': 'SetCompressorTypeToLZ4',
+                  'lzma': 'SetCompressorTypeToLZMA'}[encoding]
+    if not hasattr(writer, compressor):  # LZ4/LZMA need VTK >= 8.2
+        print("  [WARNING] This VTK has no {} compressor, using zlib".format(encoding))
+        compressor = 'SetCompressorTypeToZLib'
+    getattr(writer, compressor)()
+    if level is not None and hasattr(writer, 'SetCompressionLevel'):
+        writer.SetCompressionLevel(int(level))
+    return writer
+
+
+def write_vtk(path, dataset, encoding=None, level=None):
+    """
+    Write a vtkPolyData / vtkUnstructuredGrid to an XML VTK file.
+
+    Parameters:
+    - path:     Output file (.vtp, .vtu).
+    - dataset:  Mesh to write.
+    - encoding: 'raw', 'zlib', 'lz4', 'lzma' or 'ascii' (optionally 'zlib:9');
+                default from vtk_output_settings().
+    - level:    Compression level 1 (fast) - 9 (small).
+    """
+    writer = configure_writer(xml_writer(dataset), encoding, level)
+    writer.SetFileName(path)
+    writer.SetInputData(dataset)
+    if not writer.Write():
+        raise IOError("Could not write " + path)
+    return path
+
+
+def read_vtk(path):
+    """Read an XML VTK file (.vtp, .vtu, ...) written by write_vtk() or any other XML writer."""
+    reader = vtk.vtkXMLGenericDataObjectReader()
+    reader.SetFileName(path)
+    reader.Update()
+    return reader.GetOutput()
+
+
+def reencode_vtk(path, encoding=None, level=None):
+    """Rewrite an XML VTK file written by another tool with the configured encoding (in place)."""
+    dataset = read_vtk(path)
+    tmp = path + '.tmp' + os.path.splitext(path)[1]
+    write_vtk(tmp, dataset, encoding, level)
+    os.replace(tmp, path)
+    return path
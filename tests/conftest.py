@@ -0,0 +1,10 @@
+"""
+Shared test setup: make `package` importable from the repository root.
+
+Run from the repository root with  python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
@@ -0,0 +1,37 @@
+"""Surface/centerline pairing for batch clipping (batch_clip.py)."""
+
+import pytest
+
+from package.batch_clip import case_name, find_pairs
+
+
+def touch(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (folder / name).write_text('')
+
+
+def test_case_name_strips_the_suffix():
+    assert case_name('seg/p07_surface_mesh.vtp') == 'p07'
+    assert case_name('seg/p07_surface_mesh_smooth.vtp') == 'p07'
+    assert case_name('seg/p07.vtp') == 'p07'
+
+
+def test_pairs_from_globs(tmp_path):
+    touch(tmp_path / 'seg', ['p2_surface_mesh.vtp', 'p10_surface_mesh.vtp',
+                             'p10_centerline.vtp', 'p2_centerline.vtp'])
+    pairs = find_pairs(surfaces=str(tmp_path / 'seg' / '*_surface_mesh*.vtp'),
+                       centerlines=str(tmp_path / 'seg' / '*_centerline*.vtp'), out_folder=str(tmp_path / 'out'))
+    assert {p['case']: p['centerline'] for p in pairs} == {
+        'p2': str(tmp_path / 'seg' / 'p2_centerline.vtp'),
+        'p10': str(tmp_path / 'seg' / 'p10_centerline.vtp')}
+    assert pairs[0]['output'] == str(tmp_path / 'out' / pairs[0]['case'])
+
+
+def test_unpaired_files_are_rejected(tmp_path):
+    # as many surfaces as centerlines, but p2 lacks its centerline and p3 is unrelated
+    touch(tmp_path / 'seg', ['p1_surface_mesh.vtp', 'p2_surface_mesh.vtp',
+                             'p1_centerline.vtp', 'p3_centerline.vtp'])
+    with pytest.raises(ValueError, match='no centerline for .*p2_surface_mesh.vtp; no surface for .*p3_centerline.vtp'):
+        find_pairs(surfaces=str(tmp_path / 'seg' / '*_surface_mesh*.vtp'),
+                   centerlines=str(tmp_path / 'seg' / '*_centerline*.vtp'), out_folder=str(tmp_path / 'out'))
@@ -0,0 +1,76 @@
+"""Stage checkpoints for --resume (checkpoints.py)."""
+
+import os
+
+import pytest
+
+from package.checkpoints import STAGES, Checkpoints
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('x')
+    return path
+
+
+def test_resume_skips_completed_leading_stages(tmp_path):
+    folder = str(tmp_path)
+    checkpoints = Checkpoints(folder)
+    with checkpoints.stage('preprocess', outputs=[touch(os.path.join(folder, 'remeshed_model.vtp'))]):
+        pass
+    with checkpoints.stage('inflow', outputs=[touch(os.path.join(folder, 'inflow_1d.flow'))]):
+        pass
+
+    resumed = Checkpoints(folder, resume=True)
+    assert resumed.first_incomplete() == 'setup_and_run_1d'
+    assert not resumed.pending('preprocess')
+    assert not resumed.pending('inflow')
+    assert resumed.pending('setup_and_run_1d')
+    # every stage after the first incomplete one runs again
+    assert resumed.pending('preprocess')
+
+
+def test_missing_output_is_incomplete(tmp_path):
+    folder = str(tmp_path)
+    results = os.path.join(folder, '0D_results')
+    os.makedirs(results)
+    checkpoints = Checkpoints(folder)
+    # the folder exists, but the solver wrote no results
+    with checkpoints.stage('run_0d', outputs=[os.path.join(results, '0D_results.csv')]):
+        pass
+    assert not checkpoints.is_complete('run_0d')
+    assert Checkpoints(folder)._data['stages']['run_0d']['status'] == 'incomplete'
+
+
+def test_glob_outputs_are_stored_as_files(tmp_path):
+    folder = str(tmp_path)
+    results = os.path.join(folder, '1D_results')
+    flows = [touch(os.path.join(results, 'model{}_flow.dat'.format(i))) for i in range(3)]
+    checkpoints = Checkpoints(folder)
+    with checkpoints.stage('setup_and_run_1d', outputs=[os.path.join(results, '*_flow.dat')]):
+        pass
+    assert checkpoints.is_complete('setup_and_run_1d')
+    assert checkpoints._data['stages']['setup_and_run_1d']['outputs'] == sorted(flows)
+
+    os.remove(flows[1])
+    assert not Checkpoints(folder).is_complete('setup_and_run_1d')
+
+
+def test_failed_and_exit_codes(tmp_path):
+    folder = str(tmp_path)
+    output = touch(os.path.join(folder, '0D_solver_input.json'))
+    checkpoints = Checkpoints(folder)
+    with pytest.raises(SystemExit):
+        with checkpoints.stage('setup_0d', outputs=[output]):
+            raise SystemExit(1)
+    assert not checkpoints.is_complete('setup_0d')
+    with pytest.raises(RuntimeError):
+        with checkpoints.stage('setup_0d', outputs=[output]):
+            raise RuntimeError('solver crashed')
+    assert checkpoints._data['stages']['setup_0d']['status'] == 'failed'
+    with pytest.raises(SystemExit):
+        with checkpoints.stage('setup_0d', outputs=[output]):
+            raise SystemExit(0)
+    assert checkpoints.is_complete('setup_0d')
+    assert checkpoints.first_incomplete() == STAGES[0]
@@ -0,0 +1,108 @@
+"""Analytic box clipping of SeqSeg surfaces (post_process_seqseg.clip_surface_with_boxes)."""
+
+import numpy as np
+import pytest
+
+vtk = pytest.importorskip('vtk')
+pytest.importorskip('pyvista')
+pytest.importorskip('scipy')
+
+from package.post_process_seqseg import box_signed_distance, clip_surface_with_boxes
+from package.vtk_utils import attach_cell_array, attach_point_array, get_cell_array, get_point_array, get_points
+
+
+def sphere_with_arrays():
+    """Unit-radius triangulated sphere with an active point scalar array and a cell array."""
+    source = vtk.vtkSphereSource()
+    source.SetRadius(1.0)
+    source.SetThetaResolution(40)
+    source.SetPhiResolution(40)
+    source.Update()
+    sphere = vtk.vtkPolyData()
+    sphere.DeepCopy(source.GetOutput())
+    z = get_points(sphere)[:, 2].copy()
+    attach_point_array(sphere, 'Pressure', 100.0 + z)
+    sphere.GetPointData().SetActiveScalars('Pressure')
+    attach_cell_array(sphere, 'ModelFaceID', np.full(sphere.GetNumberOfCells(), 1), np.int32)
+    return sphere
+
+
+def top_cube(half_size=0.3):
+    matrix = np.eye(4)
+    matrix[:3, 3] = [0.0, 0.0, 1.0]
+    return [(matrix, half_size)]
+
+
+def area(polydata):
+    mass = vtk.vtkMassProperties()
+    triangles = vtk.vtkTriangleFilter()
+    triangles.SetInputData(polydata)
+    triangles.Update()
+    mass.SetInputData(triangles.GetOutput())
+    return mass.GetSurfaceArea()
+
+
+def test_clip_keeps_active_point_scalars_and_cell_arrays():
+    sphere = sphere_with_arrays()
+    frames = top_cube()
+    clipped = clip_surface_with_boxes(sphere, frames)
+
+    points = get_points(clipped)
+    # new edge points come from linear interpolation of the distance: inside by at most a fraction of an edge
+    assert box_signed_distance(points, frames).min() > -0.01
+    assert area(clipped) < area(sphere)
+
+    pressure = get_point_array(clipped, 'Pressure')
+    assert pressure is not None and pressure.shape == (clipped.GetNumberOfPoints(),)
+    # linear in z on the input, so interpolated edge points stay consistent
+    np.testing.assert_allclose(pressure, 100.0 + points[:, 2], atol=1e-6)
+    assert clipped.GetPointData().GetScalars().GetName() == 'Pressure'
+
+    face_ids = get_cell_array(clipped, 'ModelFaceID')
+    assert face_ids is not None and face_ids.shape == (clipped.GetNumberOfCells(),)
+    assert np.all(face_ids == 1)
+    for name in ('_ClipOrigId', '_ClipBoxDistance'):
+        assert clipped.GetPointData().GetArray(name) is None
+
+
+def test_clip_without_cut_returns_input():
+    sphere = sphere_with_arrays()
+    far = top_cube()
+    far[0][0][:3, 3] = [10.0, 0.0, 0.0]
+    assert clip_surface_with_boxes(sphere, far) is sphere
+
+
+def test_clip_handles_verts_lines_and_strips():
+    sphere = sphere_with_arrays()
+    order = np.argsort(get_points(sphere)[:, 2])
+    top, bottom, near_bottom = int(order[-1]), int(order[0]), int(order[1])
+
+    verts = vtk.vtkCellArray()
+    for point_id in (top, bottom):
+        verts.InsertNextCell(1)
+        verts.InsertCellPoint(point_id)
+    lines = vtk.vtkCellArray()
+    lines.InsertNextCell(2)
+    lines.InsertCellPoint(bottom)
+    lines.InsertCellPoint(near_bottom)
+    sphere.SetVerts(verts)
+    sphere.SetLines(lines)
+    # verts and lines come first in the cell numbering
+    n_cells = sphere.GetNumberOfCells()
+    attach_cell_array(sphere, 'ModelFaceID', np.r_[7, 8, 9, np.ones(n_cells - 3)], np.int32)
+
+    strips = vtk.vtkStripper()
+    strips.SetInputData(sphere)
+    strips.PassCellDataAsFieldDataOff()
+    strips.Update()
+    for surface in (sphere, strips.GetOutput()):
+        clipped = clip_surface_with_boxes(surface, top_cube())
+        assert clipped.GetNumberOfPolys() > 0
+        assert clipped.GetNumberOfStrips() == 0
+        if surface is sphere:
+            # the vert at the top pole is inside the cube, the bottom vert and the line are kept
+            assert clipped.GetNumberOfVerts() == 1
+            assert clipped.GetNumberOfLines() == 1
+            face_ids = get_cell_array(clipped, 'ModelFaceID')
+            assert list(face_ids[:2]) == [8, 9]
+            assert face_ids.shape == (clipped.GetNumberOfCells(),)
@@ -0,0 +1,37 @@
+"""Cohort case lists (cohort.py)."""
+
+import pytest
+
+from package.cohort import case_settings, find_cases
+
+
+def write_csv(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_cases_from_csv(tmp_path):
+    source = write_csv(tmp_path / 'cases.csv', 'case,surface,edge_size,centerline\n'
+                                              'p1,a/p1.vtp,0.2,a/p1_cl.vtp\n'
+                                              ',b/p2.vtp,,\n')
+    cases = find_cases(source, str(tmp_path / 'out'))
+    assert [c['case'] for c in cases] == ['p1', 'p2']
+    assert cases[1]['master_folder'] == str(tmp_path / 'out' / 'p2')
+
+    config = case_settings(cases[0])
+    assert config.edge_size == 0.2
+    assert config.centerline == cases[0]['centerline']
+    assert case_settings(cases[1]).centerline is None
+
+
+def test_duplicate_case_names_are_rejected(tmp_path):
+    # the same file name in two folders gives the same case name
+    source = write_csv(tmp_path / 'cases.csv', 'surface\nsite_a/p1.vtp\nsite_b/p1.vtp\n')
+    with pytest.raises(ValueError, match='same case: p1'):
+        find_cases(source, str(tmp_path / 'out'))
+
+
+def test_shared_master_folder_is_rejected(tmp_path):
+    source = write_csv(tmp_path / 'cases.csv', 'case,surface,master_folder\np1,p1.vtp,run\np2,p2.vtp,run\n')
+    with pytest.raises(ValueError, match='same master_folder'):
+        find_cases(source, str(tmp_path / 'out'))
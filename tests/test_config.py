@@ -0,0 +1,41 @@
+"""Per-case settings (config.py)."""
+
+from package.config import CaseConfig
+
+
+def test_centerline_belongs_to_its_surface(tmp_path):
+    base = CaseConfig(master_folder=str(tmp_path / 'a'), clipped_surface='/data/a.vtp', centerline='/data/a_cl.vtp')
+
+    same = CaseConfig.from_dict({'master_folder': str(tmp_path / 'b'), 'clipped_surface': '/data/a.vtp'}, base)
+    assert same.centerline == '/data/a_cl.vtp'
+
+    other = CaseConfig.from_dict({'clipped_surface': '/data/b.vtp'}, base)
+    assert other.centerline is None
+    assert other.as_globals()['seqseg_cl'] is None
+
+    explicit = CaseConfig.from_dict({'clipped_surface': '/data/b.vtp', 'centerline': 'b_cl.vtp'}, base,
+                                    relative_to='/data')
+    assert explicit.centerline == '/data/b_cl.vtp'
+
+
+def test_env_round_trip(tmp_path):
+    default = CaseConfig(master_folder='/default', clipped_surface='/data/default.vtp',
+                         centerline='/data/default_cl.vtp')
+    case = CaseConfig(master_folder=str(tmp_path), clipped_surface='/data/b.vtp', edge_size=0.25)
+    env = case.to_env({})
+    assert env['MIROS_CENTERLINE'] == ''
+    assert CaseConfig.from_env(default, env) == case
+
+    case = CaseConfig(master_folder=str(tmp_path), clipped_surface='/data/b.vtp', centerline='/data/b_cl.vtp')
+    assert CaseConfig.from_env(default, case.to_env({})) == case
+
+
+def test_case_file(tmp_path):
+    case_file = tmp_path / 'case.json'
+    case_file.write_text('{"master_folder": "out", "clipped_surface": "p7.vtp", '
+                         '"centerline": "p7_cl.vtp", "edge_size": "auto"}')
+    default = CaseConfig(master_folder='/default', clipped_surface='/data/default.vtp')
+    case = CaseConfig.from_env(default, {'MIROS_CASE_CONFIG': str(case_file)})
+    assert case.master_folder == str(tmp_path / 'out')
+    assert case.centerline == str(tmp_path / 'p7_cl.vtp')
+    assert case.edge_size == 'auto'
@@ -0,0 +1,73 @@
+"""Automatic remeshing edge size (edge_size.py)."""
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk
+
+from package.edge_size import centerline_fits_surface, edge_size_estimate, surface_edge_lengths
+
+
+def sphere(radius=10.0, resolution=40):
+    source = vtk.vtkSphereSource()
+    source.SetRadius(radius)
+    source.SetThetaResolution(resolution)
+    source.SetPhiResolution(resolution)
+    source.Update()
+    return source.GetOutput()
+
+
+def centerline(points, radius):
+    points = np.asarray(points, dtype=np.float64)
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(points, deep=True))
+    line = vtk.vtkPolyLine()
+    line.GetPointIds().SetNumberOfIds(len(points))
+    for i in range(len(points)):
+        line.GetPointIds().SetId(i, i)
+    cells = vtk.vtkCellArray()
+    cells.InsertNextCell(line)
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(vtk_points)
+    polydata.SetLines(cells)
+    radii = numpy_to_vtk(np.full(len(points), radius), deep=True)
+    radii.SetName('MaximumInscribedSphereRadius')
+    polydata.GetPointData().AddArray(radii)
+    return polydata
+
+
+def test_edge_lengths_match_vtk():
+    surface = sphere()
+    lengths = surface_edge_lengths(surface, unique=True)
+
+    edges = vtk.vtkExtractEdges()
+    edges.SetInputData(surface)
+    edges.Update()
+    assert lengths.size == edges.GetOutput().GetNumberOfLines()
+
+
+def test_surface_only_estimate():
+    est = edge_size_estimate(sphere())
+    assert est['radius_based'] is None
+    assert not est['centerline_ignored']
+    assert 0.005 * 20 - 1e-9 <= est['recommended'] <= 0.03 * 20 + 1e-9  # clamped to 0.5-3% of the size
+
+
+def test_centerline_radii_cap_the_edge_size():
+    surface = sphere()
+    line = centerline(np.linspace([0, 0, -8], [0, 0, 8], 50), radius=0.5)
+    assert centerline_fits_surface(line, surface)
+
+    est = edge_size_estimate(surface, line)
+    assert est['radius_based'] is not None
+    assert est['recommended'] <= edge_size_estimate(surface)['recommended']
+
+
+def test_centerline_of_another_case_is_ignored():
+    surface = sphere()
+    line = centerline(np.linspace([100, 0, 0], [140, 0, 0], 50), radius=0.5)
+    assert not centerline_fits_surface(line, surface)
+
+    est = edge_size_estimate(surface, line)
+    assert est['centerline_ignored']
+    assert est['radius_based'] is None
+    assert est['recommended'] == edge_size_estimate(surface)['recommended']
@@ -0,0 +1,62 @@
+"""Fourier-series inflow waveforms (fourier_inflow.py)."""
+
+import os
+
+import numpy as np
+import pytest
+
+from package.fourier_inflow import FourierInflow, count_lines, fourier_path, sync_flow_table, write_spectral_inflow
+
+
+def waveform(steps=201, period=0.8):
+    time = np.linspace(0.0, period, steps)
+    phase = 2 * np.pi * time / period
+    flow = 80.0 + 40.0 * np.sin(phase) + 10.0 * np.cos(3 * phase) - 5.0 * np.sin(7 * phase)
+    return time, flow
+
+
+def test_band_limited_waveform_round_trip():
+    time, flow = waveform()
+    series = FourierInflow.from_samples(time, flow, n_modes=16)
+    assert series.period == pytest.approx(0.8)
+    assert series.mean_flow == pytest.approx(80.0)
+    assert series.fit_error(time, flow) < 1e-12
+
+    # any step count, exactly periodic
+    for steps in (50, 1201):
+        t, q = series.sample(steps)
+        assert len(t) == steps and t[-1] == pytest.approx(0.8)
+        assert q[0] == q[-1]
+        assert np.allclose(q, np.interp(t, time, flow), atol=1.0)
+
+
+def test_inverse_fft_matches_direct_evaluation():
+    series = FourierInflow.from_samples(*waveform(), n_modes=12)
+    time, flow = series.sample(1000)  # inverse FFT path
+    assert np.allclose(flow[:-1], series.evaluate(time[:-1]), atol=1e-10)
+    time, flow = series.sample(10)    # fewer samples than modes: direct evaluation
+    assert np.allclose(flow[:-1], series.evaluate(time[:-1]), atol=1e-10)
+
+
+def test_save_load(tmp_path):
+    series = FourierInflow.from_samples(*waveform(), n_modes=8)
+    path = series.save(str(tmp_path / 'inflow_1d.fourier.json'))
+    loaded = FourierInflow.load(path)
+    assert loaded.period == series.period
+    assert np.array_equal(loaded.cos, series.cos) and np.array_equal(loaded.sin, series.sin)
+
+    (tmp_path / 'other.json').write_text('{"format": "something else"}')
+    with pytest.raises(ValueError):
+        FourierInflow.load(str(tmp_path / 'other.json'))
+
+
+def test_sync_flow_table(tmp_path):
+    flow_path = str(tmp_path / 'inflow_1d.flow')
+    assert not sync_flow_table(flow_path, 100)  # no series, nothing to do
+
+    write_spectral_inflow(flow_path, *waveform(), n_modes=8)
+    assert os.path.exists(fourier_path(flow_path))
+    assert count_lines(flow_path) == 201
+    assert not sync_flow_table(flow_path, 201)
+    assert sync_flow_table(flow_path, 500)
+    assert count_lines(flow_path) == 500
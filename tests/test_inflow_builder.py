@@ -0,0 +1,53 @@
+"""Headless inflow waveforms (inflow_builder.py)."""
+
+import numpy as np
+import pytest
+
+from package.inflow_builder import build_inflow, close_cycle, cycle_mean, read_waveform_csv
+
+
+def test_close_cycle():
+    x, y = close_cycle([0.0, 0.5, 0.9], [1.0, 3.0, 2.0])
+    assert x[-1] == 1.0
+    assert y[0] == y[-1] == 1.0
+
+    x, y = close_cycle([0.0, 0.5, 1.0], [1.0, 3.0, 2.0])
+    assert len(x) == 3
+    assert y[0] == y[-1] == 1.5
+
+
+def test_template_scaled_to_cardiac_output():
+    time, flow = build_inflow(template='aortic', hr=70, steps=1200, cardiac_output=5.0)
+    assert len(time) == 1200
+    assert time[-1] == pytest.approx(60.0 / 70)
+    assert cycle_mean(time, flow) == pytest.approx(5.0 * 1000.0 / 60.0)
+    assert flow[0] == pytest.approx(flow[-1])
+
+
+def test_manifest_strings_are_numbers():
+    # values read from an .ini manifest are strings
+    time, flow = build_inflow(template='carotid', hr='60', steps=200, mean_flow='6.5')
+    assert time[-1] == pytest.approx(1.0)
+    assert cycle_mean(time, flow) == pytest.approx(6.5)
+
+    reference = build_inflow(template='carotid', hr=60, steps=200, cardiac_output=0.39)
+    assert np.allclose(build_inflow(template='carotid', hr=60, steps=200, cardiac_output='0.39')[1], reference[1])
+
+
+def test_csv_period_from_string(tmp_path):
+    path = tmp_path / 'flow.csv'
+    path.write_text('time,flow\n' + ''.join('{},{}\n'.format(0.1 * i, 5 + np.sin(0.2 * np.pi * i))
+                                            for i in range(10)))
+    time, flow = build_inflow(csv=str(path), steps=100, period='1.0')
+    assert time[-1] == pytest.approx(1.0)
+
+
+def test_csv_needs_three_complete_rows(tmp_path):
+    path = tmp_path / 'flow.csv'
+    path.write_text('# t q p\n0.0 1.0 80\n0.1 2.0\n0.2 3.0\n0.3 2.0 90\n')
+    with pytest.raises(ValueError, match='fewer than 3'):
+        read_waveform_csv(str(path), flow_column=2)
+
+    x, q, period = read_waveform_csv(str(path))
+    assert len(q) == 4
+    assert period == pytest.approx(0.4)
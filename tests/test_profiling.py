@@ -0,0 +1,36 @@
+"""Stage timing and usage records (profiling.py)."""
+
+import threading
+
+from package.profiling import StageTimer, add_external_usage, load_records, usage_since, usage_snapshot
+
+
+def test_peak_below_earlier_peak_is_unavailable():
+    before = usage_snapshot()
+    before['self'] = before['children'] = float('inf')  # an earlier step peaked higher
+    usage = usage_since(before)
+    assert usage['peak_rss_mb'] is None
+    assert usage['cpu_s'] >= 0
+
+
+def test_external_usage_goes_to_active_timers_of_the_thread(tmp_path):
+    folder = str(tmp_path)
+    worker_usage = {'cpu_s': 12.5, 'peak_rss_mb': 2048.0}
+
+    def other_thread():
+        with StageTimer('other', folder):
+            pass
+
+    with StageTimer('stage', folder, category='stage', children=True):
+        with StageTimer('inner', folder):
+            add_external_usage(worker_usage)
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+    add_external_usage(worker_usage)  # no active timer: ignored
+
+    records = {r['name']: r for r in load_records(folder)}
+    for name in ('stage', 'inner'):
+        assert records[name]['cpu_s'] >= 12.5
+        assert records[name]['peak_rss_mb'] >= 2048.0
+    assert records['other']['cpu_s'] < 12.5
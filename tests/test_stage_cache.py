@@ -0,0 +1,82 @@
+"""Content-hash stage cache (stage_cache.py)."""
+
+import os
+import time
+import threading
+
+from package.stage_cache import StageCache, file_lock
+
+
+def test_lock_removed_by_another_process(tmp_path):
+    cache = StageCache(str(tmp_path))
+    with cache._locked():
+        os.remove(cache.path + '.lock')  # taken for a stale lock elsewhere
+    assert not os.path.exists(cache.path + '.lock')
+
+
+def test_stale_lock_is_broken(tmp_path):
+    cache = StageCache(str(tmp_path))
+    lock = cache.path + '.lock'
+    open(lock, 'w').close()  # left behind by a killed process
+    os.utime(lock, (time.time() - 60, time.time() - 60))
+    with cache._locked(timeout=10.0):
+        pass
+    assert not os.path.exists(lock)
+
+
+def test_fresh_lock_is_waited_for(tmp_path):
+    lock = str(tmp_path / 'x.lock')
+    acquired = threading.Event()
+
+    def waiter():
+        with file_lock(lock, timeout=10.0):
+            acquired.set()
+
+    open(lock, 'w').close()  # held by a live process
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.3)
+    assert not acquired.is_set()
+    os.remove(lock)  # released
+    thread.join(5)
+    assert acquired.is_set()
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_is_fresh(tmp_path):
+    rcrt = write(tmp_path / 'rcrt.dat', '2\n')
+    mesh = write(tmp_path / '1D_solver_input.in', 'mesh')
+    cache = StageCache(str(tmp_path))
+    assert not cache.is_fresh('mesh_1d', [rcrt], {'order': 1}, [mesh])
+
+    cache.record('mesh_1d', [rcrt], {'order': 1}, [mesh])
+    reloaded = StageCache(str(tmp_path))
+    assert reloaded.is_fresh('mesh_1d', [rcrt], {'order': 1}, [mesh])
+    assert not reloaded.is_fresh('mesh_1d', [rcrt], {'order': 0}, [mesh])  # parameters changed
+
+    write(tmp_path / 'rcrt.dat', '2\nedited\n')
+    assert not StageCache(str(tmp_path)).is_fresh('mesh_1d', [rcrt], {'order': 1}, [mesh])
+
+
+def test_is_fresh_needs_outputs_not_their_contents(tmp_path):
+    surface = write(tmp_path / 'clipped.vtp', 'surface')
+    remeshed = write(tmp_path / 'remeshed_model.vtp', 'remeshed')
+    cache = StageCache(str(tmp_path))
+    cache.record('remesh', [surface], None, [remeshed])
+
+    write(tmp_path / 'remeshed_model.vtp', 'smoothed by hand')  # kept
+    assert cache.is_fresh('remesh', [surface])
+    os.remove(remeshed)
+    assert not cache.is_fresh('remesh', [surface])
+
+
+def test_disabled_cache_is_never_fresh(tmp_path):
+    surface = write(tmp_path / 'clipped.vtp', 'surface')
+    cache = StageCache(str(tmp_path), enabled=False)
+    cache.record('remesh', [surface])
+    assert not cache.is_fresh('remesh', [surface])
+    assert not os.path.exists(cache.path)
@@ -0,0 +1,66 @@
+"""Per-face geometry and face splitting (surface_faces.py)."""
+
+import numpy as np
+import pytest
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+from package.surface_faces import FACE_ID_ARRAY, face_properties, split_faces
+
+RADIUS, HEIGHT, RESOLUTION = 2.0, 5.0, 24
+
+
+def capped_cylinder():
+    """Cylinder along y: wall quads with face id 1, n-gon caps with ids 2 (top) and 3 (bottom)."""
+    source = vtk.vtkCylinderSource()
+    source.SetRadius(RADIUS)
+    source.SetHeight(HEIGHT)
+    source.SetResolution(RESOLUTION)
+    source.CappingOn()
+    source.Update()
+    surface = source.GetOutput()
+
+    ids = []
+    for i in range(surface.GetNumberOfCells()):
+        y = vtk_to_numpy(surface.GetCell(i).GetPoints().GetData())[:, 1]
+        ids.append(2 if np.all(y > 0) else 3 if np.all(y < 0) else 1)
+    array = numpy_to_vtk(np.array(ids, dtype=np.int32), deep=True)
+    array.SetName(FACE_ID_ARRAY)
+    surface.GetCellData().AddArray(array)
+    return surface
+
+
+def test_face_properties():
+    props = face_properties(capped_cylinder())
+    assert props['face_id'].tolist() == [1, 2, 3]
+
+    cap_area = 0.5 * RESOLUTION * RADIUS ** 2 * np.sin(2 * np.pi / RESOLUTION)
+    wall_area = RESOLUTION * 2 * RADIUS * np.sin(np.pi / RESOLUTION) * HEIGHT
+    assert props['area'] == pytest.approx([wall_area, cap_area, cap_area])
+    assert props['equivalent_radius'][1] == pytest.approx(np.sqrt(cap_area / np.pi))
+    assert props['centroid'][1] == pytest.approx([0, HEIGHT / 2, 0], abs=1e-9)
+    assert props['centroid'][2] == pytest.approx([0, -HEIGHT / 2, 0], abs=1e-9)
+    assert abs(props['normal'][1][1]) == pytest.approx(1.0)
+    assert props['normal'][1][1] == pytest.approx(-props['normal'][2][1])
+
+
+def test_missing_face_has_zero_area():
+    props = face_properties(capped_cylinder(), face_ids=[2, 7])
+    assert props['area'][0] > 0
+    assert props['area'][1] == 0
+    assert np.isnan(props['centroid'][1]).all()
+
+
+def test_split_faces():
+    surface = capped_cylinder()
+    faces = split_faces(surface)
+    assert sorted(faces) == [1, 2, 3]
+    assert sum(f.GetNumberOfCells() for f in faces.values()) == surface.GetNumberOfCells()
+
+    top = faces[2]
+    assert top.GetNumberOfCells() == 1
+    assert top.GetNumberOfPoints() == RESOLUTION  # compacted to the cap's own points
+    assert set(vtk_to_numpy(top.GetCellData().GetArray(FACE_ID_ARRAY)).tolist()) == {2}
+    assert face_properties(top)['area'] == pytest.approx(face_properties(surface, [2])['area'])
+
+    assert split_faces(surface, face_ids=[9])[9].GetNumberOfCells() == 0
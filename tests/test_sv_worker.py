@@ -0,0 +1,21 @@
+"""Persistent SimVascular worker (sv_worker.py)."""
+
+import package
+from package.config import CASE_ENV, FIELD_ENV, CaseConfig
+from package.sv_worker import use_case
+
+
+def test_request_case_replaces_the_startup_case(tmp_path, monkeypatch):
+    for var in list(FIELD_ENV.values()) + [CASE_ENV]:
+        monkeypatch.setenv(var, '')
+    monkeypatch.setattr(package, 'case_config', package.case_config)
+    for name, value in package.case_config.as_globals().items():
+        monkeypatch.setattr(package, name, value)
+
+    case = CaseConfig.from_dict({'master_folder': str(tmp_path / 'b'), 'clipped_surface': str(tmp_path / 'b.vtp'),
+                                 'edge_size': 0.2}, package.default_case_config)
+    use_case(case.to_env({}))
+    assert package.case_config == case
+    assert package.master_folder == case.master_folder
+    assert package.res_folder_1D == case.res_folder_1D
+    assert package.edge_size == 0.2
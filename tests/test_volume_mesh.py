@@ -0,0 +1,71 @@
+"""Background volume mesh status and waiting (volume_mesh.py)."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from package.config import CaseConfig
+from package.volume_mesh import (STATUS_FILE, _pid_alive, read_status, start_build, volume_mesh_paths,
+                                 wait_for_volume_mesh, write_status)
+
+
+def case(tmp_path):
+    return CaseConfig(master_folder=str(tmp_path), clipped_surface=str(tmp_path / 'surface.vtp'))
+
+
+def python_launch(code):
+    """Launch prefix running `code` instead of SimVascular (the script path lands in argv)."""
+    return [sys.executable, '-c', code]
+
+
+def test_exited_child_is_not_alive():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    time.sleep(0.5)  # exited, not reaped yet: a zombie
+    assert not _pid_alive(proc.pid)
+    assert _pid_alive(os.getpid())
+
+
+def test_launcher_does_not_overwrite_a_finished_build(tmp_path):
+    folder = str(tmp_path)
+    write_status(folder, 'building', pid=os.getpid(), build='b1')
+    write_status(folder, 'done', pid=12345)  # the builder was faster than its launcher
+    assert not write_status(folder, 'building', pid=12345, replace_pid=os.getpid())
+
+    with open(os.path.join(volume_mesh_paths(folder)[0], STATUS_FILE)) as f:
+        status = json.load(f)
+    assert status['state'] == 'done'
+    assert status['build'] == 'b1'
+
+
+def test_builder_status_wins(tmp_path):
+    config = case(tmp_path)
+    code = ("import os; from package.volume_mesh import write_status; "
+            "write_status(os.environ['MIROS_MASTER_FOLDER'], 'failed', 'no TetGen here')")
+    proc = start_build(config, python_launch(code))
+    assert not wait_for_volume_mesh(config.master_folder, timeout=30, poll=0.05, proc=proc)
+    assert read_status(config.master_folder) == 'failed'
+
+
+def test_builder_crash_without_status_is_failed(tmp_path):
+    config = case(tmp_path)
+    proc = start_build(config, python_launch('import sys; sys.exit(3)'))
+    assert not wait_for_volume_mesh(config.master_folder, timeout=30, poll=0.05, proc=proc)
+    assert read_status(config.master_folder) == 'failed'
+    assert proc.returncode == 3
+    with open(os.path.join(volume_mesh_paths(config.master_folder)[0], STATUS_FILE)) as f:
+        assert 'code 3' in json.load(f)['error']
+
+
+def test_wait_times_out(tmp_path):
+    config = case(tmp_path)
+    proc = start_build(config, python_launch('import time; time.sleep(30)'))
+    try:
+        assert read_status(config.master_folder) == 'building'
+        start = time.time()
+        assert not wait_for_volume_mesh(config.master_folder, timeout=0.3, poll=0.05, proc=proc)
+        assert time.time() - start < 5
+    finally:
+        proc.kill()
+        proc.wait()